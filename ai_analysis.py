@@ -0,0 +1,243 @@
+# ai_analysis.py
+# "Analyze Video with AI" without shipping the whole video to Gemini.
+#
+# The button used to write the upload to temp_<time>.mp4, upload the WHOLE
+# file with genai.upload_file and then sleep in a loop inside the script run
+# until Gemini had processed it. Re-analysing the same file paid all of it again.
+# Now:
+#   - a handful of frames are sent inline as small JPEGs: the scene changes
+#     (see keyframes.py, scanned within a few seconds) topped up with evenly
+#     spaced ones, plus optionally a short low-bitrate mono audio track
+#   - the call runs on a background asyncio loop, with retries that back off
+#     (1s, 2s, 4s...) on rate limits and hiccups; the page just polls status()
+#   - raw_analysis is cached by the file's SHA-256 (SQLite, TTL + LRU), so a
+#     repeat upload is answered instantly and for free
+# The model client is passed in, so a local fake can stand in for Gemini
+# (see tests/test_ai_analysis.py).
+import asyncio
+import io
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+from moviepy.config import get_setting
+
+import tracing
+from artifact_cache import DEFAULT_ROOT
+from keyframes import representative_times
+from video_probe import probe
+
+PROMPT = ("These are frames sampled in order from one video (and its audio, if attached). "
+          "Return a JSON-like string with: Title (short/catchy), Summary (1 sentence), "
+          "and Category (Nature, Tech, People, Business, or Abstract).")
+
+N_FRAMES = 8
+FRAME_WIDTH = 512
+AUDIO_SECONDS = 60
+CACHE_TTL = float(os.environ.get("TROVEO_AI_CACHE_TTL", 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("TROVEO_AI_CACHE_ENTRIES", 1000))
+MAX_ATTEMPTS = 5
+FINISHED_TTL = 600  # seconds a finished job nobody asked about is kept
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+
+class GeminiClient:
+    # The real model. generate(parts) -> text; parts are inline {"mime_type", "data"} dicts
+
+    def __init__(self, model_name="gemini-1.5-flash"):
+        self.model_name = model_name
+
+    @tracing.traced("gemini.generate")
+    def generate(self, parts):
+        import google.generativeai as genai
+
+        return genai.GenerativeModel(self.model_name).generate_content(parts).text
+
+
+class AnalysisCache:
+    # raw_analysis by content hash. Entries expire after ttl seconds, and past
+    # max_entries the least recently used ones are dropped.
+
+    def __init__(self, path=os.path.join(DEFAULT_ROOT, "analysis.db"), ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    digest TEXT PRIMARY KEY,
+                    raw_analysis TEXT,
+                    created_at REAL,
+                    last_used REAL
+                )""")
+
+    @contextmanager
+    def _connect(self):
+        # A transaction that is committed (or rolled back) and then closed
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, digest):
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT raw_analysis, created_at FROM analyses WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                db.execute("DELETE FROM analyses WHERE digest = ?", (digest,))
+                row = None
+            if row is not None:
+                db.execute("UPDATE analyses SET last_used = ? WHERE digest = ?", (now, digest))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, digest, raw_analysis):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?)", (digest, raw_analysis, now, now))
+            db.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl,))
+            db.execute("""DELETE FROM analyses WHERE digest NOT IN
+                          (SELECT digest FROM analyses ORDER BY last_used DESC LIMIT ?)""", (self.max_entries,))
+
+    def stats(self):
+        with self._connect() as db:
+            (entries,) = db.execute("SELECT COUNT(*) FROM analyses").fetchone()
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+# --- What we send ---
+
+def sample_frames(path, times, width=FRAME_WIDTH):
+    # One small JPEG per time, as inline parts
+    from video_processor import extract_frame
+
+    parts = []
+    for t in times:
+        buffer = io.BytesIO()
+        Image.fromarray(extract_frame(path, t, width)).save(buffer, "JPEG", quality=80)
+        parts.append({"mime_type": "image/jpeg", "data": buffer.getvalue()})
+    return parts
+
+
+def extract_audio(path, seconds=AUDIO_SECONDS):
+    # The first minute of sound, mono 32 kbps MP3 (~240 KB), or None if silent
+    out = subprocess.run([get_setting("FFMPEG_BINARY"), "-v", "error", "-i", path, "-t", str(seconds), "-vn",
+                          "-ac", "1", "-ar", "22050", "-b:a", "32k", "-f", "mp3", "pipe:1"],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if out.returncode != 0 or not out.stdout:
+        return None
+    return {"mime_type": "audio/mp3", "data": out.stdout}
+
+
+@tracing.traced("gemini.frames")
+def build_parts(path, n_frames=N_FRAMES, include_audio=True):
+    info = probe(path)
+    parts = sample_frames(path, representative_times(path, n_frames, info["duration_s"]))
+    if include_audio and info["has_audio"]:
+        audio = extract_audio(path)
+        if audio:
+            parts.append(audio)
+    return parts + [PROMPT]
+
+
+# --- The service ---
+
+class AnalysisService:
+    # submit() returns at once; the work happens on a background event loop.
+    # status(digest) -> {"status": pending/done/failed, "raw_analysis", "error", "cached", "seconds"}
+    # A finished job is forgotten once status() has returned it (a later
+    # status() for the same digest is answered from the cache), or after
+    # FINISHED_TTL seconds if nobody asks.
+
+    def __init__(self, client=None, cache=None, n_frames=N_FRAMES, include_audio=True,
+                 max_attempts=MAX_ATTEMPTS, retry_delay=1.0):
+        self.client = client or GeminiClient()
+        self.cache = cache or AnalysisCache()
+        self.n_frames = n_frames
+        self.include_audio = include_audio
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay  # doubles after every failed attempt
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="ai-analysis", daemon=True).start()
+
+    def submit(self, path, digest, remove_after=False):
+        # path: a local copy of the video (see streaming_io.spool_to_disk)
+        # remove_after: delete that copy once the frames are taken
+        cached = self.cache.get(digest)
+        with self._lock:
+            self._prune()
+            if cached is not None:
+                self._jobs[digest] = {"status": DONE, "raw_analysis": cached, "error": None,
+                                      "cached": True, "seconds": 0.0, "finished_at": time.time()}
+            elif self._jobs.get(digest, {}).get("status") != PENDING:
+                self._jobs[digest] = {"status": PENDING, "raw_analysis": None, "error": None,
+                                      "cached": False, "seconds": None, "finished_at": None}
+                asyncio.run_coroutine_threadsafe(self._analyze(path, digest, remove_after), self._loop)
+                return digest
+        if remove_after and os.path.exists(path):
+            os.remove(path)
+        return digest
+
+    def status(self, digest):
+        with self._lock:
+            job = self._jobs.get(digest)
+            if job and job["status"] != PENDING:
+                del self._jobs[digest]
+        if job:
+            return dict(job)
+        cached = self.cache.get(digest)  # Finished, and already read by another session
+        if cached is None:
+            return None
+        return {"status": DONE, "raw_analysis": cached, "error": None, "cached": True, "seconds": 0.0}
+
+    def _prune(self):
+        # Finished jobs whose result was never read (the page was closed)
+        cutoff = time.time() - FINISHED_TTL
+        for digest in [digest for digest, job in self._jobs.items()
+                       if job["status"] != PENDING and job["finished_at"] < cutoff]:
+            del self._jobs[digest]
+
+    async def _analyze(self, path, digest, remove_after):
+        start = time.time()
+        try:
+            try:
+                # ffmpeg work runs in a thread so the loop stays free
+                parts = await asyncio.to_thread(build_parts, path, self.n_frames, self.include_audio)
+            finally:
+                if remove_after and os.path.exists(path):
+                    os.remove(path)
+            text = await self._generate_with_backoff(parts)
+            self.cache.put(digest, text)
+            self._finish(digest, status=DONE, raw_analysis=text, seconds=round(time.time() - start, 2))
+        except Exception as e:
+            self._finish(digest, status=FAILED, error=str(e), seconds=round(time.time() - start, 2))
+
+    async def _generate_with_backoff(self, parts):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await asyncio.to_thread(self.client.generate, parts)
+            except Exception:
+                if attempt == self.max_attempts:
+                    raise
+                tracing.count("gemini.retries")
+                await asyncio.sleep(min(self.retry_delay * 2 ** (attempt - 1), 30))
+
+    def _finish(self, digest, **fields):
+        with self._lock:
+            self._jobs[digest].update(fields, finished_at=time.time())
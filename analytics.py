@@ -0,0 +1,342 @@
+# analytics.py
+# Numbers for the Dashboard, kept ready instead of recomputed on every rerun.
+#
+# The Dashboard used to build pd.DataFrame(all_videos) from the raw list on
+# every rerun, showed "Total Value" as total_videos * 50 (price is free text
+# like "$50"), and had one chart. Here we keep running totals instead:
+#   - price parsed to integer cents, duration and size as numbers
+#   - only the rows that changed are parsed (InventoryRepository tells us,
+#     see inventory.add_listener), and purchases are read incrementally by id
+#   - a changed row takes its old values out of the rollups (catalogue
+#     value, per-category / per-owner counts, uploads per day) and puts the
+#     new ones in; a video's sales move with it to its new category / owner
+#   - only a full reload (InventoryRepository.sync(full=True)) rebuilds them, with
+#     one groupby over the whole catalogue
+# So an update costs the rows that changed, and drawing the Dashboard costs
+# the number of categories, owners and days, not the number of videos.
+# Purchases are fetched outside the lock: a session doesn't wait on another
+# one's network call, it draws with the numbers it has.
+import bisect
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import tracing
+
+DEFAULT_PRICE = "$50"  # What the Marketplace shows when a row has no price
+PURCHASES_TTL = float(os.environ.get("TROVEO_PURCHASES_TTL", 30))
+PAGE_SIZE = 1000
+LATEST = 100            # rows in the "latest videos" table
+DAY_NS = 86400 * 10**9
+ROLLUP_COLUMNS = ["videos", "value_cents", "sales", "revenue_cents"]
+VIDEO_COLUMNS = ["id", "title", "category", "owner_id", "price_cents", "duration_s", "size_bytes", "created_at"]
+
+
+def parse_price_cents(prices):
+    # "$50", "50", "$1,299.99", None -> 5000, 5000, 129999, 5000 (vectorized)
+    text = pd.Series(prices, dtype="object").fillna(DEFAULT_PRICE).astype(str)
+    amount = pd.to_numeric(text.str.replace(r"[^0-9.]", "", regex=True), errors="coerce")
+    default = float(DEFAULT_PRICE.strip("$"))
+    return (amount.fillna(default) * 100).round().astype("int64")
+
+
+def _column(raw, name):
+    return raw[name] if name in raw else pd.Series([None] * len(raw), dtype="object")
+
+
+def videos_frame(rows):
+    # Raw videos_inventory rows -> typed columns, indexed by video id
+    raw = pd.DataFrame.from_records(rows)
+    frame = pd.DataFrame(index=pd.RangeIndex(len(raw)))
+    column = lambda name: _column(raw, name)
+    frame["id"] = pd.to_numeric(column("id"), errors="coerce").astype("int64")
+    frame["title"] = column("title").astype("string")
+    frame["category"] = column("category").fillna("General").astype("category")
+    frame["owner_id"] = column("owner_id").astype("category")
+    frame["price_cents"] = parse_price_cents(column("price"))
+    frame["duration_s"] = pd.to_numeric(column("duration_s"), errors="coerce").astype("float64")
+    frame["size_bytes"] = pd.to_numeric(column("size_bytes"), errors="coerce").astype("float64")
+    frame["created_at"] = pd.to_datetime(column("created_at"), errors="coerce", utc=True)
+    frame.index = frame["id"].to_numpy()
+    return frame
+
+
+def purchases_frame(rows):
+    raw = pd.DataFrame.from_records(rows)
+    frame = pd.DataFrame(index=pd.RangeIndex(len(raw)))
+    column = lambda name: _column(raw, name)
+    frame["id"] = pd.to_numeric(column("id"), errors="coerce").astype("int64")
+    frame["video_id"] = pd.to_numeric(column("video_id"), errors="coerce").astype("int64")
+    frame["price_cents"] = parse_price_cents(column("price"))
+    frame["created_at"] = pd.to_datetime(column("created_at"), errors="coerce", utc=True)
+    return frame
+
+
+def _bump(groups, key, delta):
+    # groups: label -> [videos, value_cents, sales, revenue_cents]
+    totals = groups.get(key)
+    if totals is None:
+        totals = groups[key] = [0, 0, 0, 0]
+    for i, d in enumerate(delta):
+        totals[i] += d
+    if totals[0] == 0:
+        # No videos left: its sales went with them (see _account)
+        del groups[key]
+
+
+def _rollup_frame(groups, key, sort_by):
+    frame = pd.DataFrame.from_dict(groups, orient="index", columns=ROLLUP_COLUMNS).astype("int64")
+    frame.index.name = key
+    return frame.sort_values(sort_by, ascending=False)
+
+
+def _timestamps(ns):
+    # Epoch nanoseconds (None = unknown) -> UTC timestamps
+    return pd.to_datetime(pd.Series(ns, dtype="float64"), unit="ns", utc=True)
+
+
+def _epoch_ns(created):
+    # UTC timestamps -> (epoch nanoseconds, day they fall on) lists, None where unknown:
+    # plain ints are much cheaper to keep and compare than Timestamps
+    missing = created.isna().to_numpy()
+    ns = created.to_numpy(dtype="datetime64[ns]").view("int64")
+    ns, days = ns.astype(object), (ns - ns % DAY_NS).astype(object)
+    ns[missing], days[missing] = None, None
+    return ns.tolist(), days.tolist()
+
+
+def _daily(amounts, scale=1):
+    # day -> amount, as a daily series (days without any filled with 0)
+    days = sorted(amounts)
+    index = pd.DatetimeIndex(pd.to_datetime(days, unit="ns", utc=True), name="created_at")
+    series = pd.Series([amounts[day] for day in days], index=index, dtype="int64")
+    series = series.asfreq("D", fill_value=0) if days else series
+    return series / scale if scale != 1 else series
+
+
+def _records(frame):
+    # Typed frame -> (id, title, category, owner_id, price_cents, duration_s, size_bytes, created_ns, day) tuples
+    owners = frame["owner_id"].astype("object")
+    created, days = _epoch_ns(frame["created_at"])
+    return zip(frame["id"].tolist(), frame["title"].astype("object").tolist(),
+               frame["category"].astype("object").tolist(), owners.where(owners.notna(), None).tolist(),
+               frame["price_cents"].tolist(), frame["duration_s"].tolist(), frame["size_bytes"].tolist(),
+               created, days)
+
+
+def _frame(records):
+    # Stored records -> the typed columns videos_frame() gives
+    frame = pd.DataFrame.from_records([record[:8] for record in records], columns=VIDEO_COLUMNS)
+    frame["created_at"] = _timestamps(frame["created_at"])
+    frame.index = frame["id"].to_numpy()
+    return frame
+
+
+class InventoryAnalytics:
+
+    def __init__(self, client=None, purchases_table="purchases", purchases_ttl=PURCHASES_TTL):
+        # client: Supabase client for the purchases table (None = no revenue)
+        self.client = client
+        self.purchases_table = purchases_table
+        self.purchases_ttl = purchases_ttl
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()   # one purchases fetch at a time
+        self._pending = []          # changed inventory rows not applied yet
+        self._full_pending = False
+        self._last_purchase_id = None
+        self._purchases_synced_at = 0.0
+        self._summary = None        # cached summary, None = stale
+        self._reset_videos()
+        # Purchases: only ever added
+        self._purchase_ids = set()
+        self._sold = {}             # video id -> (sales, revenue_cents)
+        self._sales = 0
+        self._revenue_cents = 0
+        self._revenue_per_day = {}  # day -> cents
+
+    def _reset_videos(self):
+        self._videos = {}           # video id -> record (see _records)
+        self._ids = []              # sorted, for the latest videos
+        self._value_cents = 0
+        self._duration_s = 0.0
+        self._bytes = 0
+        self._by_category = {}
+        self._by_owner = {}
+        self._uploads_per_day = {}  # day -> videos
+
+    # --- Feeding ---
+
+    def on_inventory_change(self, rows, full):
+        # Listener for InventoryRepository.add_listener: cheap, just queues the rows
+        with self._lock:
+            if full:
+                self._pending, self._full_pending = list(rows), True
+            else:
+                self._pending.extend(rows)
+            self._summary = None
+
+    def _apply_pending(self):
+        if not self._pending and not self._full_pending:
+            return
+        changed = videos_frame(self._pending)
+        if self._full_pending:
+            self._rebuild(changed[~changed.index.duplicated(keep="last")])
+        else:
+            for record in _records(changed):
+                self._update(record)
+        self._pending, self._full_pending = [], False
+
+    def _account(self, record, sign):
+        # Add (sign=1) or take out (sign=-1) one video's share of every rollup
+        video_id, _, category, owner, price, duration, size, _, day = record
+        sales, revenue = self._sold.get(video_id, (0, 0))
+        delta = (sign, sign * price, sign * sales, sign * revenue)
+        _bump(self._by_category, category, delta)
+        if owner is not None:
+            _bump(self._by_owner, owner, delta)
+        self._value_cents += sign * price
+        if duration == duration:  # not NaN
+            self._duration_s += sign * duration
+        if size == size:
+            self._bytes += sign * int(size)
+        if day is not None:
+            left = self._uploads_per_day.get(day, 0) + sign
+            if left:
+                self._uploads_per_day[day] = left
+            else:
+                del self._uploads_per_day[day]
+
+    def _update(self, record):
+        # A newer version of a row replaces the older one
+        video_id = record[0]
+        old = self._videos.get(video_id)
+        if old is not None:
+            self._account(old, -1)
+        else:
+            bisect.insort(self._ids, video_id)
+        self._videos[video_id] = record
+        self._account(record, 1)
+
+    def _rebuild(self, frame):
+        # The whole catalogue at once: grouped in pandas rather than row by row
+        self._reset_videos()
+        self._videos = {record[0]: record for record in _records(frame)}
+        self._ids = sorted(self._videos)
+        self._value_cents = int(frame["price_cents"].sum())
+        self._duration_s = float(np.nansum(frame["duration_s"].to_numpy()))
+        self._bytes = int(np.nansum(frame["size_bytes"].to_numpy()))
+        days = pd.Series(_epoch_ns(frame["created_at"])[1], dtype="object").dropna().value_counts()
+        self._uploads_per_day = dict(zip(days.index.tolist(), days.tolist()))
+
+        sold = pd.DataFrame.from_dict(self._sold, orient="index", columns=["sales", "revenue_cents"])
+        sold = frame[["category", "owner_id", "price_cents"]].join(sold, how="left")
+        sold[["sales", "revenue_cents"]] = sold[["sales", "revenue_cents"]].fillna(0)
+        for key, groups in (("category", self._by_category), ("owner_id", self._by_owner)):
+            totals = sold.groupby(key, observed=True).agg(
+                videos=("price_cents", "size"), value_cents=("price_cents", "sum"),
+                sales=("sales", "sum"), revenue_cents=("revenue_cents", "sum")).astype("int64")
+            for label, row in zip(totals.index.astype("object"), totals.to_numpy().tolist()):
+                groups[label] = row
+
+    def sync_purchases(self):
+        # New purchases only (id > the last one we have), page by page. The
+        # fetch runs without self._lock; if another session is already
+        # fetching, this one doesn't wait for it.
+        if self.client is None or not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            pages = []
+            after = self._last_purchase_id
+            while True:
+                query = self.client.table(self.purchases_table).select("*")
+                if after is not None:
+                    query = query.gt("id", after)
+                page = query.order("id").limit(PAGE_SIZE).execute().data
+                if page:
+                    pages.extend(page)
+                    after = page[-1]["id"]
+                if len(page) < PAGE_SIZE:
+                    break
+            frame = purchases_frame(pages) if pages else None
+            with self._lock:
+                if frame is not None:
+                    self._add_purchases(frame)
+                self._last_purchase_id = after
+                self._purchases_synced_at = time.time()
+        finally:
+            self._sync_lock.release()
+
+    def record_purchase(self, row):
+        # Write-through for a purchase this app just made (the insert's response row)
+        # (the next sync_purchases() will see it again; it is only counted once)
+        frame = purchases_frame([row])
+        with self._lock:
+            self._add_purchases(frame)
+
+    def _add_purchases(self, frame):
+        # Revenue is counted against the video's category / owner
+        days = _epoch_ns(frame["created_at"])[1]
+        for purchase_id, video_id, price, day in zip(frame["id"].tolist(), frame["video_id"].tolist(),
+                                                    frame["price_cents"].tolist(), days):
+            if purchase_id in self._purchase_ids:
+                continue
+            self._purchase_ids.add(purchase_id)
+            self._sales += 1
+            self._revenue_cents += price
+            if day is not None:
+                self._revenue_per_day[day] = self._revenue_per_day.get(day, 0) + price
+            sales, revenue = self._sold.get(video_id, (0, 0))
+            self._sold[video_id] = (sales + 1, revenue + price)
+            record = self._videos.get(video_id)
+            if record is not None:
+                _bump(self._by_category, record[2], (0, 0, 1, price))
+                if record[3] is not None:
+                    _bump(self._by_owner, record[3], (0, 0, 1, price))
+            self._summary = None
+
+    # --- Reading ---
+
+    def videos(self):
+        # The whole catalogue as a typed frame (built on demand, not used by the Dashboard)
+        with self._lock:
+            self._apply_pending()
+            records = list(self._videos.values())
+        return _frame(records)
+
+    def summary(self):
+        # All Dashboard numbers; rebuilt from the rollups only after the data changed
+        if time.time() - self._purchases_synced_at > self.purchases_ttl:
+            try:
+                self.sync_purchases()
+            except Exception as e:
+                tracing.error("analytics.purchases_sync", e)
+                self._purchases_synced_at = time.time()
+        with self._lock:
+            if self._summary is None:
+                self._apply_pending()
+                self._summary = self._aggregate()
+            return self._summary
+
+    def _aggregate(self):
+        latest = _frame([self._videos[video_id] for video_id in reversed(self._ids[-LATEST:])])
+        return {
+            "videos": len(self._videos),
+            "catalogue_value_cents": self._value_cents,
+            "total_duration_s": self._duration_s,
+            "total_bytes": self._bytes,
+            "sales": self._sales,
+            "revenue_cents": self._revenue_cents,
+            "by_category": _rollup_frame(self._by_category, "category", "videos"),
+            "by_owner": _rollup_frame(self._by_owner, "owner_id", "revenue_cents"),
+            "uploads_per_day": _daily(self._uploads_per_day),
+            "revenue_per_day": _daily(self._revenue_per_day, scale=100.0),
+            "latest": latest,
+            "computed_at": time.time(),
+        }
+
+
+def format_cents(cents):
+    return f"${cents / 100:,.2f}"
@@ -0,0 +1,13 @@
+# app_pages/__init__.py
+# The pages of the Streamlit app, one module each, drawn by marketplace_app.py:
+#   account       sidebar: log in / sign up / log out, and the page menu
+#   marketplace   public listings, search, Buy License / Download
+#   dashboard     analytics and scratch-space numbers
+#   my_uploads    the logged-in user's own videos
+#   import_video  the import methods (AI uploader, YouTube, forms)
+#   processing    "Upload New Video": Process & Watermark in the background
+# marketplace_app.py imports a page module only when that page is shown
+# (account and processing, drawn on every page, up front), and each page
+# imports its heavy libraries (pandas, yt-dlp, moviepy...) inside the
+# functions that use them. Shared services live in app_services.py.
+# (Not called pages/: Streamlit would turn that folder into a multipage menu.)
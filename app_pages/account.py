@@ -0,0 +1,73 @@
+# app_pages/account.py
+# The sidebar: who is logged in, the page menu, and the login / sign-up forms.
+import time
+
+import streamlit as st
+
+import tracing
+from app_services import fresh_auth_client, get_entitlements
+
+
+def sidebar():
+    # Draws the sidebar; returns the page to show
+    with st.sidebar:
+        st.header("👤 Account")
+
+        # If Logged In: Show Logout Button and Menu
+        if st.session_state.user:
+            st.success(f"Logged in as: {st.session_state.user.user.email}")
+            if st.button("Log Out"):
+                if st.session_state.get("auth_client"):
+                    st.session_state.auth_client.auth.sign_out()
+                st.session_state.user = None
+                st.session_state.auth_client = None
+                st.rerun()
+
+            st.divider()
+            # Menu for Logged In Users
+            return st.radio("Go to", ["Marketplace", "Dashboard", "My Uploads", "Import Video"])
+
+        # If Guest: Show Login/Signup Forms
+        st.info("🔒 Log in to upload videos.")
+
+        tab1, tab2 = st.tabs(["Login", "Sign Up"])
+
+        with tab1: # Login Form
+            email_in = st.text_input("Email", key="login_email")
+            pass_in = st.text_input("Password", type="password", key="login_pass")
+            if st.button("Log In"):
+                try:
+                    auth_client = fresh_auth_client()
+                    user = auth_client.auth.sign_in_with_password({"email": email_in, "password": pass_in})
+                    st.session_state.user = user
+                    st.session_state.auth_client = auth_client
+
+                    # --- Load Past Purchases ---
+                    # (once per user, then shared and kept up to date on purchase)
+                    try:
+                        get_entitlements().owned_set(user.user.email)
+                    except Exception as e:
+                        tracing.error("entitlements.load", e)
+
+                    st.success("Welcome back!")
+                    time.sleep(1)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Login Error: {e}")
+
+        with tab2: # Sign Up Form
+            new_email = st.text_input("Email", key="signup_email")
+            new_pass = st.text_input("Password", type="password", key="signup_pass")
+            if st.button("Create Account"):
+                try:
+                    auth_client = fresh_auth_client()
+                    user = auth_client.auth.sign_up({"email": new_email, "password": new_pass})
+                    st.session_state.user = user
+                    st.session_state.auth_client = auth_client
+                    st.success("Account created! Logging you in...")
+                    time.sleep(1)
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Sign Up Error: {e}")
+
+    return "Marketplace" # Guests are restricted to Marketplace
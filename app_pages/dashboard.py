@@ -0,0 +1,68 @@
+# app_pages/dashboard.py
+# Analytics for logged-in users. The first visit in a process loads pandas
+# (through analytics.py); no other page needs it up front.
+import streamlit as st
+
+from app_services import current_email, get_analytics, get_entitlements
+
+
+def render():
+    from analytics import format_cents
+    from scratch_space import get_scratch
+
+    st.title("📊 Analytics Dashboard")
+
+    try:
+        # Precomputed: only recalculated when the inventory or purchases change
+        stats = get_analytics().summary()
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Total Platform Videos", stats["videos"])
+        with col2:
+            st.metric("Total Value", format_cents(stats["catalogue_value_cents"]))
+        with col3:
+            st.metric("Revenue", format_cents(stats["revenue_cents"]), help=f"{stats['sales']} licenses sold")
+        with col4:
+            st.metric("Your Active Licenses", get_entitlements().count(current_email()))
+
+        st.divider()
+
+        if stats["videos"]:
+            c1, c2 = st.columns(2)
+            with c1:
+                st.subheader("Category Distribution")
+                st.bar_chart(stats["by_category"]["videos"])
+            with c2:
+                st.subheader("Revenue by Category ($)")
+                st.bar_chart(stats["by_category"]["revenue_cents"] / 100)
+
+            if len(stats["uploads_per_day"]) or len(stats["revenue_per_day"]):
+                c3, c4 = st.columns(2)
+                with c3:
+                    st.subheader("Uploads per Day")
+                    st.line_chart(stats["uploads_per_day"])
+                with c4:
+                    st.subheader("Revenue per Day ($)")
+                    st.line_chart(stats["revenue_per_day"])
+
+            st.subheader("Top Sellers")
+            st.dataframe(stats["by_owner"].head(20))
+
+            st.subheader("Inventory Overview")
+            st.caption(f"Latest {len(stats['latest'])} of {stats['videos']} videos")
+            st.dataframe(stats["latest"], hide_index=True)
+        else:
+            st.info("No data to show yet.")
+
+        # Server temp files: how full the scratch space is (see scratch_space.py)
+        with st.expander("🗄️ Scratch space"):
+            scratch = get_scratch().stats()
+            s1, s2, s3, s4 = st.columns(4)
+            s1.metric("Disk Used", f"{scratch['used_bytes'] / 1e9:.2f} GB",
+                      help=f"Budget {scratch['max_bytes'] / 1e9:.1f} GB" + (" (tmpfs)" if scratch["tmpfs"] else ""))
+            s2.metric("Running Jobs", scratch["active_jobs"])
+            s3.metric("Kept Previews", scratch["artifacts"], help=f"{scratch['pinned']} in use")
+            s4.metric("Evictions", scratch["evictions"], help=f"{scratch['evicted_bytes'] / 1e9:.2f} GB freed")
+    except Exception as e:
+        st.error(f"Error loading dashboard: {e}")
@@ -0,0 +1,353 @@
+# app_pages/import_video.py
+# The Import Video page. A fragment: picking a method, going back and
+# submitting a form re-run only this view, not the whole app. yt-dlp and
+# moviepy are imported by the branches that use them.
+import glob
+from datetime import datetime
+
+import streamlit as st
+
+import tracing
+from app_services import (current_access_token, flag_duplicates, get_analysis_service, get_artifact_cache,
+                          get_inventory, get_phash_index, get_supabase, get_uploader, probe_columns,
+                          upload_thumbnails, upload_to_storage)
+from artifact_cache import storage_name_for
+from scratch_space import get_scratch
+from streaming_io import spool_to_disk
+
+
+def set_import_view(view):
+    # on_click callback: the state changes before the (fragment) rerun
+    st.session_state.import_view = view
+
+
+@st.fragment(run_every=1)
+def show_ai_status(job_id):
+    # Only this box re-runs while Gemini works; the page stays usable
+    job = get_analysis_service().status(job_id)
+    if job is None:
+        st.session_state.ai_job = None
+    elif job["status"] == "pending":
+        st.info("🤖 Analyzing sampled frames with Gemini...")
+    elif job["status"] == "failed":
+        st.error(f"AI Error: {job['error']}")
+        st.session_state.ai_job = None
+    else:
+        st.session_state.ai_metadata = {
+            "raw_analysis": job["raw_analysis"],
+            "timestamp": datetime.now()
+        }
+        st.session_state.ai_job = None
+        st.rerun()  # Whole page, so the form below picks up the suggestions
+
+
+@st.fragment
+def render():
+    # --- VIEW A: THE GRID ---
+    if st.session_state.import_view == "grid":
+        st.title("Select a method")
+        
+        # Row 1
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            with st.container(border=True):
+                st.subheader("☁️ Upload Videos")
+                st.caption("AI Auto-Tagging & Upload.")
+                st.button("Use AI Uploader", on_click=set_import_view, args=("upload_tool",))
+        with c2:
+            with st.container(border=True):
+                st.subheader("📦 Cloud Storage")
+                st.caption("Dropbox / Drive.")
+                st.button("Connect Account", on_click=set_import_view, args=("cloud_form",))
+        with c3:
+            with st.container(border=True):
+                st.subheader("🔶 Upload to S3")
+                st.caption("Amazon S3 Bucket.")
+                st.button("Configure S3", on_click=set_import_view, args=("s3_form",))
+
+        # Row 2
+        c4, c5, c6 = st.columns(3)
+        with c4:
+            with st.container(border=True):
+                st.subheader("🚚 Ship Drives")
+                st.caption("Physical Logistics.")
+                st.button("Get Shipping Label", on_click=set_import_view, args=("shipping_form",))
+        with c5:
+            with st.container(border=True):
+                st.subheader("🟥 YouTube")
+                st.caption("Import from URL.")
+                st.button("Import Video", on_click=set_import_view, args=("youtube_form",))
+        with c6:
+            with st.container(border=True):
+                st.subheader("🔄 Migrate S3")
+                st.caption("Clone existing bucket.")
+                st.button("Start Migration", on_click=set_import_view, args=("migrate_form",))
+
+    # --- VIEW B: UPLOAD TOOL (UPDATED WITH OWNER_ID) ---
+    elif st.session_state.import_view == "upload_tool":
+        st.title("☁️ AI Smart Upload")
+        st.button("← Back to Methods", on_click=set_import_view, args=("grid",))
+
+        uploaded_file = st.file_uploader("Drop video here to auto-generate metadata", type=['mp4', 'mov', 'mkv', 'avi'])
+
+        if uploaded_file:
+            st.info("ℹ️ Video detected. Click 'Analyze' to let AI write the title and tags.")
+            
+            if st.button("✨ Analyze Video with AI"):
+                try:
+                    # A local copy (hashed on the way) for the frame sampler; the
+                    # analysis itself runs in the background, see show_ai_status()
+                    spooled = spool_to_disk(uploaded_file)
+                    st.session_state.ai_job = get_analysis_service().submit(spooled.path, spooled.sha256,
+                                                                            remove_after=True)
+                except Exception as e:
+                    st.error(f"AI Error: {e}")
+
+            if st.session_state.get("ai_job"):
+                show_ai_status(st.session_state.ai_job)
+
+            with st.form("upload_form"):
+                st.write("### Edit & Confirm")
+                
+                pre_fill_desc = ""
+                if "raw_analysis" in st.session_state.ai_metadata:
+                    st.info("💡 Suggestions populated from AI analysis.")
+                    pre_fill_desc = st.session_state.ai_metadata["raw_analysis"]
+
+                video_title = st.text_input("Video Title", value="New Video")
+                video_category = st.selectbox("Category", ["Nature", "Tech", "People", "Business", "Abstract"])
+                video_price = st.text_input("Price", value="$50")
+                video_desc = st.text_area("Description / AI Analysis", value=pre_fill_desc, height=150)
+                
+                if st.form_submit_button("🚀 Upload to Marketplace"):
+                    try:
+                        # Duration, resolution, fps... straight from the headers
+                        video_meta = probe_columns(uploaded_file)
+
+                        # Copy to disk in chunks, hashing on the way
+                        spooled = spool_to_disk(uploaded_file)
+                        try:
+                            # Name the file by its content, so a repeat upload is recognised
+                            digest = spooled.sha256
+                            cached = get_artifact_cache().get(digest)
+                            if cached and cached["storage_name"]:
+                                # Same clip is already in the bucket: skip the upload
+                                file_name = cached["storage_name"]
+                                from video_processor import thumbnail_names
+
+                                thumbs = thumbnail_names(file_name)
+                            else:
+                                file_name = storage_name_for(digest)
+                                upload_to_storage(spooled.path, file_name, uploaded_file.type)
+
+                                # Poster + sprite sheet from the same local copy
+                                thumbs = upload_thumbnails(spooled.path, file_name)
+                                if thumbs:
+                                    # Only now can a repeat upload skip all of it: the clip
+                                    # and its thumbnails are both in the bucket
+                                    get_artifact_cache().put(digest, storage_name=file_name)
+
+                            # Near-duplicates (re-encoded or trimmed copies) are flagged, not blocked
+                            fingerprint = flag_duplicates(spooled.path)
+                        finally:
+                            spooled.remove()
+                        
+                        # --- NEW: SAVE OWNER ID ---
+                        owner_id = st.session_state.user.user.id if st.session_state.user else None
+                        
+                        inserted = get_supabase().table("videos_inventory").insert({
+                            "file_name": file_name,
+                            "title": video_title,
+                            "category": video_category,
+                            "price": video_price,
+                            "description": video_desc,
+                            "owner_id": owner_id,  # <--- Saving who uploaded it
+                            **thumbs,
+                            **video_meta
+                        }).execute()
+                        get_inventory().write_through(inserted.data)
+                        if fingerprint is not None and inserted.data:
+                            get_phash_index().add(inserted.data[0]["id"], fingerprint)
+                            get_phash_index().save()
+                        
+                        st.success("✅ Upload Complete!")
+                        st.session_state.ai_metadata = {} 
+                    except Exception as e:
+                        st.error(f"Upload Error: {e}")
+
+    # --- VIEW C: YOUTUBE IMPORT ---
+    elif st.session_state.import_view == "youtube_form":
+        st.title("🟥 Import from YouTube")
+        st.info("Paste a link below.")
+        st.button("← Back to Methods", on_click=set_import_view, args=("grid",))
+        yt_url = st.text_input("Paste YouTube Link here")
+        if st.button("Start Import"):
+            if not yt_url:
+                st.warning("Please paste a link first!")
+            else:
+                # Loaded on the first import only, not on every page view
+                try:
+                    import yt_dlp
+                except ImportError:
+                    st.error("⚠️ Missing Library! Please stop the app and run: pip install yt-dlp")
+                    return
+                status_box = st.empty()
+                status_box.write("⏳ Initializing downloader...")
+                # Downloaded into a scratch folder that is removed however the import ends
+                job = get_scratch().job("yt_down")
+                try:
+                    timestamp = int(datetime.now().timestamp())
+                    file_pattern = job.file(f"yt_down_{timestamp}")
+                    ydl_opts = {
+                        'format': 'best[height<=720]', 
+                        'outtmpl': f"{file_pattern}.%(ext)s", 
+                        'quiet': True, 
+                        'noplaylist': True
+                    }
+                    video_title = "Imported Video"
+                    final_filename = None
+                    with tracing.span("youtube.download"), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                        info = ydl.extract_info(yt_url, download=True)
+                        video_title = info.get('title', 'YouTube Import')
+                    
+                    found_files = glob.glob(f"{file_pattern}.*")
+                    if found_files:
+                        final_filename = found_files[0]
+                        status_box.write(f"🚀 Uploading '{video_title}' to cloud...")
+                        cloud_name = f"yt_{timestamp}.mp4"
+                        upload_to_storage(final_filename, cloud_name, "video/mp4")
+                        
+                        thumbs = upload_thumbnails(final_filename, cloud_name)
+                        video_meta = probe_columns(final_filename)
+
+                        # --- NEW: SAVE OWNER ID FOR YOUTUBE IMPORTS ---
+                        owner_id = st.session_state.user.user.id if st.session_state.user else None
+                        
+                        inserted = get_supabase().table("videos_inventory").insert({
+                            "file_name": cloud_name,
+                            "title": video_title,
+                            "category": "Social Import",
+                            "price": "$50",
+                            "owner_id": owner_id, # <--- Saving who imported it
+                            **thumbs,
+                            **video_meta
+                        }).execute()
+                        get_inventory().write_through(inserted.data)
+                        status_box.success(f"✅ Success! '{video_title}' is ready in the Marketplace.")
+                    else:
+                        status_box.error("Error: Download finished but no file was found.")
+                except Exception as e:
+                    status_box.error(f"Something went wrong: {e}")
+                finally:
+                    job.close()
+
+        # Many links / whole playlists at once (see batch_importer.py)
+        with st.expander("📚 Batch import (many links or playlists)"):
+            yt_urls = st.text_area("One YouTube link or playlist per line", height=150)
+            if st.button("Start Batch Import"):
+                urls = [line for line in yt_urls.splitlines() if line.strip()]
+                if not urls:
+                    st.warning("Please paste at least one link!")
+                else:
+                    # Worker threads can't use st.session_state, so capture what they need now
+                    from batch_importer import BatchImporter, YtDlpDownloader
+
+                    access_token = current_access_token()
+                    owner_id = st.session_state.user.user.id if st.session_state.user else None
+                    importer = BatchImporter(
+                        downloader=YtDlpDownloader(),
+                        upload=lambda path, name: get_uploader().upload(path, name, "video/mp4", access_token=access_token),
+                        insert_rows=lambda rows: get_supabase().table("videos_inventory").insert(rows).execute().data,
+                        prepare=lambda path, name: {**upload_thumbnails(path, name), **probe_columns(path)},
+                        row_defaults={"category": "Social Import", "price": "$50", "owner_id": owner_id},
+                    )
+                    progress_table = st.empty()
+                    summary = importer.run(urls, poll=lambda items: progress_table.dataframe(
+                        [item.as_dict() for item in items]))
+                    get_inventory().write_through(importer.inserted)
+
+                    st.success(f"✅ Imported {summary['done']} of {summary['total']} videos "
+                               f"in {summary['seconds']}s ({summary['mb_per_s']} MB/s).")
+                    for failure in summary["failures"]:
+                        st.error(f"{failure['url']}: {failure['error']}")
+
+    # --- VIEW D: SHIPPING FORM ---
+    elif st.session_state.import_view == "shipping_form":
+        st.title("🚚 Hard Drive Logistics")
+        st.button("← Back to Methods", on_click=set_import_view, args=("grid",))
+        with st.form("shipping_form"):
+            contact_email = st.text_input("Contact Email")
+            drive_count = st.number_input("Number of Hard Drives", min_value=1)
+            address = st.text_area("Pickup Address")
+            if st.form_submit_button("Submit Request"):
+                try:
+                    get_supabase().table("service_requests").insert({
+                        "request_type": "Shipping",
+                        "user_contact": contact_email,
+                        "details": f"Drives: {drive_count} | Addr: {address}",
+                        "status": "Pending"
+                    }).execute()
+                    st.success("Request Received!")
+                except:
+                     st.info("Simulation: Request received (Database table 'service_requests' missing)")
+
+    # --- VIEW E: S3 CONFIG FORM ---
+    elif st.session_state.import_view == "s3_form":
+        st.title("🔶 Configure Amazon S3")
+        st.button("← Back to Methods", on_click=set_import_view, args=("grid",))
+        with st.form("s3_setup"):
+            bucket_name = st.text_input("S3 Bucket Name")
+            region = st.selectbox("AWS Region", ["us-east-1", "eu-central-1"])
+            if st.form_submit_button("Connect Bucket"):
+                try:
+                    get_supabase().table("service_requests").insert({
+                        "request_type": "S3 Connection",
+                        "user_contact": "Admin",
+                        "details": f"Bucket: {bucket_name} | Region: {region}",
+                        "status": "Pending"
+                    }).execute()
+                    st.success("Configuration Saved.")
+                except:
+                    st.info("Simulation: Config saved (Database table 'service_requests' missing)")
+
+    # --- VIEW F: CLOUD STORAGE FORM ---
+    elif st.session_state.import_view == "cloud_form":
+        st.title("📦 Import from Cloud Storage")
+        st.info("Paste a public shared link from Dropbox or Google Drive.")
+        st.button("← Back to Methods", on_click=set_import_view, args=("grid",))
+        with st.form("cloud_setup"):
+            service = st.selectbox("Service Provider", ["Google Drive", "Dropbox", "OneDrive"])
+            shared_link = st.text_input("Paste Shared Folder Link")
+            notes = st.text_area("Additional Notes")
+            if st.form_submit_button("Submit Link"):
+                try:
+                    get_supabase().table("service_requests").insert({
+                        "request_type": "Cloud Import",
+                        "user_contact": "Admin",
+                        "details": f"Service: {service} | Link: {shared_link}",
+                        "status": "Pending Review"
+                    }).execute()
+                    st.success("Link Received! System will attempt to index files.")
+                except:
+                    st.info("Simulation: Link received (Database table 'service_requests' missing)")
+
+    # --- VIEW G: MIGRATION FORM ---
+    elif st.session_state.import_view == "migrate_form":
+        st.title("🔄 Mass Data Migration")
+        st.info("Request a server-to-server migration for large datasets (>1TB).")
+        st.button("← Back to Methods", on_click=set_import_view, args=("grid",))
+        with st.form("migration_setup"):
+            source_provider = st.text_input("Source Provider (e.g. AWS, Azure)")
+            estimated_size = st.text_input("Estimated Data Size (e.g. 50TB)")
+            contact_email = st.text_input("Technical Contact Email")
+            if st.form_submit_button("Request Migration"):
+                try:
+                    get_supabase().table("service_requests").insert({
+                        "request_type": "Migration",
+                        "user_contact": contact_email,
+                        "details": f"Source: {source_provider} | Size: {estimated_size}",
+                        "status": "Pending Assessment"
+                    }).execute()
+                    st.success("Migration Request Logged. An engineer will contact you.")
+                except:
+                    st.info("Simulation: Request logged (Database table 'service_requests' missing)")
@@ -0,0 +1,80 @@
+# app_pages/marketplace.py
+# The public Marketplace: search, one page of cards, Buy License / Download.
+import streamlit as st
+
+import tracing
+from app_services import (current_email, get_entitlements, get_search_index, get_urls, poster_url,
+                          public_url_for, record_sale)
+from video_grid import render_video_grid
+
+
+def render(all_videos):
+    st.title("Browse Available Licenses")
+    st.caption("Welcome to the public marketplace.")
+
+    # Search Bar
+    search_query = st.text_input("Search videos...", placeholder="Search by title or category")
+
+    # Filter Logic
+    # Looks up title, category and description in the index, best match first
+    display_videos = all_videos
+    if search_query:
+        display_videos = get_search_index().search(search_query)
+
+    if not display_videos:
+        st.info("No videos found.")
+        return
+
+    # One lookup for the whole list: which of these does the user own?
+    owned = set(get_entitlements().owned(current_email(), [v.get('id') for v in display_videos]))
+    try:
+        # Sign every owned file in one request; the cards below read the cache
+        get_urls().signed_urls([v['file_name'] for v in display_videos if v.get('id') in owned])
+    except Exception as e:
+        tracing.error("storage.signed_urls", e)
+
+    def download_url(video, public_url):
+        # Expiring signed link for a licensed download (public URL if signing fails)
+        try:
+            return get_urls().signed_url(video['file_name']) or public_url
+        except Exception as e:
+            tracing.error("storage.signed_url", e)
+            return public_url
+
+    # A fragment per card: "Buy License" re-runs only this card
+    @st.fragment
+    def marketplace_details(video, public_url):
+        vid_id = video.get('id')
+        st.write(f"**{video.get('title', 'Untitled')}**")
+        st.caption(f"📂 {video.get('category', 'General')} | 🏷️ {video.get('price','$50')}")
+
+        if vid_id in owned:
+            st.link_button("⬇️ Download", download_url(video, public_url))
+        else:
+            # --- Buy Logic ---
+            if st.session_state.user:
+                if st.button("Buy License", key=f"btn_{vid_id}"):
+                    with st.spinner("Processing payment..."):
+                        try:
+                            # Idempotent: a double click never buys twice
+                            row = get_entitlements().purchase(current_email(), vid_id, video.get('price', '$50'))
+                            if row:
+                                record_sale(row)
+
+                            # Already applied locally: show the download right here
+                            owned.add(vid_id)
+                            st.success("License Purchased!")
+                            st.link_button("⬇️ Download", download_url(video, public_url))
+                        except Exception as e:
+                            st.error(f"Purchase failed: {e}")
+            else:
+                st.warning("🔒 Log in to buy")
+
+    # Only one page of cards is drawn; a player is mounted only on click
+    render_video_grid(
+        display_videos, key="marketplace", columns=2, reset_on=search_query,
+        # Helper to safely get URL (built once per file, then cached)
+        url_for=public_url_for,
+        poster_for=poster_url,
+        render_details=marketplace_details,
+    )
@@ -0,0 +1,43 @@
+# app_pages/my_uploads.py
+# The logged-in user's own videos: a table, then the paginated grid.
+import streamlit as st
+
+from app_services import current_user_id, poster_url, public_url_for
+from video_grid import render_video_grid
+
+
+def render(all_videos):
+    st.title("📂 My Uploaded Videos")
+
+    if not st.session_state.user:
+        st.warning("Please log in to view your uploads.")
+        return
+
+    # Filter videos where owner_id matches current user
+    my_videos = [v for v in all_videos if v.get('owner_id') == current_user_id()]
+
+    if not my_videos:
+        st.info("You haven't uploaded any videos yet. Go to 'Import Video' to start!")
+        return
+
+    import pandas as pd
+
+    st.write(f"You have uploaded **{len(my_videos)}** videos.")
+
+    # Display as a table first
+    st.dataframe(pd.DataFrame(my_videos))
+
+    st.divider()
+
+    # Display as Grid (one page at a time, player only on click)
+    def upload_details(video, public_url):
+        st.write(f"**{video.get('title', 'Untitled')}**")
+        st.caption(f"Status: Active | Price: {video.get('price')}")
+        st.button("Edit Metadata", key=f"edit_{video.get('id', video['file_name'])}") # Placeholder for future edit feature
+
+    render_video_grid(
+        my_videos, key="my_uploads", columns=3,
+        url_for=public_url_for,
+        poster_for=poster_url,
+        render_details=upload_details,
+    )
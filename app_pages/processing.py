@@ -0,0 +1,111 @@
+# app_pages/processing.py
+# "Upload New Video", below every page: Process & Watermark runs as a job in
+# the background (see job_queue.py) and this box polls it.
+import os
+
+import streamlit as st
+
+import tracing
+from app_services import get_artifact_cache, get_transcode_queue
+from artifact_cache import hash_file
+from hls_packager import ENCODER_PROFILES
+from scratch_space import get_scratch
+
+
+def show_processed(result):
+    st.success("✅ Video ready for marketplace!")
+
+    # Show the data we found
+    st.write("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Extracted Data:**")
+        st.json(result['metadata'])
+    with col2:
+        st.write("**Watermarked Preview:**")
+        # Hold the scratch artifact while reading it, so it can't be evicted under us
+        artifact = get_scratch().open_artifact(result['artifact_id']) if result.get('artifact_id') else None
+        try:
+            if result.get('preview_path') and os.path.exists(result['preview_path']):
+                st.video(result['preview_path'])
+            else:
+                st.info("This preview was cleaned up to free disk space. Process the video again to see it.")
+        finally:
+            if artifact:
+                artifact.release()
+
+    if result.get('hls'):
+        import pandas as pd
+
+        hls = result['hls']
+        st.write(f"**HLS ladder** ({hls['profile']} profile): encoded in {hls['encode_s']}s, "
+                 f"{hls['realtime_factor']}x realtime")
+        st.dataframe(pd.DataFrame(hls['renditions']), hide_index=True)
+
+    if result.get('stream_error'):
+        st.caption(f"Preview encoded with moviepy: the stream encoder couldn't handle this file "
+                   f"({result['stream_error']})")
+    if result.get('timings'):
+        st.caption("Stage timings: " + " · ".join(f"{name.split('.', 1)[-1]} {seconds:.2f}s"
+                                                   for name, seconds in result['timings'].items()))
+    if result.get('profile_path'):
+        st.caption(f"cProfile report: {result['profile_path']}")
+
+
+@st.fragment(run_every=2)
+def show_job_status(job_id):
+    # Re-runs by itself every 2 seconds - only this box, not the whole page
+    job = get_transcode_queue().status(job_id)
+    if job is None:
+        st.warning("This job is no longer known (the server may have restarted).")
+    elif job["status"] == "queued":
+        st.info(f"⏳ Waiting for a free worker... ({get_transcode_queue().queued_count()} in queue)")
+    elif job["status"] == "running":
+        st.progress(job["progress"] or 0.0, text=f"Creating preview: {job['stage']}")
+    elif job["status"] == "failed":
+        # If the engine fails, the job keeps the "error" it returned
+        st.error(f"Ouch! Something broke: {job['error']}")
+    else:
+        show_processed(job["result"])
+
+
+def render():
+    from job_queue import QueueFull
+
+    st.header("Upload New Video") # <--- This creates a header on the page
+
+    # 1. The Box where users drop files
+    uploaded_file = st.file_uploader("Choose a video file", type=['mp4', 'mov'])
+
+    # Optional: also build an adaptive streaming ladder (240p/480p/720p HLS)
+    hls_profile = st.selectbox("Streaming ladder (HLS)", ["Off"] + list(ENCODER_PROFILES),
+                               help="Encoder profile for the 240p/480p/720p HLS renditions")
+    # With tracing on, one job can also be run under cProfile
+    profile_job = tracing.enabled() and st.checkbox("Profile this job (cProfile)")
+
+    # 2. The Logic that runs when they upload
+    if uploaded_file is not None:
+        # We only show the "Process" button if a file is uploaded
+        if st.button("Step 1: Process & Watermark"):
+            st.session_state.process_job_id = None
+            st.session_state.process_cached = None
+
+            # Seen this exact file before? Then the preview is already on disk.
+            # (The cache keeps previews only, so an HLS ladder always goes to a job.)
+            digest = hash_file(uploaded_file)
+            options = {"hls_profile": hls_profile} if hls_profile != "Off" else None
+            cached = None if options or profile_job else get_artifact_cache().get(digest)
+            if cached and cached["preview_path"] and cached["metadata"]:
+                st.session_state.process_cached = cached
+            else:
+                try:
+                    # This hands the file to the "Engine" in a worker process and returns at once
+                    st.session_state.process_job_id = get_transcode_queue().submit(uploaded_file, digest=digest,
+                                                                                  options=options, profile=profile_job)
+                except QueueFull as e:
+                    st.warning(f"The server is busy: {e}")
+
+    if st.session_state.get("process_cached"):
+        show_processed(st.session_state.process_cached)
+    elif st.session_state.get("process_job_id"):
+        show_job_status(st.session_state.process_job_id)
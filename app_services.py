@@ -0,0 +1,262 @@
+# app_services.py
+# The shared services behind the Streamlit pages, set up once per server
+# process and imported by marketplace_app.py and app_pages/.
+#
+# marketplace_app.py used to import everything at the top - pandas, Gemini,
+# yt-dlp, moviepy (through video_processor) - and read the secrets, configure
+# Gemini and create the Supabase client in two duplicated setup blocks, before
+# drawing anything. A guest browsing the Marketplace needs none of the heavy
+# parts. Here:
+#   - settings() reads the secrets once; the Supabase client is the shared one
+#     from supabase_provider.py
+#   - every service is an @st.cache_resource getter that imports its module
+#     on first use, so pandas loads with the Dashboard, moviepy with the first
+#     upload, Gemini (configured right there, once) with the first analysis
+#   - only small modules are imported at the top of this file
+import time
+
+import streamlit as st
+
+import tracing
+from supabase_provider import get_client, get_provider
+
+
+# --- Setup ---
+
+# Read from .streamlit/secrets.toml once per server process
+@st.cache_resource
+def settings():
+    return {"url": st.secrets["supabase"]["url"], "key": st.secrets["supabase"]["key"],
+            "google_api_key": st.secrets["google"]["api_key"]}
+
+
+def load_settings():
+    # settings(), or an error on the page and a stopped script
+    try:
+        return settings()
+    except FileNotFoundError:
+        st.error("⚠️ Secrets file not found! Did you create .streamlit/secrets.toml?")
+        st.stop()
+    except KeyError as e:
+        st.error(f"⚠️ Secrets found, but {e} is missing! Check your spelling.")
+        st.stop()
+    except Exception as e:
+        st.error(f"⚠️ Configuration Error: {e}")
+        st.stop()
+
+
+def get_supabase():
+    # The client (The Bridge) - one per server process, see supabase_provider.py
+    return get_client(settings()["url"], settings()["key"])
+
+
+def fresh_auth_client():
+    # Auth keeps the user's session on the client, so never on the shared one
+    return get_provider(settings()["url"], settings()["key"]).fresh_client()
+
+
+# Local Prometheus endpoint for stage timings, if TROVEO_METRICS_PORT is set (see tracing.py)
+@st.cache_resource
+def start_metrics_endpoint():
+    return tracing.serve_metrics() if tracing.METRICS_PORT else None
+
+
+_first_render = {"done": False}
+
+
+def record_render(started):
+    # Time of this script run for /metrics; the process's first run (cold
+    # imports included) is also kept as "app.first_render"
+    seconds = time.perf_counter() - started
+    tracing.record("app.render", seconds)
+    if not _first_render["done"]:
+        _first_render["done"] = True
+        tracing.record("app.first_render", seconds)
+
+
+# --- Session ---
+
+def current_email():
+    return st.session_state.user.user.email if st.session_state.user else None
+
+
+def current_user_id():
+    return st.session_state.user.user.id if st.session_state.user else None
+
+
+def current_access_token():
+    session = getattr(st.session_state.user, "session", None)
+    return session.access_token if session else None
+
+
+# --- Shared resources ---
+
+# Content-hash cache shared by every session (see artifact_cache.py)
+@st.cache_resource
+def get_artifact_cache():
+    from artifact_cache import ArtifactCache
+
+    return ArtifactCache()
+
+
+# The videos_inventory snapshot, shared by every session (see inventory.py)
+@st.cache_resource
+def get_inventory():
+    from inventory import InventoryRepository
+
+    return InventoryRepository(get_supabase())
+
+
+# Typed columnar copy + ready-made Dashboard numbers (see analytics.py).
+# Created on first use; add_listener hands it the snapshot we already have.
+@st.cache_resource
+def get_analytics():
+    from analytics import InventoryAnalytics
+
+    analytics = InventoryAnalytics(get_supabase())
+    get_inventory().add_listener(analytics.on_inventory_change)
+    _created.add("analytics")
+    return analytics
+
+
+_created = set()
+
+
+def record_sale(row):
+    # Only Dashboard numbers that already exist need the new purchase: ones
+    # created later read it from the purchases table (so buying never loads pandas)
+    if "analytics" in _created:
+        get_analytics().record_purchase(row)
+
+
+# Licences per user, shared by all of that user's sessions (see entitlements.py)
+@st.cache_resource
+def get_entitlements():
+    from entitlements import EntitlementStore
+
+    return EntitlementStore(get_supabase())
+
+
+# Public URLs built once, signed download URLs in batches (see storage_urls.py)
+@st.cache_resource
+def get_urls():
+    from storage_urls import UrlService
+
+    return UrlService(get_supabase())
+
+
+# Search index over the same snapshot, told which rows changed (see search_index.py)
+@st.cache_resource
+def get_search_index():
+    from search_index import SearchIndex
+
+    index = SearchIndex()
+    get_inventory().add_listener(index.on_inventory_change)
+    return index
+
+
+# Chunked, resumable uploads to the "videos" bucket (see streaming_io.py)
+@st.cache_resource
+def get_uploader():
+    from streaming_io import ResumableUploader
+
+    return ResumableUploader(settings()["url"], settings()["key"])
+
+
+# Gemini analysis of sampled frames, in the background, cached by content hash.
+# Gemini is configured here, once per process, when the first analysis is asked for.
+@st.cache_resource
+def get_analysis_service():
+    import google.generativeai as genai
+    from ai_analysis import AnalysisService
+
+    genai.configure(api_key=settings()["google_api_key"])
+    return AnalysisService()
+
+
+# Perceptual fingerprints of every upload, to flag re-encoded/trimmed copies
+@st.cache_resource
+def get_phash_index():
+    from phash_index import PHashIndex
+
+    index = PHashIndex()
+    # Full reloads tell it which videos were deleted
+    get_inventory().add_listener(index.on_inventory_change)
+    return index
+
+
+# Processing runs in the background (job_queue.py), so the page never freezes
+# and uploads from different users wait their turn instead of fighting for CPU.
+@st.cache_resource
+def get_transcode_queue():
+    from job_queue import TranscodeQueue
+
+    return TranscodeQueue(cache=get_artifact_cache())
+
+
+# --- Helpers ---
+
+def public_url_for(video):
+    return get_urls().public_url(video['file_name'])
+
+
+def poster_url(video):
+    if video.get("poster_file"):
+        return get_urls().public_url(video["poster_file"])
+    return None
+
+
+def upload_to_storage(local_path, object_name, content_type="video/mp4"):
+    # Streams the file in chunks, as the logged-in user when there is one
+    return get_uploader().upload(local_path, object_name, content_type, access_token=current_access_token())
+
+
+# Poster + sprite sheet, stored in the bucket next to the video (see thumbnail_names)
+def upload_thumbnails(local_path, file_name):
+    # Returns the videos_inventory columns pointing at the uploaded images.
+    # A video without thumbnails still works (the grid shows a placeholder).
+    from scratch_space import get_scratch
+    from video_processor import thumbnails_for_file, thumbnail_names
+
+    try:
+        with get_scratch().job("thumbs") as job:
+            thumbs = thumbnails_for_file(local_path, job.path)
+            names = thumbnail_names(file_name)
+            bucket = get_supabase().storage.from_("videos")
+            for column, local_key, content_type in [("poster_file", "poster_path", "image/jpeg"),
+                                                    ("sprite_file", "sprite_path", "image/jpeg"),
+                                                    ("sprite_index_file", "sprite_index_path", "application/json")]:
+                with open(thumbs[local_key], "rb") as f:
+                    bucket.upload(names[column], f.read(), {"content-type": content_type, "upsert": "true"})
+        return names
+    except Exception as e:
+        tracing.error("storage.thumbnails", e)
+        return {}
+
+
+# Typed technical metadata for videos_inventory, read from the file headers
+def probe_columns(source):
+    from video_probe import probe
+
+    try:
+        return probe(source)
+    except Exception as e:
+        tracing.error("video.probe", e)
+        return {}
+
+
+def flag_duplicates(local_path):
+    # Warns about listings that look like this video; returns its fingerprint
+    from phash_index import fingerprint_video
+
+    try:
+        fingerprint = fingerprint_video(local_path)
+        matches = get_phash_index().find_duplicates(fingerprint)
+    except Exception as e:
+        tracing.error("phash.fingerprint", e)
+        return None
+    for match in matches[:3]:
+        video = get_inventory().get(match["video_id"]) or {}
+        st.warning(f"⚠️ Looks like a copy of \"{video.get('title', match['video_id'])}\" "
+                   f"({match['ratio']:.0%} of sampled frames match).")
+    return fingerprint
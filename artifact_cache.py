@@ -0,0 +1,169 @@
+# artifact_cache.py
+# Content-addressed cache for uploads.
+#
+# The same clip gets uploaded again and again. Instead of naming things by
+# timestamp, we hash the file (SHA-256, streamed in chunks) and key everything
+# by that hash:
+#   - the watermarked preview file (kept on local disk)
+#   - the metadata process_video() extracted
+#   - the storage object name in the Supabase "videos" bucket
+# So a repeat upload skips the transcode AND the storage upload.
+#
+# Local disk use is capped: when previews go over max_bytes, the least recently
+# used ones are deleted. The small rows (metadata, storage name) are kept.
+# The cache lives in the scratch space (cache/, see scratch_space.py), so it
+# counts against the same disk budget, and by default it takes at most half
+# of that budget.
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import scratch_space
+
+DEFAULT_ROOT = os.environ.get("TROVEO_CACHE_DIR", os.path.join(scratch_space.DEFAULT_ROOT, "cache"))
+DEFAULT_MAX_BYTES = int(os.environ.get("TROVEO_CACHE_MAX_BYTES", 5 * 1024 ** 3))
+SCRATCH_SHARE = 0.5
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(file_obj, chunk_size=CHUNK_SIZE):
+    # Streams the file through SHA-256 without loading it all into memory.
+    # Works on Streamlit's UploadedFile or any open binary file.
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def storage_name_for(digest, prefix="video"):
+    # The bucket object name is derived from the content, not the clock
+    return f"{prefix}_{digest}.mp4"
+
+
+class ArtifactCache:
+
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = DEFAULT_MAX_BYTES
+            scratch = scratch_space.get_scratch()
+            if os.path.realpath(root).startswith(os.path.realpath(scratch.root) + os.sep):
+                # Leave the rest of the scratch budget to running jobs and their outputs
+                max_bytes = min(max_bytes, int(scratch.max_bytes * SCRATCH_SHARE))
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    digest TEXT PRIMARY KEY,
+                    preview_path TEXT,
+                    preview_bytes INTEGER DEFAULT 0,
+                    metadata TEXT,
+                    storage_name TEXT,
+                    last_used REAL
+                )""")
+
+    @contextmanager
+    def _connect(self):
+        # A transaction that is committed (or rolled back) and then closed
+        db = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, digest):
+        # Returns the cached entry (dict) or None, and counts the hit/miss
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM artifacts WHERE digest = ?", (digest,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE artifacts SET last_used = ? WHERE digest = ?", (time.time(), digest))
+
+        entry = None
+        if row is not None:
+            entry = dict(row)
+            entry["metadata"] = json.loads(entry["metadata"]) if entry["metadata"] else None
+            # The preview may have been evicted (or deleted by hand)
+            if entry["preview_path"] and not os.path.exists(entry["preview_path"]):
+                entry["preview_path"] = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(self, digest, preview_path=None, metadata=None, storage_name=None):
+        # Adds or updates an entry. A preview file is MOVED into the cache
+        # folder, and the new path is returned in the entry.
+        fields = {"last_used": time.time()}
+        if preview_path:
+            folder = os.path.join(self.root, digest)
+            os.makedirs(folder, exist_ok=True)
+            cached_path = os.path.join(folder, "preview.mp4")
+            shutil.move(preview_path, cached_path)
+            fields["preview_path"] = cached_path
+            fields["preview_bytes"] = os.path.getsize(cached_path)
+        if metadata is not None:
+            fields["metadata"] = json.dumps(metadata)
+        if storage_name:
+            fields["storage_name"] = storage_name
+
+        columns = ", ".join(fields)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in fields)
+        with self._connect() as db:
+            db.execute(f"INSERT INTO artifacts (digest, {columns}) VALUES (?{', ?' * len(fields)}) "
+                       f"ON CONFLICT(digest) DO UPDATE SET {updates}", (digest, *fields.values()))
+
+        if preview_path:
+            self._evict(keep=digest)
+        return self.peek(digest)
+
+    def peek(self, digest):
+        # Like get(), but does not count as a hit/miss or touch the LRU order
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM artifacts WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["metadata"] = json.loads(entry["metadata"]) if entry["metadata"] else None
+        return entry
+
+    def _evict(self, keep=None):
+        # Deletes the least recently used previews, oldest first, until we are
+        # under budget. `keep` (the entry just put) is never deleted, even if
+        # it alone is over the budget.
+        with self._lock, self._connect() as db:
+            rows = db.execute("SELECT digest, preview_path, preview_bytes FROM artifacts "
+                              "WHERE preview_path IS NOT NULL ORDER BY last_used ASC").fetchall()
+            total = sum(size or 0 for _, _, size in rows)
+            for digest, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if digest == keep:
+                    continue
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+                db.execute("UPDATE artifacts SET preview_path = NULL, preview_bytes = 0 WHERE digest = ?",
+                           (digest,))
+                total -= size or 0
+
+    def stats(self):
+        with self._connect() as db:
+            entries, used = db.execute("SELECT COUNT(*), COALESCE(SUM(preview_bytes), 0) FROM artifacts").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries,
+                "bytes": used, "max_bytes": self.max_bytes}
@@ -0,0 +1,245 @@
+# batch_importer.py
+# Import many YouTube links (or whole playlists) in one go.
+#
+# The single-URL view downloads, uploads and inserts one video at a time.
+# Here the steps are pipelined:
+#   download workers -> upload workers -> batched videos_inventory inserts
+# A few downloads run side by side (yt_dlp progress hooks feed per-item
+# progress), and each finished file goes straight to an upload worker, so
+# network and disk work overlap. Rows are inserted in batches. Failed steps
+# are retried, and run() ends with a summary.
+#
+# The downloader, the upload function and the insert function are passed in,
+# so a local stand-in can replace YouTube and Supabase (see
+# benchmarks/bench_batch_import.py).
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+from scratch_space import get_scratch
+
+QUEUED, DOWNLOADING, UPLOADING, SAVING, DONE, FAILED = (
+    "queued", "downloading", "uploading", "saving", "done", "failed")
+
+
+class ImportItem:
+    def __init__(self, url):
+        self.url = url
+        self.title = None
+        self.status = QUEUED
+        self.progress = 0.0
+        self.attempts = 0
+        self.error = None
+        self.path = None
+        self.file_name = None
+        self.bytes = 0
+        self.row = None
+
+    def as_dict(self):
+        return {"url": self.url, "title": self.title, "status": self.status,
+                "progress": round(self.progress, 3), "attempts": self.attempts, "error": self.error}
+
+
+class YtDlpDownloader:
+    # The real thing: yt_dlp, capped at 720p like the single-URL import
+
+    def __init__(self, format="best[height<=720]"):
+        self.format = format
+
+    def expand(self, url):
+        # A playlist URL becomes the list of its video URLs; a video stays itself
+        import yt_dlp
+
+        with yt_dlp.YoutubeDL({"quiet": True, "extract_flat": "in_playlist"}) as ydl:
+            info = ydl.extract_info(url, download=False)
+        if info.get("_type") == "playlist":
+            return [entry.get("url") or entry.get("webpage_url") for entry in info.get("entries") or []
+                    if entry]
+        return [url]
+
+    def download(self, url, out_dir, progress_hook):
+        # Returns (local path, title, video id)
+        import yt_dlp
+
+        opts = {"format": self.format, "outtmpl": os.path.join(out_dir, "%(id)s.%(ext)s"),
+                "quiet": True, "noplaylist": True, "progress_hooks": [progress_hook]}
+        with tracing.span("youtube.download") as download, yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            downloads = info.get("requested_downloads") or [{}]
+            path = downloads[0].get("filepath") or ydl.prepare_filename(info)
+            if os.path.exists(path):
+                download.add_bytes(os.path.getsize(path))
+        return path, info.get("title", "YouTube Import"), info.get("id")
+
+
+class BatchImporter:
+
+    def __init__(self, downloader, upload, insert_rows, prepare=None, download_workers=3, upload_workers=2,
+                 insert_batch_size=20, max_attempts=3, retry_delay=1.0, row_defaults=None, work_dir=None):
+        # upload(local_path, object_name)    -> pushes the file to storage
+        # insert_rows(list of rows)          -> inserted rows (response.data)
+        # prepare(local_path, object_name)   -> extra columns (thumbnails, probe...), optional
+        self.downloader = downloader
+        self.upload = upload
+        self.insert_rows = insert_rows
+        self.prepare = prepare
+        self.download_workers = download_workers
+        self.upload_workers = upload_workers
+        self.insert_batch_size = insert_batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay  # doubles after every failed attempt
+        self.row_defaults = row_defaults or {"category": "Social Import", "price": "$50"}
+        self.work_dir = work_dir
+        self.items = []
+        self.inserted = []
+        self._pending_rows = []
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._finished = threading.Event()
+
+    # --- Public ---
+
+    def run(self, urls, poll=None, poll_interval=0.5):
+        # Blocks until every item is done or failed. poll(items) is called from
+        # THIS thread every poll_interval seconds (safe for Streamlit widgets).
+        start = time.time()
+        work_dir = self.work_dir or get_scratch().job("yt_batch").path
+        self.items = [ImportItem(video_url) for url in urls for video_url in self._expand(url)]
+        self._remaining = len(self.items)
+        if not self.items:
+            self._finished.set()
+
+        uploads = ThreadPoolExecutor(self.upload_workers, thread_name_prefix="yt-upload")
+        downloads = ThreadPoolExecutor(self.download_workers, thread_name_prefix="yt-download")
+        try:
+            for item in self.items:
+                downloads.submit(self._download, item, work_dir, uploads)
+            while not self._finished.wait(poll_interval):
+                if poll:
+                    poll(self.items)
+        finally:
+            downloads.shutdown(wait=True)
+            uploads.shutdown(wait=True)
+            self._flush(force=True)
+            if not self.work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        if poll:
+            poll(self.items)
+        return self.summary(time.time() - start)
+
+    def summary(self, seconds):
+        done = [item for item in self.items if item.status == DONE]
+        failed = [item for item in self.items if item.status == FAILED]
+        total_bytes = sum(item.bytes for item in done)
+        return {"total": len(self.items), "done": len(done), "failed": len(failed),
+                "bytes": total_bytes, "seconds": round(seconds, 2),
+                "mb_per_s": round(total_bytes / 1e6 / seconds, 2) if seconds else 0.0,
+                "failures": [{"url": item.url, "error": item.error} for item in failed]}
+
+    # --- Pipeline steps ---
+
+    def _expand(self, url):
+        url = url.strip()
+        if not url:
+            return []
+        try:
+            return self.downloader.expand(url)
+        except Exception:
+            return [url]  # Let the download step report the real error
+
+    def _download(self, item, work_dir, uploads):
+        def hook(d):
+            if d.get("status") == "downloading":
+                total = d.get("total_bytes") or d.get("total_bytes_estimate")
+                if total:
+                    item.progress = 0.8 * d.get("downloaded_bytes", 0) / total
+
+        while True:
+            item.attempts += 1
+            item.status = DOWNLOADING
+            try:
+                item.path, item.title, video_id = self.downloader.download(item.url, work_dir, hook)
+                item.bytes = os.path.getsize(item.path)
+                item.file_name = f"yt_{video_id or int(time.time() * 1000)}.mp4"
+                break
+            except Exception as e:
+                if not self._retry(item, e):
+                    return
+        # Hand over at once: this download worker is free for the next URL
+        item.status = UPLOADING
+        item.progress = 0.8
+        uploads.submit(self._upload, item)
+
+    def _upload(self, item):
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                self.upload(item.path, item.file_name)
+                extra = self.prepare(item.path, item.file_name) if self.prepare else {}
+                break
+            except Exception as e:
+                if attempts >= self.max_attempts:
+                    self._fail(item, e)
+                    return
+                self._backoff(attempts)
+        os.remove(item.path)
+        item.status = SAVING
+        item.progress = 0.95
+        item.row = {"file_name": item.file_name, "title": item.title, **self.row_defaults, **extra}
+        with self._lock:
+            self._pending_rows.append(item)
+        self._flush()
+
+    def _retry(self, item, error):
+        if item.attempts >= self.max_attempts:
+            self._fail(item, error)
+            return False
+        self._backoff(item.attempts)
+        return True
+
+    def _backoff(self, attempt):
+        time.sleep(min(self.retry_delay * 2 ** (attempt - 1), 30))
+
+    def _flush(self, force=False):
+        # Inserts the waiting rows in one request once there are enough of them,
+        # or when everything else is finished
+        with self._lock:
+            waiting = len(self._pending_rows)
+            if not waiting or (not force and waiting < self.insert_batch_size and waiting < self._remaining):
+                return
+            batch, self._pending_rows = self._pending_rows, []
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.inserted.extend(self.insert_rows([item.row for item in batch]) or [])
+                break
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    for item in batch:
+                        self._fail(item, e)
+                    return
+                self._backoff(attempt)
+        for item in batch:
+            item.status = DONE
+            item.progress = 1.0
+            self._item_finished()
+
+    def _fail(self, item, error):
+        item.status = FAILED
+        item.error = str(error)
+        if item.path and os.path.exists(item.path):
+            os.remove(item.path)
+        self._item_finished()
+
+    def _item_finished(self):
+        with self._lock:
+            self._remaining -= 1
+            remaining, waiting = self._remaining, len(self._pending_rows)
+        if remaining <= 0:
+            self._finished.set()
+        elif waiting and waiting >= remaining:
+            # Everyone still in flight is waiting for an insert: do it now
+            self._flush(force=True)
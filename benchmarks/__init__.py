@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Benchmark scripts and the suite (python -m benchmarks.suite); see suite.py.
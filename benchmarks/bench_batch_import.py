@@ -0,0 +1,113 @@
+# benchmarks/bench_batch_import.py
+# Batch YouTube import with local stand-ins for yt_dlp and Supabase.
+# Compares one-at-a-time (like the single-URL view) with the pipelined
+# importer, and shows the per-item retries and the end summary.
+#
+# Run it from the repo root:
+#   python benchmarks/bench_batch_import.py --videos 24
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_importer import BatchImporter  # noqa: E402
+
+
+class LocalDownloader:
+    # Pretends to download: writes a file at a fixed "network" speed and
+    # fails now and then, reporting progress like yt_dlp's hooks do
+    def __init__(self, seconds=0.2, size=2_000_000, failure_rate=0.1, seed=1):
+        self.seconds = seconds
+        self.size = size
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+
+    def expand(self, url):
+        if url.startswith("playlist:"):
+            name, count = url.split(":")[1:]
+            return [f"video:{name}-{i}" for i in range(int(count))]
+        return [url]
+
+    def download(self, url, out_dir, progress_hook):
+        video_id = url.split(":")[-1]
+        path = os.path.join(out_dir, f"{video_id}.mp4")
+        steps = 4
+        for step in range(1, steps + 1):
+            time.sleep(self.seconds / steps)
+            progress_hook({"status": "downloading", "downloaded_bytes": self.size * step // steps,
+                           "total_bytes": self.size})
+        if self.rng.random() < self.failure_rate:
+            raise IOError("connection reset (simulated)")
+        with open(path, "wb") as f:
+            f.write(os.urandom(self.size))
+        return path, f"Video {video_id}", video_id
+
+
+class LocalStorage:
+    def __init__(self, seconds=0.15):
+        self.seconds = seconds
+        self.objects = {}
+        self.insert_calls = 0
+        self.rows = []
+
+    def upload(self, path, name):
+        time.sleep(self.seconds)
+        self.objects[name] = os.path.getsize(path)
+
+    def insert_rows(self, rows):
+        self.insert_calls += 1
+        self.rows.extend(rows)
+        return [dict(row, id=len(self.rows) - len(rows) + i + 1) for i, row in enumerate(rows)]
+
+
+def serial(urls, downloader, storage, work_dir):
+    # The single-URL view, in a loop
+    start = time.time()
+    for url in urls:
+        for video_url in downloader.expand(url):
+            for attempt in range(3):
+                try:
+                    path, title, video_id = downloader.download(video_url, work_dir, lambda d: None)
+                    break
+                except IOError:
+                    continue
+            else:
+                continue
+            storage.upload(path, f"yt_{video_id}.mp4")
+            storage.insert_rows([{"file_name": f"yt_{video_id}.mp4", "title": title}])
+            os.remove(path)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch import pipeline with local stand-ins")
+    parser.add_argument("--videos", type=int, default=24)
+    parser.add_argument("--download-workers", type=int, default=3)
+    parser.add_argument("--upload-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    urls = [f"playlist:demo:{args.videos}"]
+
+    storage = LocalStorage()
+    serial_s = serial(urls, LocalDownloader(), storage, work_dir)
+    print(f"one at a time : {serial_s:6.2f}s  ({storage.insert_calls} insert calls)")
+
+    storage = LocalStorage()
+    importer = BatchImporter(LocalDownloader(), storage.upload, storage.insert_rows,
+                             download_workers=args.download_workers, upload_workers=args.upload_workers,
+                             insert_batch_size=10, retry_delay=0)
+    summary = importer.run(urls)
+    print(f"pipelined     : {summary['seconds']:6.2f}s  ({storage.insert_calls} insert calls)")
+    print(f"summary       : {summary['done']}/{summary['total']} done, {summary['failed']} failed, "
+          f"{summary['mb_per_s']} MB/s")
+    retried = [item for item in importer.items if item.attempts > 1]
+    print(f"retried items : {len(retried)}")
+
+
+if __name__ == "__main__":
+    main()
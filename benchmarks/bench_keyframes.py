@@ -0,0 +1,47 @@
+# benchmarks/bench_keyframes.py
+# Throughput (frames per second) of the scene-change keyframe detector, and
+# whether it finds the cuts of a synthetic clip whose cut times we know.
+#
+# Run it from the repo root:
+#   python benchmarks/bench_keyframes.py --width 1920 --height 1080 --scenes 6 --scene-seconds 5
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import make_scene_clip  # noqa: E402
+from keyframes import detect_keyframes  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scene-change keyframe detector throughput")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--scenes", type=int, default=6)
+    parser.add_argument("--scene-seconds", type=float, default=5)
+    parser.add_argument("--sample-fps", type=float, nargs="+", default=[2, 5, 10])
+    args = parser.parse_args()
+
+    path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+    try:
+        make_scene_clip(path, args.width, args.height, args.scenes, args.scene_seconds, args.fps)
+        # The first scene has no cut before it (frame 0 isn't scored as one)
+        cuts = [i * args.scene_seconds for i in range(1, args.scenes)]
+        print(f"Source: {args.width}x{args.height} @ {args.fps}fps, {args.scenes} scenes of {args.scene_seconds}s")
+        print(f"{'sample fps':>10} {'scanned':>8} {'seconds':>8} {'frames/s':>9} {'source fps':>11} {'cuts found':>11}")
+        for sample_fps in args.sample_fps:
+            result = detect_keyframes(path, k=args.scenes, sample_fps=sample_fps)
+            found = sum(any(abs(t - cut) <= 1.0 / sample_fps + 0.05 for t in result["times"]) for cut in cuts)
+            source_frames = result["frames_scanned"] * args.fps / sample_fps
+            print(f"{sample_fps:>10} {result['frames_scanned']:>8} {result['seconds']:>8.2f} "
+                  f"{result['frames_scanned'] / result['seconds']:>9.1f} {source_frames / result['seconds']:>11.1f} "
+                  f"{found:>5}/{len(cuts):<5}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
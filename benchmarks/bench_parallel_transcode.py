@@ -0,0 +1,65 @@
+# benchmarks/bench_parallel_transcode.py
+# How the segment-parallel preview encode scales with the number of workers,
+# and whether every run keeps the serial encode's duration and frame count.
+#
+# Run it from the repo root:
+#   python benchmarks/bench_parallel_transcode.py --seconds 120 --workers 1 2 4 8
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hls_packager  # noqa: E402
+from benchmarks.synthetic import make_clip, text_overlay  # noqa: E402
+from parallel_transcode import transcode, check_parity  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segment-parallel transcode scaling")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    try:
+        hls_packager.render_text_overlay(fontsize=10)
+    except Exception:
+        hls_packager.render_text_overlay = text_overlay
+
+    source = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+    # The serial encode (workers=1) is what every run is checked against
+    serial_out = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+    try:
+        make_clip(source, args.width, args.height, args.seconds, args.fps)
+        print(f"Source: {args.width}x{args.height} @ {args.fps}fps, {args.seconds}s, {os.cpu_count()} cores")
+        print(f"{'workers':>8} {'pieces':>7} {'seconds':>8} {'speedup':>8} {'frames':>13} {'duration':>17}  parity")
+
+        serial = transcode(source, serial_out, workers=1)
+        for workers in sorted(set(args.workers)):
+            out = serial_out
+            try:
+                if workers > 1:
+                    out = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+                    report = transcode(source, out, workers=workers)
+                else:
+                    report = serial
+                parity = check_parity(serial_out, out)
+            finally:
+                if out != serial_out:
+                    os.remove(out)
+            print(f"{workers:>8} {report['segments']:>7} {report['seconds']:>8.2f} "
+                  f"{serial['seconds'] / report['seconds']:>7.2f}x "
+                  f"{parity['output_frames']:>6}/{parity['serial_frames']:<6} "
+                  f"{parity['output_duration']:>8.2f}/{parity['serial_duration']:<8.2f}  "
+                  f"{'ok' if parity['ok'] else 'MISMATCH'}")
+    finally:
+        os.remove(source)
+        os.remove(serial_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_phash.py
+# The near-duplicate index at scale: build, save, memory-mapped load, and
+# lookup latency against a brute-force scan of every signature, plus recall
+# on planted near-duplicates (a few bits flipped, like a re-encode does).
+#
+# Run it from the repo root:
+#   python benchmarks/bench_phash.py --signatures 1000000 --queries 200
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phash_index import PHashIndex, popcount, N_FRAMES, MAX_DISTANCE  # noqa: E402
+
+
+def flip_bits(values, n_bits, rng):
+    # A copy of each hash with n_bits random bits flipped
+    flipped = values.copy()
+    for i in range(len(values)):
+        for bit in rng.choice(64, size=n_bits, replace=False):
+            flipped[i] ^= np.uint64(1) << np.uint64(bit)
+    return flipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perceptual-hash index at scale")
+    parser.add_argument("--signatures", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    hashes = rng.integers(0, 2 ** 63, size=args.signatures, dtype=np.int64).astype(np.uint64) * np.uint64(2) \
+        + rng.integers(0, 2, size=args.signatures, dtype=np.int64).astype(np.uint64)
+    video_ids = np.arange(args.signatures, dtype=np.int64) // N_FRAMES
+    picked = rng.choice(args.signatures, size=args.queries, replace=False)
+    queries = flip_bits(hashes[picked], MAX_DISTANCE // 2, rng)
+
+    folder = tempfile.mkdtemp(prefix="phash_bench_")
+    try:
+        start = time.perf_counter()
+        index = PHashIndex.build(hashes, video_ids, path=folder)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        index.save()
+        save_s = time.perf_counter() - start
+        size_mb = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder)) / 1e6
+
+        start = time.perf_counter()
+        index = PHashIndex(path=folder)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = 0
+        for query, position in zip(queries, picked):
+            ids, _ = index.search_hash(query)
+            found += video_ids[position] in ids
+        index_ms = (time.perf_counter() - start) * 1000 / args.queries
+        candidates = sum(len(index.candidates(query)) for query in queries)
+
+        start = time.perf_counter()
+        brute_found = 0
+        for query, position in zip(queries, picked):
+            near = popcount(hashes ^ query) <= MAX_DISTANCE
+            brute_found += video_ids[position] in video_ids[near]
+        brute_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+        print(f"Signatures: {args.signatures:,} ({args.signatures // N_FRAMES:,} videos), on disk {size_mb:.1f} MB")
+        print(f"  build {build_s:.2f}s, save {save_s:.2f}s, load (mmap) {load_s * 1000:.1f} ms")
+        print(f"  {'':>12} {'ms/query':>9} {'recall':>8}")
+        print(f"  {'index':>12} {index_ms:>9.3f} {found / args.queries:>8.1%}   "
+              f"({candidates / args.queries:,.0f} candidates checked per query)")
+        print(f"  {'brute force':>12} {brute_ms:>9.3f} {brute_found / args.queries:>8.1%}")
+        print(f"  speedup {brute_ms / index_ms:.1f}x")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
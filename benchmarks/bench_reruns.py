@@ -0,0 +1,142 @@
+# benchmarks/bench_reruns.py
+# What one click costs in the Streamlit app: backend calls and render time
+# per interaction, measured with Streamlit's AppTest (no browser, no server)
+# against the fake Supabase client that counts every request
+# (benchmarks/fake_supabase.py). "elements" is how many elements the run
+# sent to the browser (what had to be redrawn).
+#
+# The interactions: first Marketplace load (logged in), Next page, Play
+# preview, Buy License, a plain full rerun (what any widget outside a
+# fragment costs), opening Import Video, its AI Uploader, and Back.
+# With fragments only the card / the grid / the import view re-run, so
+# these should cost far less than a full rerun of the app.
+#
+# Run it from the repo root:
+#   python benchmarks/bench_reruns.py --rows 1000
+# Before/after: check out the older version next to this one and point at it
+#   git worktree add /tmp/before <commit>
+#   python benchmarks/bench_reruns.py --app /tmp/before/marketplace_app.py
+import argparse
+import os
+import statistics
+import sys
+import time
+import types
+
+import streamlit as st
+import supabase
+from streamlit.proto.WidgetStates_pb2 import WidgetStates
+from streamlit.runtime.scriptrunner import RerunData
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from benchmarks.fake_supabase import CountingClient  # noqa: E402
+from benchmarks.synthetic import make_rows  # noqa: E402
+
+
+class FragmentRunner(local_script_runner.LocalScriptRunner):
+    # AppTest re-runs the whole script on every interaction. The browser
+    # doesn't: a click on a widget drawn inside an @st.fragment re-runs only
+    # that fragment (sending the state of every widget on screen). This runner
+    # does the same, so the numbers are what a user's click really costs.
+    fragment_of = {}     # widget id -> id of the fragment that drew it
+    widget_states = {}   # widget id -> last known value (clicks not kept)
+    elements = 0         # elements sent to the browser so far
+
+    def run(self, widget_state=None, query_params=None, timeout=3, page_hash=""):
+        known = FragmentRunner.widget_states
+        fragment_id = None
+        for state in (widget_state.widgets if widget_state else []):
+            if state.WhichOneof("value") == "trigger_value" and state.trigger_value:
+                fragment_id = FragmentRunner.fragment_of.get(state.id)
+            known[state.id] = state
+        states = WidgetStates()
+        states.widgets.extend(known.values())
+        for widget_id in [i for i, s in known.items() if s.WhichOneof("value") == "trigger_value"]:
+            del known[widget_id]
+
+        # Replace (not coalesce with) the full run every new ScriptRunner starts with
+        self._requests._rerun_data = RerunData(
+            widget_states=states, page_script_hash=page_hash,
+            fragment_id_queue=[fragment_id] if fragment_id else [], is_fragment_scoped_rerun=bool(fragment_id))
+        try:
+            if not self._script_thread:
+                self.start()
+            local_script_runner.require_widgets_deltas(self, timeout)
+        finally:
+            self.join()
+
+        for msg in self.forward_msgs():
+            if msg.HasField("delta") and msg.delta.HasField("new_element"):
+                FragmentRunner.elements += 1
+                element = msg.delta.new_element
+                widget_id = getattr(getattr(element, element.WhichOneof("type")), "id", "")
+                if widget_id:
+                    FragmentRunner.fragment_of[widget_id] = msg.delta.fragment_id or None
+        return local_script_runner.parse_tree_from_messages(self.forward_msgs())
+
+
+def measure(results, name, client, action):
+    calls, elements = client.calls, FragmentRunner.elements
+    start = time.perf_counter()
+    at = action()
+    results.setdefault(name, []).append(((time.perf_counter() - start) * 1000, client.calls - calls,
+                                         FragmentRunner.elements - elements))
+    if at.exception:
+        raise RuntimeError(f"{name}: {at.exception[0].value}")
+
+
+def scenario(app, client, results):
+    at = AppTest.from_file(app, default_timeout=120)
+    at.secrets["supabase"] = {"url": "https://example.supabase.co", "key": "bench"}
+    at.secrets["google"] = {"api_key": "bench"}
+    at.session_state["user"] = types.SimpleNamespace(
+        user=types.SimpleNamespace(id="buyer", email="buyer@example.com"), session=None)
+
+    measure(results, "Marketplace load", client, at.run)
+    measure(results, "Next page", client, lambda: at.button(key="marketplace_next").click().run())
+    play = next(b for b in at.button if b.key and b.key.startswith("marketplace_play_"))
+    measure(results, "Play preview", client, lambda: play.click().run())
+    buy = next(b for b in at.button if b.key and b.key.startswith("btn_"))
+    measure(results, "Buy License", client, lambda: buy.click().run())
+    # Anything outside a fragment (search box, sidebar) still re-runs everything
+    measure(results, "Full app rerun", client, at.run)
+    measure(results, "Open Import Video", client, lambda: at.radio[0].set_value("Import Video").run())
+    uploader = next(b for b in at.button if b.label == "Use AI Uploader")
+    measure(results, "Use AI Uploader", client, lambda: uploader.click().run())
+    back = next(b for b in at.button if b.label == "← Back to Methods")
+    measure(results, "Back to Methods", client, lambda: back.click().run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend calls and render time per interaction")
+    parser.add_argument("--app", default=os.path.join(REPO, "marketplace_app.py"))
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    client = CountingClient(rows)
+    supabase.create_client = lambda *a, **k: client
+
+    app_test.LocalScriptRunner = FragmentRunner
+
+    results = {}
+    for _ in range(args.rounds):
+        # Every round starts cold: fresh tables, no shared resources
+        st.cache_resource.clear()
+        client.reset(rows)
+        FragmentRunner.fragment_of, FragmentRunner.widget_states = {}, {}
+        scenario(args.app, client, results)
+
+    print(f"{os.path.relpath(args.app)}: {args.rows:,} videos, median of {args.rounds} rounds")
+    print(f"  {'interaction':<20} {'ms':>8} {'calls':>6} {'elements':>9}")
+    for name, samples in results.items():
+        ms, calls, elements = (statistics.median(column) for column in zip(*samples))
+        print(f"  {name:<20} {ms:>8.1f} {calls:>6.0f} {elements:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_search.py
+# Marketplace search: the old list comprehension vs. the inverted index, timed
+# the way the Marketplace calls it (every match, no limit), plus a few changed
+# rows arriving from the inventory and the next search.
+#
+# Run it from the repo root:
+#   python benchmarks/bench_search.py --rows 100000
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import SEARCH_QUERIES, make_rows  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+
+def time_query(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the list comprehension and the search index")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n in args.rows:
+        rows = make_rows(n)
+        start = time.perf_counter()
+        index = SearchIndex()
+        index.sync(rows)
+        build_s = time.perf_counter() - start
+        print(f"\n{n} rows (index build {build_s:.2f}s)")
+        print(f"{'query':>20} {'scan ms':>10} {'index ms':>10} {'hits':>8}")
+        for query in SEARCH_QUERIES:
+            scan_ms = time_query(lambda: [v for v in rows if query.lower() in v['title'].lower()], args.repeat)
+            index_ms = time_query(lambda: index.search(query), args.repeat)
+            hits = len(index.search(query))
+            print(f"{query:>20} {scan_ms:10.2f} {index_ms:10.2f} {hits:8d}")
+
+        # 10 edited rows, as InventoryRepository passes them on (see add_listener)
+        changed = [dict(row, title=row["title"] + " edited") for row in rows[:10]]
+        start = time.perf_counter()
+        index.on_inventory_change(changed, full=False)
+        index.search(SEARCH_QUERIES[0])
+        print(f"{'10 rows changed':>20} {'':>10} {(time.perf_counter() - start) * 1000:10.2f}   (+ next search)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/bench_startup.py
+# Cold start of the Streamlit app: time to first render and resident memory
+# of one server process (worker), each scenario in a fresh Python process so
+# nothing is imported yet - like the first session after a deploy or restart.
+#
+#   guest          first render of the Marketplace for a guest
+#   Dashboard,     first render (logged in), then the first visit to that
+#   My Uploads,    page: "page ms" is what its lazy imports cost the first
+#   Import Video   user who opens it
+# "heavy" lists the big libraries that were loaded by the end. With
+# --importtime the scenarios also run under python -X importtime, and the
+# packages imported during the app's runs are ranked by their own import time.
+# The app runs against the fake Supabase client (benchmarks/fake_supabase.py).
+#
+# Run it from the repo root:
+#   python benchmarks/bench_startup.py --importtime
+# Before/after: check out the older version next to this one and point at it
+#   git worktree add /tmp/before <commit>
+#   python benchmarks/bench_startup.py --app /tmp/before/marketplace_app.py
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+SCENARIOS = ["guest", "Dashboard", "My Uploads", "Import Video"]
+HEAVY = ["pandas", "google.generativeai", "yt_dlp", "moviepy.editor", "numpy", "PIL.Image"]
+MARKER = "--- app run ---"  # on stderr: the importtime lines after it are the app's
+
+
+def resident_mb():
+    # Read here rather than from tracing.py: with --app, nothing of this repo is imported first
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(app, scenario, rows):
+    # In the child process: one cold start, result as a JSON line on stdout
+    import supabase
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.fake_supabase import CountingClient
+    from benchmarks.synthetic import make_rows
+
+    client = CountingClient(make_rows(rows))
+    supabase.create_client = lambda *a, **k: client
+
+    at = AppTest.from_file(app, default_timeout=120)
+    at.secrets["supabase"] = {"url": "https://example.supabase.co", "key": "bench"}
+    at.secrets["google"] = {"api_key": "bench"}
+    if scenario != "guest":
+        # owner_0 owns some of the rows, so My Uploads has a table to draw
+        at.session_state["user"] = types.SimpleNamespace(
+            user=types.SimpleNamespace(id="owner_0", email="owner_0@example.com"), session=None)
+
+    rss_before = resident_mb()
+    print(MARKER, file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    at.run()
+    first_ms = (time.perf_counter() - start) * 1000
+    page_ms = None
+    if scenario != "guest" and not at.exception:
+        start = time.perf_counter()
+        at.radio[0].set_value(scenario).run()
+        page_ms = (time.perf_counter() - start) * 1000
+    if at.exception:
+        raise RuntimeError(f"{scenario}: {at.exception[0].value}")
+    print(json.dumps({"first_ms": first_ms, "page_ms": page_ms, "rss_mb": resident_mb(),
+                      "rss_before_mb": rss_before, "modules": len(sys.modules),
+                      "heavy": [name for name in HEAVY if name in sys.modules]}))
+
+
+def import_report(stderr, top):
+    # -X importtime lines after MARKER: own (self) time per top-level package
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    per_package = {}
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        package = name.split(".")[0]
+        per_package[package] = per_package.get(package, 0) + int(self_us)
+    ranked = sorted(per_package.items(), key=lambda item: -item[1])
+    return [(package, round(us / 1000, 1)) for package, us in ranked[:top]], round(sum(per_package.values()) / 1000, 1)
+
+
+def spawn(app, scenario, rows, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        os.path.abspath(__file__), "--child", scenario, "--app", app, "--rows", str(rows)]
+    out = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO)
+    if out.returncode:
+        raise RuntimeError(f"{scenario} failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1]), out.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time to first render and memory per worker")
+    parser.add_argument("--app", default=os.path.join(REPO, "marketplace_app.py"))
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--importtime", action="store_true", help="also rank the app's imports (-X importtime)")
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--out", help="write the results as JSON here")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_scenario(args.app, args.child, args.rows)
+        return
+
+    print(f"{os.path.relpath(args.app, REPO)}: {args.rows:,} videos, median of {args.rounds} cold starts")
+    print(f"  {'scenario':<14} {'first ms':>9} {'page ms':>8} {'RSS MB':>7} {'modules':>8}  heavy")
+    results = {}
+    for scenario in args.scenarios:
+        runs = [spawn(args.app, scenario, args.rows)[0] for _ in range(args.rounds)]
+        page = [run["page_ms"] for run in runs if run["page_ms"] is not None]
+        results[scenario] = {"first_ms": round(statistics.median(run["first_ms"] for run in runs), 1),
+                             "page_ms": round(statistics.median(page), 1) if page else None,
+                             "rss_mb": round(statistics.median(run["rss_mb"] for run in runs), 1),
+                             "modules": runs[-1]["modules"], "heavy": runs[-1]["heavy"]}
+        r = results[scenario]
+        page_text = f"{r['page_ms']:>8.0f}" if r["page_ms"] is not None else f"{'-':>8}"
+        print(f"  {scenario:<14} {r['first_ms']:>9.0f} {page_text} {r['rss_mb']:>7.0f} {r['modules']:>8}  "
+              f"{', '.join(r['heavy']) or '-'}")
+
+    if args.importtime:
+        for scenario in args.scenarios:
+            _, stderr = spawn(args.app, scenario, args.rows, importtime=True)
+            ranked, total_ms = import_report(stderr, args.top)
+            results[scenario]["imports_ms"] = dict(ranked)
+            print(f"\n  {scenario}: {total_ms:.0f} ms importing during the app's runs")
+            for package, ms in ranked:
+                print(f"    {package:<28} {ms:>8.1f} ms")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"app": args.app, "rows": args.rows, "rounds": args.rounds, "scenarios": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_stream_encoder.py
+# The 480p preview encode, moviepy (write_videofile through the clip chain)
+# against the frame-batched stream engine (stream_encoder.py), on test clips
+# of growing length: encode time, frames per second, and the peak resident
+# memory of the Python process. Each run is a fresh Python process, so one
+# engine's memory doesn't count against the other. (The ffmpeg processes are
+# separate and about the same for both engines; they are not counted.)
+#
+# Run it from the repo root:
+#   python benchmarks/bench_stream_encoder.py --seconds 10 60 180
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+ENGINES = ["moviepy", "stream"]
+
+
+def encode_moviepy(source, out):
+    # What video_processor.process_video() did before stream_encoder.py
+    from moviepy.editor import VideoFileClip
+    from watermark import WatermarkEngine, PREVIEW_HEIGHT
+
+    clip = VideoFileClip(source, target_resolution=(PREVIEW_HEIGHT, None))
+    watermark = WatermarkEngine.for_preview(clip.reader.infos['video_size'], clip.size)
+    audio_file = out + ".m4a"
+    clip.fl_image(watermark.apply).write_videofile(out, codec='libx264', audio_codec='aac',
+                                                   temp_audiofile=audio_file, logger=None)
+    frames = clip.reader.nframes
+    clip.close()
+    if os.path.exists(audio_file):
+        os.remove(audio_file)
+    return frames
+
+
+def encode_stream(source, out, batch_frames):
+    from stream_encoder import encode_preview
+
+    return encode_preview(source, out, batch_frames=batch_frames)["frames"]
+
+
+def run_engine(engine, source, batch_frames):
+    # In the child process: one encode, result as a JSON line on stdout
+    from benchmarks.synthetic import use_text_stub
+
+    use_text_stub()
+    out = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+    try:
+        start = time.perf_counter()
+        frames = encode_moviepy(source, out) if engine == "moviepy" else encode_stream(source, out, batch_frames)
+        seconds = time.perf_counter() - start
+    finally:
+        os.remove(out)
+    print(json.dumps({"frames": frames, "seconds": seconds,
+                      "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def spawn(engine, source, batch_frames):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", engine, "--source", source,
+           "--batch-frames", str(batch_frames)]
+    out = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO)
+    if out.returncode:
+        raise RuntimeError(f"{engine} failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="moviepy vs. streamed preview encode: speed and memory")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[10, 60])
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--engines", nargs="+", default=ENGINES, choices=ENGINES)
+    parser.add_argument("--batch-frames", type=int, default=8)
+    parser.add_argument("--out", help="write the results as JSON here")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_engine(args.child, args.source, args.batch_frames)
+        return
+
+    from benchmarks.synthetic import make_clip
+
+    print(f"Source: {args.width}x{args.height} @ {args.fps}fps, stream batches of {args.batch_frames} frames")
+    print(f"  {'length':>7} {'engine':<8} {'seconds':>8} {'frames':>7} {'fps':>7} {'peak MB':>8}")
+    results = []
+    for seconds in args.seconds:
+        source = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+        try:
+            make_clip(source, args.width, args.height, seconds, args.fps)
+            for engine in args.engines:
+                r = spawn(engine, source, args.batch_frames)
+                r.update(engine=engine, length_s=seconds, fps=r["frames"] / r["seconds"])
+                results.append(r)
+                print(f"  {seconds:>6.0f}s {engine:<8} {r['seconds']:>8.2f} {r['frames']:>7} "
+                      f"{r['fps']:>7.1f} {r['peak_mb']:>8.0f}")
+        finally:
+            os.remove(source)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"width": args.width, "height": args.height, "fps": args.fps,
+                       "batch_frames": args.batch_frames, "runs": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
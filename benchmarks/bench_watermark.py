@@ -0,0 +1,97 @@
+# benchmarks/bench_watermark.py
+# Compares the OLD preview chain (composite at full size, then resize to 480p)
+# with the NEW one (decode at 480p, blend a cached overlay into the text box).
+#
+# Run it from the repo root:
+#   python benchmarks/bench_watermark.py --width 3840 --height 2160 --seconds 3
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from benchmarks import synthetic  # noqa: E402
+from watermark import (WatermarkEngine, render_text_overlay, preview_size,  # noqa: E402
+                       WATERMARK_FONTSIZE, WATERMARK_OPACITY, PREVIEW_HEIGHT)
+
+# moviepy 1.0.3's resize still asks Pillow for ANTIALIAS, which Pillow 10 removed
+if not hasattr(Image, "ANTIALIAS"):
+    Image.ANTIALIAS = Image.LANCZOS
+
+
+def text_overlay(fontsize):
+    # The real ImageMagick text if it is installed, otherwise a solid block of
+    # roughly the same size so the numbers are still comparable.
+    try:
+        return render_text_overlay(fontsize=fontsize)
+    except Exception:
+        return synthetic.text_overlay(fontsize=fontsize)
+
+
+def old_chain(path):
+    clip = VideoFileClip(path)
+    overlay = text_overlay(WATERMARK_FONTSIZE)
+    txt = ImageClip(overlay[..., :3]).set_mask(ImageClip(overlay[..., 3] / 255.0, ismask=True))
+    txt = txt.set_position('center').set_duration(clip.duration).set_opacity(WATERMARK_OPACITY)
+    return clip, CompositeVideoClip([clip, txt]).resize(height=PREVIEW_HEIGHT)
+
+
+def new_chain(path):
+    clip = VideoFileClip(path, target_resolution=(PREVIEW_HEIGHT, None))
+    source_size = clip.reader.infos['video_size']
+    scale = clip.size[1] / source_size[1]
+    engine = WatermarkEngine(text_overlay(max(8, round(WATERMARK_FONTSIZE * scale))), clip.size)
+    return clip, clip.fl_image(engine.apply)
+
+
+def run(chain, path, encode):
+    start = time.perf_counter()
+    source, preview = chain(path)
+    frames = 0
+    if encode:
+        out = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+        preview.write_videofile(out, codec='libx264', audio_codec='aac', logger=None)
+        frames = int(round(preview.duration * preview.fps))
+        os.remove(out)
+    else:
+        for _ in preview.iter_frames():
+            frames += 1
+    source.close()
+    elapsed = time.perf_counter() - start
+    return elapsed, frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the old and new watermark chains")
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--encode", action="store_true", help="include the libx264 encode in the timing")
+    args = parser.parse_args()
+
+    path = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4').name
+    try:
+        synthetic.make_clip(path, args.width, args.height, args.seconds, args.fps, audio=False)
+        print(f"Source: {args.width}x{args.height} @ {args.fps}fps, {args.seconds}s "
+              f"-> preview {preview_size((args.width, args.height))}")
+
+        results = {}
+        for name, chain in [("composite-then-resize", old_chain), ("resize-then-blend", new_chain)]:
+            elapsed, frames = run(chain, path, args.encode)
+            results[name] = elapsed
+            print(f"{name:>22}: {elapsed:7.2f}s  {frames / elapsed:7.1f} fps")
+
+        speedup = results["composite-then-resize"] / results["resize-then-blend"]
+        print(f"{'speedup':>22}: {speedup:7.1f}x")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/fake_supabase.py
+# A local stand-in for the Supabase client that counts every request, for
+# the benchmarks (no network, no project needed).
+#
+# It implements just enough of supabase-py for the app and its services:
+# table(...).select/eq/gt/in_/or_/order/limit/insert/upsert/execute, and
+# storage.from_(bucket).get_public_url/upload/create_signed_urls. Rows are
+# kept in id order, so "id > cursor ... limit n" pages (inventory,
+# purchases, entitlements) cost one page, not a scan of the whole table,
+# even at a million rows. Like PostgREST, filtering or ordering on a column
+# the table doesn't have is an error.
+#
+# tus_transport() is the same for storage uploads: an httpx transport that
+# answers the TUS requests of streaming_io.ResumableUploader.
+import bisect
+import types
+
+import httpx
+
+
+class CountingQuery:
+    # Just enough of the supabase-py query builder for the app
+    def __init__(self, client, table):
+        self.client, self.table = client, table
+        self.filters, self.columns, self.rows_in, self.n = [], [], None, None
+        self.after_id = None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def order(self, column, **kwargs):
+        self.columns.append(column)
+        return self
+
+    def or_(self, expression):
+        return self
+
+    def limit(self, n):
+        self.n = n
+        return self
+
+    def eq(self, column, value):
+        self.columns.append(column)
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.columns.append(column)
+        if column == "id":
+            self.after_id = value  # Rows are in id order: start right after it
+        else:
+            self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.rows_in = rows if isinstance(rows, list) else [rows]
+        return self
+
+    upsert = insert
+
+    def execute(self):
+        self.client.calls += 1
+        table = self.client.tables.setdefault(self.table, [])
+        if self.rows_in is not None:
+            return types.SimpleNamespace(data=self.client.insert(self.table, self.rows_in))
+        missing = [column for column in self.columns if table and column not in table[0]]
+        if missing:
+            # Like PostgREST: unknown columns are an error, not an empty filter
+            raise Exception(f"column {self.table}.{missing[0]} does not exist")
+        start = 0
+        if self.after_id is not None:
+            start = bisect.bisect_right(self.client.ids[self.table], self.after_id)
+        rows = []
+        for i in range(start, len(table)):
+            row = table[i]
+            if all(f(row) for f in self.filters):
+                rows.append(row)
+                if self.n and len(rows) == self.n:
+                    break
+        return types.SimpleNamespace(data=rows)
+
+
+class CountingBucket:
+    def __init__(self, client):
+        self.client = client
+
+    def get_public_url(self, name, *args):
+        self.client.calls += 1
+        return f"https://example.supabase.co/storage/v1/object/public/videos/{name}"
+
+    def upload(self, *args, **kwargs):
+        self.client.calls += 1
+
+    def create_signed_urls(self, paths, expires_in, *args):
+        self.client.calls += 1
+        return [{"path": path, "signedURL": f"https://example.supabase.co/storage/v1/object/sign/videos/{path}",
+                 "error": None} for path in paths]
+
+
+class CountingClient:
+
+    def __init__(self, videos=(), purchases=()):
+        self.calls = 0
+        self.tables = {}
+        self.ids = {}   # table -> its ids, ascending (for bisect)
+        self.reset(videos, purchases)
+        self.storage = types.SimpleNamespace(from_=lambda bucket: CountingBucket(self))
+        self.auth = types.SimpleNamespace(sign_out=lambda: None)
+
+    def reset(self, videos=(), purchases=()):
+        # Rows with an id keep it (they must come in id order); the rest are numbered
+        self.tables, self.ids = {}, {}
+        self.insert("videos_inventory", videos)
+        self.insert("purchases", purchases)
+
+    def insert(self, name, rows):
+        table = self.tables.setdefault(name, [])
+        ids = self.ids.setdefault(name, [])
+        inserted = []
+        for row in rows:
+            row = {"id": (ids[-1] + 1) if ids else 1, **row}
+            table.append(row)
+            ids.append(row["id"])
+            inserted.append(row)
+        return inserted
+
+    def table(self, name):
+        return CountingQuery(self, name)
+
+
+def tus_transport(stats=None):
+    # httpx transport that behaves like Supabase's TUS endpoint: create an
+    # upload (POST), append chunks at the right offset (PATCH), ask for the
+    # offset (HEAD). Bytes are counted, not kept.
+    stats = stats if stats is not None else {}
+    uploads = {}
+
+    def handle(request):
+        stats["requests"] = stats.get("requests", 0) + 1
+        if request.method == "POST":
+            location = f"{request.url}/{len(uploads) + 1}"
+            uploads[location] = 0
+            return httpx.Response(201, headers={"location": location})
+        location = str(request.url)
+        if request.method == "HEAD":
+            return httpx.Response(200, headers={"upload-offset": str(uploads[location])})
+        offset = int(request.headers["upload-offset"])
+        if offset != uploads[location]:
+            return httpx.Response(409)
+        uploads[location] += len(request.content)
+        stats["bytes"] = stats.get("bytes", 0) + len(request.content)
+        return httpx.Response(204, headers={"upload-offset": str(uploads[location])})
+
+    return httpx.MockTransport(handle)
@@ -0,0 +1,288 @@
+# benchmarks/suite.py
+# The benchmark suite: the hot paths, timed the same way on every run,
+# written as JSON and checked against a stored baseline.
+#
+#   process      process_video() end to end and per stage (tracing spans),
+#                on synthetic clips at a few resolutions
+#   marketplace  search index build and queries, licence lookups
+#   dashboard    analytics: full rebuild, cached summary, small update
+#   inventory    full and incremental sync, write-through of a new upload
+#   upload       spool to disk, TUS upload to a local fake server
+# Nothing leaves the machine: clips come from ffmpeg's test sources and the
+# database is benchmarks/fake_supabase.py, at 1k / 100k / 1M rows (the 1M
+# size needs about 5 GB of RAM; pass --rows 1000 100000 on smaller machines).
+#
+# Every case is a median over --repeat runs (one-off builds run once). With
+# --baseline, a case slower than baseline * (1 + --threshold) - and by more
+# than NOISE_FLOOR_MS - is a regression, and the run exits with status 1.
+#
+# Run it from the repo root:
+#   python -m benchmarks.suite --save-baseline benchmarks/baseline.json
+#   python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.2
+#   python -m benchmarks.suite --only dashboard inventory --rows 1000 100000
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import httpx  # noqa: E402
+
+import tracing  # noqa: E402
+from analytics import InventoryAnalytics  # noqa: E402
+from entitlements import EntitlementStore  # noqa: E402
+from inventory import InventoryRepository  # noqa: E402
+from job_queue import SpooledUpload  # noqa: E402
+from scratch_space import get_scratch  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+from streaming_io import ResumableUploader, spool_to_disk  # noqa: E402
+
+from benchmarks.fake_supabase import CountingClient, tus_transport  # noqa: E402
+from benchmarks.synthetic import (SEARCH_QUERIES, make_clip, make_purchases, make_rows,  # noqa: E402
+                                  use_text_stub)
+
+GROUPS = ["process", "marketplace", "dashboard", "inventory", "upload"]
+DEFAULT_ROWS = [1_000, 100_000, 1_000_000]
+DEFAULT_CLIPS = ["640x360x4", "1280x720x4", "1920x1080x4"]  # width x height x seconds
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR_MS = 1.0   # differences smaller than this are never a regression
+PURCHASES_PER_VIDEO = 0.1
+BUYER = "user_0@example.com"
+
+
+class Results:
+    # name -> {"ms": median, "min_ms", "max_ms", "runs", ...extra numbers}
+
+    def __init__(self):
+        self.cases = {}
+
+    def add(self, name, samples_ms, **extra):
+        median = statistics.median(samples_ms)
+        self.cases[name] = {"ms": round(median, 3), "min_ms": round(min(samples_ms), 3),
+                            "max_ms": round(max(samples_ms), 3), "runs": len(samples_ms), **extra}
+        details = "  ".join(f"{key}={value}" for key, value in extra.items())
+        print(f"  {name:<46} {median:>11.2f} ms  {details}")
+
+
+def timed(fn, repeat, setup=None, client=None):
+    # Milliseconds per run (setup() runs before each, untimed), and backend calls per run
+    samples, calls = [], client.calls if client else 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples, round((client.calls - calls) / repeat, 1) if client else None
+
+
+# --- Cases ---
+
+def bench_process(results, clips, repeat, workers):
+    stub = use_text_stub()
+    if stub:
+        print("  (ImageMagick not found: the watermark text is a stand-in block)")
+    from video_processor import process_video
+
+    tracing.enable()
+    for spec in clips:
+        width, height, seconds = (int(part) for part in spec.split("x"))
+        path = make_clip(get_scratch().temp_path(".mp4", prefix="bench"), width, height, seconds)
+        stages = {}
+        try:
+            for _ in range(repeat):
+                upload = SpooledUpload(path, f"bench_{spec}.mp4", os.path.getsize(path))
+                with tracing.capture() as spans:
+                    result = process_video(upload, workers=workers)
+                upload.close()
+                if "error" in result:
+                    raise RuntimeError(f"process_video on {spec}: {result['error']}")
+                get_scratch().discard(result["artifact_id"])
+                for entry in spans:
+                    stages.setdefault(entry["span"], []).append(entry["seconds"] * 1000)
+        finally:
+            os.remove(path)
+        total = stages.pop("process.total")
+        results.add(f"process.total[{spec}]", total,
+                    fps=round(seconds * 30 / (statistics.median(total) / 1000), 1))
+        for name, samples in stages.items():
+            results.add(f"{name}[{spec}]", samples)
+    tracing.disable()
+
+
+def bench_marketplace(results, rows, client, repeat):
+    n = len(rows)
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.sync(rows)
+    results.add(f"marketplace.index_build[{n}]", [(time.perf_counter() - start) * 1000])
+
+    samples, hits = [], []
+    for _ in range(repeat):
+        for query in SEARCH_QUERIES:
+            start = time.perf_counter()
+            hits.append(len(index.search(query)))
+            samples.append((time.perf_counter() - start) * 1000)
+    results.add(f"marketplace.search[{n}]", samples, hits=round(statistics.mean(hits)))
+
+    # Which of the listed videos does the buyer own (every Marketplace rerun)
+    store = EntitlementStore(client)
+    ids = [row["id"] for row in rows]
+    samples, calls = timed(lambda: store.owned(BUYER, ids), repeat, setup=store.invalidate, client=client)
+    results.add(f"marketplace.licences_cold[{n}]", samples, calls=calls)
+    samples, calls = timed(lambda: store.owned(BUYER, ids), repeat, client=client)
+    results.add(f"marketplace.licences_warm[{n}]", samples, calls=calls)
+
+
+def bench_dashboard(results, rows, client, repeat):
+    n = len(rows)
+
+    def rebuild():
+        analytics = InventoryAnalytics(client, purchases_ttl=3600)
+        analytics.on_inventory_change(rows, full=True)
+        analytics.summary()
+    samples, calls = timed(rebuild, repeat, client=client)
+    results.add(f"dashboard.full[{n}]", samples, calls=calls)
+
+    analytics = InventoryAnalytics(client, purchases_ttl=3600)
+    analytics.on_inventory_change(rows, full=True)
+    analytics.summary()
+    samples, _ = timed(analytics.summary, repeat)
+    results.add(f"dashboard.cached[{n}]", samples)
+
+    # Ten rows changed (e.g. a new price), then the Dashboard is drawn
+    changed = [{**row, "price": "$75"} for row in rows[:10]]
+    samples, _ = timed(lambda: (analytics.on_inventory_change(changed, full=False), analytics.summary()), repeat)
+    results.add(f"dashboard.update[{n}]", samples)
+
+
+def bench_inventory(results, rows, client, repeat):
+    n = len(rows)
+    samples, calls = timed(lambda: InventoryRepository(client).sync(full=True), repeat, client=client)
+    results.add(f"inventory.full_sync[{n}]", samples, calls=calls)
+
+    # 100 new uploads since the last sync: only they are fetched
+    repo = InventoryRepository(client, ttl=0)
+    repo.sync(full=True)
+    uploads = [{key: value for key, value in row.items() if key != "id"} for row in make_rows(100)]
+    samples, calls = timed(repo.sync, repeat, setup=lambda: client.insert("videos_inventory", uploads),
+                           client=client)
+    results.add(f"inventory.incremental_sync[{n}]", samples, calls=calls)
+
+    # One upload's row pushed straight into the snapshot
+    fresh = []
+    samples, _ = timed(lambda: repo.write_through(fresh[-1]), repeat,
+                       setup=lambda: fresh.append(client.insert("videos_inventory", uploads[:1])))
+    results.add(f"inventory.write_through[{n}]", samples)
+
+
+def bench_upload(results, size_mb, repeat):
+    data = io.BytesIO(os.urandom(size_mb * 1024 * 1024))
+    data.name = "bench.mp4"
+    path = get_scratch().temp_path(".mp4", prefix="bench")
+    try:
+        samples, _ = timed(lambda: spool_to_disk(data, path=path), repeat)
+        results.add(f"upload.spool[{size_mb}MB]", samples,
+                    mb_per_s=round(size_mb / (statistics.median(samples) / 1000), 1))
+
+        stats = {}
+        uploader = ResumableUploader("https://example.supabase.co", "bench",
+                                     http=httpx.Client(transport=tus_transport(stats)))
+        samples, _ = timed(lambda: uploader.upload(path, "bench.mp4"), repeat)
+        results.add(f"upload.tus[{size_mb}MB]", samples, requests=stats["requests"] // repeat,
+                    mb_per_s=round(size_mb / (statistics.median(samples) / 1000), 1))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# --- Baseline ---
+
+def compare(cases, baseline, threshold, noise_floor=NOISE_FLOOR_MS):
+    # Prints the comparison; returns the names of the cases that regressed
+    regressions = []
+    print(f"\n  {'case':<46} {'baseline':>11} {'now':>11} {'change':>8}")
+    for name, case in cases.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"  {name:<46} {'-':>11} {case['ms']:>11.2f} {'new':>8}")
+            continue
+        change = case["ms"] / old["ms"] - 1 if old["ms"] else 0.0
+        slower = case["ms"] > old["ms"] * (1 + threshold) and case["ms"] - old["ms"] > noise_floor
+        if slower:
+            regressions.append(name)
+        print(f"  {name:<46} {old['ms']:>11.2f} {case['ms']:>11.2f} {change:>+8.1%}"
+              + ("  REGRESSION" if slower else ""))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite with baseline comparison")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--clips", nargs="+", default=DEFAULT_CLIPS, help="WIDTHxHEIGHTxSECONDS")
+    parser.add_argument("--workers", type=int, default=1, help="process_video encoders (1 = serial)")
+    parser.add_argument("--upload-mb", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown, 0.25 = 25%% slower than the baseline")
+    parser.add_argument("--save-baseline", help="also write this run as the new baseline here")
+    args = parser.parse_args()
+
+    results = Results()
+    if "process" in args.only:
+        print("process_video")
+        bench_process(results, args.clips, args.repeat, args.workers)
+    for n in args.rows if set(args.only) & {"marketplace", "dashboard", "inventory"} else []:
+        print(f"{n:,} rows")
+        rows = make_rows(n)
+        client = CountingClient(rows, make_purchases(n, int(n * PURCHASES_PER_VIDEO)))
+        if "marketplace" in args.only:
+            bench_marketplace(results, rows, client, args.repeat)
+        if "dashboard" in args.only:
+            bench_dashboard(results, rows, client, args.repeat)
+        if "inventory" in args.only:
+            bench_inventory(results, rows, client, args.repeat)  # Last: it adds rows
+        del rows, client
+    if "upload" in args.only:
+        print("upload")
+        bench_upload(results, args.upload_mb, args.repeat)
+
+    report = {"meta": {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "commit": git_commit(),
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "cpu_count": os.cpu_count(), "args": vars(args)},
+              "cases": results.cases}
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["cases"]
+        regressions = compare(results.cases, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
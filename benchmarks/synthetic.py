@@ -0,0 +1,102 @@
+# benchmarks/synthetic.py
+# Test data for the benchmarks, made locally and the same on every run:
+#   - make_clip(): a moving test pattern (plus a tone) of any size and length,
+#     encoded by the ffmpeg that moviepy uses - no downloads
+#   - make_scene_clip(): test patterns back to back, a hard cut every few seconds
+#   - make_rows() / make_purchases(): videos_inventory and purchases rows,
+#     SEARCH_QUERIES to look for in them
+#   - use_text_stub(): a stand-in for the ImageMagick watermark text when
+#     ImageMagick isn't installed, so the encode numbers stay comparable
+# numpy and moviepy are imported where they are used, so bench_startup.py can
+# build its rows without loading them ahead of the app.
+import random
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+CATEGORIES = ["Nature", "Tech", "People", "Business", "Abstract", "Social Import"]
+PRICES = ["$50", "$25", "$99.99", "$1,299.00", None]
+WORDS = ("sunset ocean drone city night timelapse forest mountain river crowd office laptop "
+         "abstract particles neon street market aerial snow desert waves studio interview "
+         "coffee traffic skyline rain storm garden beach portrait workshop factory robot").split()
+SEARCH_QUERIES = ["sunset", "drone city", "sun", "neon street night", "nature", "tech lap", "robot factory", "zebra"]
+SCENE_SOURCES = ["testsrc2", "smptebars", "mandelbrot", "rgbtestsrc", "color=c=navy", "life", "cellauto",
+                 "smptehdbars"]
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+# --- Clips ---
+
+def make_clip(path, width, height, seconds, fps=30, audio=True, gop=None):
+    # gop: frames between keyframes (default 2 seconds, like a typical camera or phone upload)
+    from moviepy.config import get_setting
+
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+           "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}"]
+    if audio:
+        cmd += ["-f", "lavfi", "-i", "sine=frequency=440", "-c:a", "aac"]
+    cmd += ["-t", str(seconds), "-pix_fmt", "yuv420p", "-c:v", "libx264", "-preset", "ultrafast",
+            "-g", str(gop or 2 * fps), path]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def make_scene_clip(path, width, height, scenes, scene_seconds, fps=30):
+    # `scenes` different ffmpeg test patterns back to back: a hard cut every scene_seconds
+    from moviepy.config import get_setting
+
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error"]
+    for i in range(scenes):
+        source = SCENE_SOURCES[i % len(SCENE_SOURCES)]
+        separator = ":" if "=" in source else "="
+        cmd += ["-f", "lavfi", "-t", str(scene_seconds), "-i", f"{source}{separator}size={width}x{height}:rate={fps}"]
+    graph = "".join(f"[{i}:v]format=yuv420p,setsar=1[v{i}];" for i in range(scenes))
+    graph += "".join(f"[v{i}]" for i in range(scenes)) + f"concat=n={scenes}:v=1:a=0[out]"
+    cmd += ["-filter_complex", graph, "-map", "[out]", "-c:v", "libx264", "-preset", "ultrafast", path]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def text_overlay(text="TROVEO PREVIEW", fontsize=50, color="white"):
+    # Stand-in for the ImageMagick text: a solid block of roughly the same size
+    import numpy as np
+
+    return np.full((fontsize, fontsize * 8, 4), 255, dtype=np.uint8)
+
+
+def use_text_stub():
+    # Swaps in text_overlay() if the real ImageMagick text can't be rendered.
+    # Returns True if it did.
+    import hls_packager
+    import watermark
+
+    try:
+        watermark.render_text_overlay(fontsize=10)
+        return False
+    except Exception:
+        watermark.render_text_overlay = text_overlay
+        hls_packager.render_text_overlay = text_overlay
+        return True
+
+
+# --- Table rows ---
+
+def make_rows(n, seed=7, owners=100):
+    # videos_inventory rows with ids 1..n, spread over a year of uploads
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        title = " ".join(rng.choices(WORDS, k=rng.randint(2, 5))).title() + f" {i}"
+        rows.append({"id": i + 1, "file_name": f"clip_{i + 1}.mp4", "title": title,
+                     "category": rng.choice(CATEGORIES), "description": " ".join(rng.choices(WORDS, k=12)),
+                     "price": PRICES[i % len(PRICES)], "owner_id": f"owner_{i % owners}",
+                     "duration_s": 5.0 + i % 120, "size_bytes": 2_000_000 + (i % 500) * 100_000,
+                     "created_at": (EPOCH + timedelta(minutes=i * 525_600 // max(n, 1))).isoformat()})
+    return rows
+
+
+def make_purchases(n_videos, n, users=1000, seed=7):
+    # purchases rows for videos 1..n_videos; user_0 is the benchmark's buyer
+    rng = random.Random(seed)
+    return [{"id": i + 1, "video_id": rng.randint(1, max(n_videos, 1)), "user_email": f"user_{i % users}@example.com",
+             "price": "$50", "created_at": (EPOCH + timedelta(minutes=i)).isoformat()}
+            for i in range(n)]
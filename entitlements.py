@@ -0,0 +1,111 @@
+# entitlements.py
+# Who owns which video, answered from memory.
+#
+# Purchases used to live in st.session_state.purchased_videos, a Python list:
+# every Marketplace card ran "vid_id in list" (N cards x M purchases), the list
+# was loaded only at login, and a purchase appended to it, slept a second and
+# reran the whole page. Here:
+#   - each user's licences are a set of video ids, loaded once with keyset
+#     pagination and shared by every session of that user (TTL + LRU over users)
+#   - owned(user, ids) answers "which of these N videos does this user own"
+#     in one call, with one set intersection
+#   - purchase() is write-through and idempotent: buying twice never creates
+#     a second row (upsert on (user_email, video_id), or a check first if the
+#     table has no unique constraint), and the set is updated right away
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = float(os.environ.get("TROVEO_ENTITLEMENTS_TTL", 300))
+MAX_USERS = int(os.environ.get("TROVEO_ENTITLEMENTS_USERS", 10000))
+PAGE_SIZE = 1000
+
+
+class EntitlementStore:
+
+    def __init__(self, client, table="purchases", ttl=DEFAULT_TTL, max_users=MAX_USERS, page_size=PAGE_SIZE):
+        self.client = client
+        self.table = table
+        self.ttl = ttl
+        self.max_users = max_users
+        self.page_size = page_size
+        self.use_upsert = True
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_email -> (loaded_at, set of video ids), oldest first
+
+    # --- Reading ---
+
+    def owned_set(self, user_email):
+        # The user's whole set of video ids (don't modify it)
+        if not user_email:
+            return frozenset()
+        with self._lock:
+            entry = self._users.get(user_email)
+            if entry is not None and time.time() - entry[0] <= self.ttl:
+                self._users.move_to_end(user_email)
+                return entry[1]
+        videos = self._load(user_email)
+        with self._lock:
+            self._users[user_email] = (time.time(), videos)
+            self._users.move_to_end(user_email)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return videos
+
+    def owned(self, user_email, video_ids):
+        # Which of these videos does the user own? -> set of ids
+        return self.owned_set(user_email).intersection(video_ids)
+
+    def owns(self, user_email, video_id):
+        return video_id in self.owned_set(user_email)
+
+    def count(self, user_email):
+        return len(self.owned_set(user_email))
+
+    def _load(self, user_email):
+        videos, last_id = set(), None
+        while True:
+            query = self.client.table(self.table).select("id, video_id").eq("user_email", user_email)
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = query.order("id").limit(self.page_size).execute().data
+            videos.update(row["video_id"] for row in page)
+            if len(page) < self.page_size:
+                return videos
+            last_id = page[-1]["id"]
+
+    # --- Writing ---
+
+    def purchase(self, user_email, video_id, price):
+        # Returns the new purchases row, or None if the user already had it
+        if self.owns(user_email, video_id):
+            return None
+        row = {"user_email": user_email, "video_id": video_id, "price": price}
+        inserted = None
+        if self.use_upsert:
+            try:
+                inserted = self.client.table(self.table).upsert(
+                    row, on_conflict="user_email,video_id", ignore_duplicates=True).execute().data
+            except Exception as e:
+                if "42P10" not in str(e) and "constraint" not in str(e).lower():
+                    raise
+                # No unique constraint on (user_email, video_id): check, then insert
+                self.use_upsert = False
+        if not self.use_upsert:
+            existing = (self.client.table(self.table).select("id").eq("user_email", user_email)
+                        .eq("video_id", video_id).limit(1).execute().data)
+            if not existing:
+                inserted = self.client.table(self.table).insert(row).execute().data
+        with self._lock:
+            entry = self._users.get(user_email)
+            if entry is not None:
+                entry[1].add(video_id)
+        return inserted[0] if inserted else None
+
+    def invalidate(self, user_email=None):
+        with self._lock:
+            if user_email is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_email, None)
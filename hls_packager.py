@@ -0,0 +1,146 @@
+# hls_packager.py
+# Adaptive-bitrate HLS output: a ladder of renditions (e.g. 240p/480p/720p),
+# each cut into short segments, plus a master playlist that lets the player
+# pick (and switch) the right one for the viewer's bandwidth.
+#
+# Everything comes out of ONE ffmpeg run, so the source is decoded once:
+#   source -> scale to the top rung -> watermark -> split -> scale each rung -> encode
+# Keyframes are forced on segment boundaries so every rung cuts at the same
+# moments and the player can switch cleanly.
+#
+# Encoder settings come from named profiles (preset, CRF, threads).
+import os
+import subprocess
+import time
+
+import numpy as np
+
+from video_probe import probe
+from watermark import render_text_overlay, WATERMARK_FONTSIZE, WATERMARK_OPACITY
+
+ENCODER_PROFILES = {
+    "fast":     {"preset": "veryfast", "crf": 28, "threads": 0},
+    "balanced": {"preset": "medium",   "crf": 23, "threads": 0},
+    "quality":  {"preset": "slow",     "crf": 20, "threads": 0},
+}
+
+DEFAULT_LADDER = [
+    {"name": "240p", "height": 240, "maxrate_kbps": 400,  "audio_kbps": 64},
+    {"name": "480p", "height": 480, "maxrate_kbps": 1400, "audio_kbps": 96},
+    {"name": "720p", "height": 720, "maxrate_kbps": 2800, "audio_kbps": 128},
+]
+
+SEGMENT_SECONDS = 4
+
+
+class PackagingError(Exception):
+    pass
+
+
+def watermark_png(source_size, top_height, path):
+    # The same "TROVEO PREVIEW" text as the MP4 preview, sized for the top
+    # rung, with the opacity baked into the alpha channel for ffmpeg's overlay
+    from PIL import Image
+
+    fontsize = max(8, round(WATERMARK_FONTSIZE * top_height / source_size[1]))
+    overlay = np.array(render_text_overlay(fontsize=fontsize))
+    overlay[..., 3] = (overlay[..., 3] * WATERMARK_OPACITY).astype(np.uint8)
+    Image.fromarray(overlay, "RGBA").save(path)
+    return path
+
+
+def pick_ladder(ladder, source_height):
+    # Never upscale: drop rungs taller than the source (keep at least the smallest)
+    rungs = [rung for rung in sorted(ladder, key=lambda r: r["height"]) if rung["height"] <= source_height]
+    return rungs or [min(ladder, key=lambda r: r["height"])]
+
+
+def build_command(source_path, out_dir, rungs, profile, info, segment_seconds, watermark_path=None):
+    from moviepy.config import get_setting
+
+    settings = ENCODER_PROFILES[profile] if isinstance(profile, str) else profile
+    top = rungs[-1]["height"]
+    n = len(rungs)
+
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error", "-progress", "pipe:1", "-i", source_path]
+    graph = [f"[0:v]scale=-2:{top}[top]"]
+    if watermark_path:
+        cmd += ["-i", watermark_path]
+        graph.append("[top][1:v]overlay=(W-w)/2:(H-h)/2[wm]")
+        graph.append(f"[wm]split={n}" + "".join(f"[s{i}]" for i in range(n)))
+    else:
+        graph.append(f"[top]split={n}" + "".join(f"[s{i}]" for i in range(n)))
+    for i, rung in enumerate(rungs):
+        graph.append(f"[s{i}]scale=-2:{rung['height']}[v{i}]")
+    cmd += ["-filter_complex", ";".join(graph)]
+
+    stream_map = []
+    for i, rung in enumerate(rungs):
+        cmd += ["-map", f"[v{i}]", f"-c:v:{i}", "libx264", f"-crf:v:{i}", str(settings["crf"]),
+                f"-maxrate:v:{i}", f"{rung['maxrate_kbps']}k", f"-bufsize:v:{i}", f"{2 * rung['maxrate_kbps']}k"]
+        entry = f"v:{i}"
+        if info["has_audio"]:
+            cmd += ["-map", "0:a:0", f"-c:a:{i}", "aac", f"-b:a:{i}", f"{rung['audio_kbps']}k"]
+            entry += f",a:{i}"
+        stream_map.append(entry + f",name:{rung['name']}")
+
+    cmd += ["-preset", settings["preset"], "-threads", str(settings["threads"]), "-pix_fmt", "yuv420p",
+            # Same keyframe times on every rung, one at each segment boundary
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0",
+            "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+            "-hls_segment_filename", os.path.join(out_dir, "%v", "seg_%05d.ts"),
+            "-master_pl_name", "master.m3u8", "-var_stream_map", " ".join(stream_map),
+            os.path.join(out_dir, "%v", "index.m3u8")]
+    return cmd
+
+
+def package_hls(source_path, out_dir, ladder=DEFAULT_LADDER, profile="balanced",
+                segment_seconds=SEGMENT_SECONDS, watermark=True, progress=None):
+    # Returns a report: master playlist path, encode time and per-rendition sizes.
+    # progress(fraction) is called while ffmpeg runs. out_dir belongs to the
+    # caller (e.g. a scratch job folder), who removes or keeps it.
+    info = probe(source_path)
+    rungs = pick_ladder(ladder, info["height"])
+    for rung in rungs:
+        os.makedirs(os.path.join(out_dir, rung["name"]), exist_ok=True)
+
+    watermark_path = None
+    if watermark:
+        watermark_path = watermark_png((info["width"], info["height"]), rungs[-1]["height"],
+                                       os.path.join(out_dir, "watermark.png"))
+
+    cmd = build_command(source_path, out_dir, rungs, profile, info, segment_seconds, watermark_path)
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    for line in proc.stdout:
+        # "-progress pipe:1" prints key=value lines; out_time_us is how far we are
+        if progress and line.startswith("out_time_us=") and info["duration_s"]:
+            value = line.split("=", 1)[1].strip()
+            if value.isdigit():
+                progress(min(1.0, int(value) / 1e6 / info["duration_s"]))
+    errors = proc.stderr.read()
+    if proc.wait() != 0:
+        raise PackagingError(errors.strip() or f"ffmpeg exited with {proc.returncode}")
+    encode_s = time.perf_counter() - start
+
+    if watermark_path:
+        os.remove(watermark_path)
+
+    renditions = []
+    for rung in rungs:
+        folder = os.path.join(out_dir, rung["name"])
+        files = os.listdir(folder)
+        size = sum(os.path.getsize(os.path.join(folder, name)) for name in files)
+        renditions.append({
+            "name": rung["name"], "height": rung["height"],
+            "segments": sum(name.endswith(".ts") for name in files),
+            "bytes": size,
+            "kbps": round(size * 8 / 1000 / info["duration_s"], 1) if info["duration_s"] else 0.0,
+            # All rungs are encoded side by side in the same pass, so they share its wall time
+            "encode_s": round(encode_s, 2),
+        })
+
+    return {"master_path": os.path.join(out_dir, "master.m3u8"), "out_dir": out_dir,
+            "profile": profile, "encode_s": round(encode_s, 2),
+            "realtime_factor": round(info["duration_s"] / encode_s, 2) if encode_s else 0.0,
+            "renditions": renditions}
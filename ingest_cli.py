@@ -0,0 +1,344 @@
+# ingest_cli.py
+# Bulk ingest from the command line: a whole directory of videos (a shipped
+# drive, a mounted S3 bucket...) into the marketplace, without Streamlit.
+#
+#   python ingest_cli.py /mnt/drive --owner-id <user uuid> --category Nature
+#
+# For every video under the directory:
+#   1. a worker PROCESS hashes it, reads its metadata (video_probe), makes the
+#      poster + sprite sheet and, with --previews, the watermarked preview
+#      (cached by content hash like the app's "Process & Watermark")
+#   2. an upload THREAD streams it to the "videos" bucket in chunks
+#      (streaming_io.ResumableUploader), named by its content hash
+#   3. the videos_inventory rows are inserted in batches
+# The steps overlap: uploads start while other files are still being processed.
+#
+# Progress is checkpointed in a manifest (one JSON line per finished step,
+# default <directory>/.troveo_ingest.jsonl). Run the same command again after
+# a crash or Ctrl+C: inserted files are skipped, uploaded files only get their
+# row inserted, everything else starts over. A file that changed (size or
+# modification time) since it was recorded is ingested again.
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi")
+CONTENT_TYPES = {".mp4": "video/mp4", ".mov": "video/quicktime", ".mkv": "video/x-matroska",
+                 ".avi": "video/x-msvideo", ".jpg": "image/jpeg", ".json": "application/json"}
+DEFAULT_WORKERS = int(os.environ.get("TROVEO_INGEST_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+UPLOAD_WORKERS = int(os.environ.get("TROVEO_INGEST_UPLOADS", 4))
+INSERT_BATCH_SIZE = 50
+MANIFEST_NAME = ".troveo_ingest.jsonl"
+UPLOADED, INSERTED, FAILED = "uploaded", "inserted", "failed"
+
+
+def find_videos(root):
+    # [(path, path relative to root, size, mtime)], sorted, hidden folders skipped
+    found = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.lower().endswith(VIDEO_EXTENSIONS) and not name.startswith("."):
+                path = os.path.join(folder, name)
+                stat = os.stat(path)
+                found.append((path, os.path.relpath(path, root), stat.st_size, stat.st_mtime))
+    return found
+
+
+class Manifest:
+    # Append-only JSON lines; the last line for a file wins. Every line is
+    # flushed to disk before we go on, so a crash loses at most one step.
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A half-written last line from a crash
+                    self.entries[entry["file"]] = entry
+
+    def get(self, rel_path, size, mtime):
+        # The entry for this file, unless the file changed since
+        entry = self.entries.get(rel_path)
+        if entry and entry.get("size") == size and entry.get("mtime") == mtime:
+            return entry
+        return None
+
+    def record(self, rel_path, size, mtime, status, **fields):
+        entry = {"file": rel_path, "size": size, "mtime": mtime, "status": status, **fields,
+                 "at": round(time.time(), 3)}
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[rel_path] = entry
+        return entry
+
+
+def prepare_file(path, previews=False, cache_root=None, concurrent_jobs=1):
+    # Runs in a worker process: everything that needs the CPU
+    # (concurrent_jobs: the pool's size, see parallel_transcode.segment_workers)
+    from artifact_cache import hash_file
+    from scratch_space import get_scratch
+    from video_probe import probe
+    from video_processor import thumbnails_for_file
+
+    start = time.time()
+    with open(path, "rb") as f:
+        digest = hash_file(f)
+    metadata = probe(path)  # Raises for a file that is not a readable video: it fails, not listed
+    # The folder outlives this call: _upload() removes it once the thumbnails are in the bucket
+    job = get_scratch().job("thumbs")
+    try:
+        thumbs = thumbnails_for_file(path, job.path)
+        thumbs.pop("sprite_index", None)
+    except Exception as e:
+        print(f"Thumbnail Error ({path}): {e}")
+        job.close()
+        thumbs = {}
+
+    if previews:
+        from artifact_cache import ArtifactCache
+        from job_queue import SpooledUpload
+        from parallel_transcode import segment_workers
+        from video_processor import process_video
+
+        cache = ArtifactCache(cache_root) if cache_root else ArtifactCache()
+        cached = cache.get(digest)
+        if not (cached and cached["preview_path"]):
+            upload = SpooledUpload(path, os.path.basename(path), os.path.getsize(path))
+            try:
+                result = process_video(upload, workers=segment_workers(concurrent_jobs))
+            finally:
+                upload.close()
+            if "error" in result:
+                raise RuntimeError(f"Preview failed: {result['error']}")
+            cache.put(digest, preview_path=result["preview_path"], metadata=result["metadata"])
+    return {"digest": digest, "metadata": metadata, "thumbs": thumbs, "seconds": round(time.time() - start, 2)}
+
+
+class DirectoryIngest:
+
+    def __init__(self, upload, insert_rows, manifest, workers=DEFAULT_WORKERS, upload_workers=UPLOAD_WORKERS,
+                 insert_batch_size=INSERT_BATCH_SIZE, row_defaults=None, previews=False, cache_root=None,
+                 report=print, report_every=5.0):
+        # upload(local_path, object_name, content_type) -> pushes a file to storage
+        # insert_rows(list of rows)                      -> inserted rows (response.data)
+        self.upload = upload
+        self.insert_rows = insert_rows
+        self.manifest = manifest
+        self.workers = workers
+        self.upload_workers = upload_workers
+        self.insert_batch_size = insert_batch_size
+        self.row_defaults = row_defaults or {"category": "Bulk Import", "price": "$50"}
+        self.previews = previews
+        self.cache_root = cache_root
+        self.report = report
+        self.report_every = report_every
+        self._lock = threading.Lock()
+        self._pending = []   # (file, row) waiting for the next batch insert
+        self.counts = {"total": 0, "skipped": 0, "done": 0, "failed": 0, "bytes": 0}
+        self.failures = []
+
+    def run(self, root):
+        start = time.time()
+        self._start = start
+        self._reported_at = start
+        files = find_videos(root)
+        self.counts["total"] = len(files)
+
+        todo = []
+        for path, rel_path, size, mtime in files:
+            entry = self.manifest.get(rel_path, size, mtime)
+            if entry and entry["status"] == INSERTED:
+                self.counts["skipped"] += 1
+            elif entry and entry["status"] == UPLOADED:
+                self._queue_row((rel_path, size, mtime), entry["row"])  # Only the insert is missing
+            else:
+                todo.append((path, rel_path, size, mtime))
+
+        # At most this many files processed but not uploaded yet (bounds temp disk use)
+        in_flight = threading.BoundedSemaphore(self.workers + 2 * self.upload_workers)
+        uploads = ThreadPoolExecutor(self.upload_workers, thread_name_prefix="ingest-upload")
+        # "spawn": clean worker processes, as in job_queue.py
+        pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            for item in todo:
+                in_flight.acquire()
+                future = pool.submit(prepare_file, item[0], self.previews, self.cache_root, self.workers)
+                future.add_done_callback(
+                    lambda f, item=item: self._prepared(f, item, uploads, in_flight))
+        finally:
+            pool.shutdown(wait=True)
+            uploads.shutdown(wait=True)
+            self._flush(force=True)
+        return self.summary(time.time() - start)
+
+    def summary(self, seconds):
+        done, total_bytes = self.counts["done"], self.counts["bytes"]
+        return {**self.counts, "seconds": round(seconds, 2),
+                "files_per_s": round(done / seconds, 2) if seconds else 0.0,
+                "gb_per_s": round(total_bytes / 1e9 / seconds, 4) if seconds else 0.0,
+                "failures": self.failures}
+
+    # --- Pipeline steps ---
+
+    def _prepared(self, future, item, uploads, in_flight):
+        # Called in the pool's result thread: hand the upload to an upload thread
+        try:
+            prepared = future.result()
+        except Exception as e:
+            self._fail(item, e)
+            in_flight.release()
+            return
+        uploads.submit(self._upload, item, prepared, in_flight)
+
+    def _upload(self, item, prepared, in_flight):
+        from artifact_cache import storage_name_for
+        from video_processor import thumbnail_names
+
+        path, rel_path, size, mtime = item
+        thumbs = prepared["thumbs"]
+        try:
+            file_name = storage_name_for(prepared["digest"])
+            self.upload(path, file_name, CONTENT_TYPES.get(os.path.splitext(path)[1].lower(), "video/mp4"))
+            thumb_columns = {}
+            if thumbs:
+                names = thumbnail_names(file_name)
+                for column, local_key in [("poster_file", "poster_path"), ("sprite_file", "sprite_path"),
+                                          ("sprite_index_file", "sprite_index_path")]:
+                    self.upload(thumbs[local_key], names[column],
+                                CONTENT_TYPES[os.path.splitext(names[column])[1]])
+                    thumb_columns[column] = names[column]
+            title = os.path.splitext(os.path.basename(path))[0].replace("_", " ").strip()
+            row = {"file_name": file_name, "title": title, **self.row_defaults, **thumb_columns,
+                   **prepared["metadata"]}
+            self.manifest.record(rel_path, size, mtime, UPLOADED, digest=prepared["digest"], row=row)
+            self._queue_row((rel_path, size, mtime), row)
+        except Exception as e:
+            self._fail(item, e)
+        finally:
+            if thumbs:
+                shutil.rmtree(os.path.dirname(thumbs["poster_path"]), ignore_errors=True)
+            in_flight.release()
+        self._flush()
+
+    def _queue_row(self, key, row):
+        with self._lock:
+            self._pending.append((key, row))
+
+    def _flush(self, force=False):
+        # One insert per batch of rows
+        with self._lock:
+            if not self._pending or (not force and len(self._pending) < self.insert_batch_size):
+                return
+            batch, self._pending = self._pending, []
+        try:
+            inserted = self.insert_rows([row for _, row in batch]) or []
+        except Exception as e:
+            # Still marked "uploaded" in the manifest: the next run only retries the insert
+            for (rel_path, size, mtime), row in batch:
+                self._fail((None, rel_path, size, mtime), e, record=False)
+            return
+        for i, ((rel_path, size, mtime), row) in enumerate(batch):
+            row_id = inserted[i].get("id") if i < len(inserted) else None
+            self.manifest.record(rel_path, size, mtime, INSERTED, id=row_id, file_name=row["file_name"])
+            with self._lock:
+                self.counts["done"] += 1
+                self.counts["bytes"] += size
+        self._progress()
+
+    def _fail(self, item, error, record=True):
+        path, rel_path, size, mtime = item
+        if record:
+            self.manifest.record(rel_path, size, mtime, FAILED, error=str(error))
+        with self._lock:
+            self.counts["failed"] += 1
+            self.failures.append({"file": rel_path, "error": str(error)})
+        self.report(f"FAILED {rel_path}: {error}")
+
+    def _progress(self):
+        now = time.time()
+        with self._lock:
+            if now - self._reported_at < self.report_every:
+                return
+            self._reported_at = now
+            done, total_bytes = self.counts["done"], self.counts["bytes"]
+            finished = done + self.counts["failed"] + self.counts["skipped"]
+        seconds = max(now - self._start, 1e-9)
+        self.report(f"[{finished}/{self.counts['total']}] {done / seconds:.2f} files/s, "
+                    f"{total_bytes / 1e9 / seconds:.3f} GB/s")
+
+
+def load_credentials(secrets_path):
+    # SUPABASE_URL / SUPABASE_KEY, else the app's .streamlit/secrets.toml
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if (not url or not key) and os.path.exists(secrets_path):
+        import tomllib
+
+        with open(secrets_path, "rb") as f:
+            secrets = tomllib.load(f).get("supabase", {})
+        url, key = url or secrets.get("url"), key or secrets.get("key")
+    if not url or not key:
+        sys.exit(f"No Supabase credentials: set SUPABASE_URL and SUPABASE_KEY or create {secrets_path}")
+    return url, key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a directory of videos into the marketplace")
+    parser.add_argument("directory")
+    parser.add_argument("--owner-id", help="videos_inventory.owner_id of the new rows (the user's id)")
+    parser.add_argument("--category", default="Bulk Import")
+    parser.add_argument("--price", default="$50")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="processes for probe/thumbnails")
+    parser.add_argument("--upload-workers", type=int, default=UPLOAD_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INSERT_BATCH_SIZE, help="rows per insert")
+    parser.add_argument("--previews", action="store_true", help="also build the watermarked previews")
+    parser.add_argument("--manifest", help=f"checkpoint file (default <directory>/{MANIFEST_NAME})")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"))
+    parser.add_argument("--dry-run", action="store_true", help="only list what would be ingested")
+    args = parser.parse_args()
+
+    manifest = Manifest(args.manifest or os.path.join(args.directory, MANIFEST_NAME))
+    if args.dry_run:
+        files = find_videos(args.directory)
+        todo = [f for f in files if (manifest.get(*f[1:]) or {}).get("status") != INSERTED]
+        print(f"{len(files)} videos ({sum(f[2] for f in files) / 1e9:.2f} GB), {len(todo)} to ingest")
+        return
+
+    from streaming_io import ResumableUploader
+    from supabase_provider import get_client
+
+    url, key = load_credentials(args.secrets)
+    client = get_client(url, key)
+    uploader = ResumableUploader(url, key)
+    ingest = DirectoryIngest(
+        upload=lambda path, name, content_type: uploader.upload(path, name, content_type),
+        insert_rows=lambda rows: client.table("videos_inventory").insert(rows).execute().data,
+        manifest=manifest, workers=args.workers, upload_workers=args.upload_workers,
+        insert_batch_size=args.batch_size, previews=args.previews,
+        row_defaults={"category": args.category, "price": args.price, "owner_id": args.owner_id},
+    )
+    summary = ingest.run(args.directory)
+    print(f"Ingested {summary['done']} of {summary['total']} videos ({summary['skipped']} already done, "
+          f"{summary['failed']} failed) in {summary['seconds']}s: "
+          f"{summary['files_per_s']} files/s, {summary['gb_per_s']} GB/s")
+    for failure in summary["failures"]:
+        print(f"  {failure['file']}: {failure['error']}")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
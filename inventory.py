@@ -0,0 +1,161 @@
+# inventory.py
+# One shared, incrementally synced copy of the videos_inventory table.
+#
+# The app used to run select("*") on every widget click, so every session
+# pulled the whole catalogue on every rerun. Now:
+#   1. The first read loads the table page by page (keyset pagination).
+#   2. After that, at most once per TTL, we only ask for rows that changed
+#      since the last sync, using an (updated_at, id) cursor.
+#   3. Uploads and imports push their new row straight into the snapshot
+#      (write_through), so nobody waits for the next sync to see it.
+# Every 10 minutes we do a full reload anyway, to notice deleted rows.
+#
+# If the table has no updated_at column, we fall back to an id-only cursor
+# (new rows still show up; edits appear on the next full reload). The
+# column, its trigger and index are in migrations/001_videos_inventory_columns.sql.
+#
+# Other caches built on the inventory (e.g. analytics.py) can add_listener()
+# to be told which rows changed, instead of re-reading the whole snapshot.
+import os
+import threading
+import time
+
+import tracing
+
+DEFAULT_TTL = float(os.environ.get("TROVEO_INVENTORY_TTL", 30))
+FULL_REFRESH_EVERY = float(os.environ.get("TROVEO_INVENTORY_FULL_REFRESH", 600))
+PAGE_SIZE = 1000
+
+
+def _missing_column(error, column):
+    # Postgres "undefined_column" (42703), as PostgREST passes it on
+    text = str(error)
+    return "42703" in text or (column in text and "does not exist" in text)
+
+
+class InventoryRepository:
+
+    def __init__(self, client, table="videos_inventory", ttl=DEFAULT_TTL,
+                 full_refresh_every=FULL_REFRESH_EVERY, page_size=PAGE_SIZE):
+        self.client = client
+        self.table = table
+        self.ttl = ttl
+        self.full_refresh_every = full_refresh_every
+        self.page_size = page_size
+        self.use_updated_at = True
+
+        self._lock = threading.Lock()
+        self._rows = {}          # id -> row
+        self._snapshot = []      # list(self._rows.values()), rebuilt only on change
+        self._cursor = None      # (updated_at, id) of the newest row we have
+        self._synced_at = 0.0
+        self._full_loaded_at = 0.0
+        self._listeners = []     # callback(rows, full) after every change
+
+    # --- Reading ---
+
+    def videos(self):
+        # The snapshot every page reads from. Don't modify the list.
+        if time.time() - self._synced_at > self.ttl:
+            self.sync()
+        return self._snapshot
+
+    def get(self, video_id):
+        self.videos()
+        return self._rows.get(video_id)
+
+    # --- Syncing ---
+
+    @tracing.traced("inventory.sync")
+    def sync(self, full=False):
+        with self._lock:
+            # Another session may have synced while we waited for the lock
+            now = time.time()
+            if not full and now - self._synced_at <= self.ttl:
+                return
+            if full or self._cursor is None or now - self._full_loaded_at > self.full_refresh_every:
+                fetched, cursor = self._fetch_after(None)
+                self._rows = {row["id"]: row for row in fetched}
+                self._cursor = cursor
+                self._full_loaded_at = now
+                self._notify(self._rows.values(), full=True)
+            else:
+                changed, self._cursor = self._fetch_after(self._cursor)
+                for row in changed:
+                    self._rows[row["id"]] = row
+                if changed:
+                    self._notify(changed, full=False)
+            self._snapshot = list(self._rows.values())
+            self._synced_at = now
+
+    def _fetch_after(self, cursor):
+        # Keyset pagination: each page starts right after the last row we saw,
+        # so the database never has to skip over rows with OFFSET.
+        # Returns (rows, cursor after the last one). sync() only moves
+        # self._cursor once every page is in: a load that fails halfway is
+        # retried from where it started.
+        rows = []
+        while True:
+            try:
+                with tracing.span("inventory.page"):
+                    page = self._page_query(cursor).execute().data
+            except Exception as e:
+                # Anything else (a timeout...) is not a reason to give up on updated_at
+                if not self.use_updated_at or not _missing_column(e, "updated_at"):
+                    raise
+                # No updated_at column on this table: switch to the id cursor
+                self.use_updated_at = False
+                cursor = (None, cursor[1]) if cursor else None
+                continue
+            rows.extend(page)
+            if page:
+                cursor = (page[-1].get("updated_at"), page[-1]["id"])
+            if len(page) < self.page_size:
+                return rows, cursor
+
+    def _page_query(self, cursor):
+        query = self.client.table(self.table).select("*")
+        if self.use_updated_at:
+            if cursor and cursor[0] is not None:
+                updated_at, last_id = cursor
+                query = query.or_(f'updated_at.gt."{updated_at}",'
+                                  f'and(updated_at.eq."{updated_at}",id.gt.{last_id})')
+            query = query.order("updated_at").order("id")
+        else:
+            if cursor:
+                query = query.gt("id", cursor[1])
+            query = query.order("id")
+        return query.limit(self.page_size)
+
+    # --- Writing ---
+
+    def write_through(self, rows):
+        # Call with the rows an insert/update returned (response.data)
+        if isinstance(rows, dict):
+            rows = [rows]
+        with self._lock:
+            rows = [row for row in rows or [] if "id" in row]
+            for row in rows:
+                self._rows[row["id"]] = row
+            self._snapshot = list(self._rows.values())
+            if rows:
+                self._notify(rows, full=False)
+
+    def invalidate(self):
+        # Next read goes to the database (incrementally)
+        self._synced_at = 0.0
+
+    # --- Listeners ---
+
+    def add_listener(self, callback):
+        # callback(rows, full): full=True means "this is now the whole table"
+        # (also called once right away with what we already have)
+        with self._lock:
+            self._listeners.append(callback)
+            if self._rows:
+                callback(list(self._rows.values()), True)
+
+    def _notify(self, rows, full):
+        rows = list(rows)
+        for callback in self._listeners:
+            callback(rows, full)
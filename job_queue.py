@@ -0,0 +1,253 @@
+# job_queue.py
+# Background transcoding jobs.
+#
+# The "Process & Watermark" button used to call process_video() inside the
+# Streamlit script run, so the user's page froze and two uploads at once fought
+# over the CPU. Now the page only:
+#   1. spools the upload to disk,
+#   2. gets a job id back straight away,
+#   3. polls the job's status from a small SQLite file.
+# The real work runs in a bounded pool of worker processes. Extra jobs wait in
+# a bounded queue (status "queued"); when that queue is full, submit() raises
+# QueueFull instead of piling more work onto the box.
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import scratch_space
+import tracing
+from streaming_io import spool_to_disk
+
+DEFAULT_WORKERS = int(os.environ.get("TROVEO_TRANSCODE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+DEFAULT_MAX_QUEUED = int(os.environ.get("TROVEO_TRANSCODE_QUEUE", 8))
+DEFAULT_STORE_PATH = os.environ.get("TROVEO_JOB_DB", os.path.join(scratch_space.DEFAULT_ROOT, "job_queue.db"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+class SpooledUpload:
+    # Looks enough like Streamlit's UploadedFile for process_video()
+    # (.name, .size, .read(n), .seek()), but lives on disk so it can cross processes.
+    def __init__(self, path, name, size):
+        self.path = path
+        self.name = name
+        self.size = size
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        return self._file
+
+    def read(self, size=-1):
+        return self._open().read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._open().seek(offset, whence)
+
+    def tell(self):
+        return self._open().tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JobStore:
+    # Job state in SQLite, so the worker processes can write progress and any
+    # Streamlit session can read it without touching the transcode.
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    status TEXT,
+                    stage TEXT,
+                    progress REAL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL
+                )""")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A transaction that is committed (or rolled back) and then closed
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def create(self, job_id, filename):
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, filename, status, stage, progress, created_at) "
+                       "VALUES (?, ?, ?, ?, ?, ?)", (job_id, filename, QUEUED, "queued", 0.0, time.time()))
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def list(self, status=None, limit=50):
+        query, args = "SELECT id FROM jobs", ()
+        if status:
+            query, args = query + " WHERE status = ?", (status,)
+        with self._connect() as db:
+            ids = [r[0] for r in db.execute(query + " ORDER BY created_at DESC LIMIT ?", (*args, limit))]
+        return [self.get(job_id) for job_id in ids]
+
+
+def _run_job(job_id, store_path, source_path, filename, size, digest=None, options=None, profile=False,
+             cache_config=None, trace=False, concurrent_jobs=1):
+    # Runs inside a worker process. Returns the job's tracing spans (see
+    # tracing.py) so the parent process can add them to its own metrics.
+    # concurrent_jobs: the pool's size, so a long video's segment encoders
+    # (see parallel_transcode.py) only take this job's share of the cores.
+    from parallel_transcode import segment_workers
+    from video_processor import process_video
+
+    if trace:
+        tracing.enable()
+    store = JobStore(store_path)
+    store.update(job_id, status=RUNNING, stage="spool", progress=0.0, started_at=time.time())
+
+    def report(stage, fraction):
+        store.update(job_id, stage=stage, progress=round(fraction, 3))
+
+    upload = SpooledUpload(source_path, filename, size)
+    # profile: cProfile this one job (the report's path ends up in the result)
+    profiler = tracing.profile(f"job_{job_id}") if profile else contextlib.nullcontext({})
+    try:
+        with tracing.capture() as spans, profiler as profiled:
+            result = process_video(upload, progress=report,
+                                   **{"workers": segment_workers(concurrent_jobs), **(options or {})})
+    finally:
+        upload.close()
+        os.remove(source_path)
+    if profiled.get("path"):
+        result["profile_path"] = profiled["path"]
+
+    if "error" in result:
+        store.update(job_id, status=FAILED, error=result["error"], finished_at=time.time())
+        return spans
+    if spans:
+        result["timings"] = {entry["span"]: entry["seconds"] for entry in spans}
+
+    if digest and cache_config:
+        # Keep the preview + metadata under the content hash for repeat uploads
+        from artifact_cache import ArtifactCache
+        entry = ArtifactCache(*cache_config).put(digest, preview_path=result["preview_path"],
+                                                  metadata=result["metadata"])
+        result["preview_path"] = entry["preview_path"]
+        # The preview left the scratch artifact: its size no longer counts there
+        from scratch_space import get_scratch
+        get_scratch().refresh(result["artifact_id"])
+    store.update(job_id, status=DONE, stage="done", progress=1.0, result=result, finished_at=time.time())
+    return spans
+
+
+class TranscodeQueue:
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED, store_path=DEFAULT_STORE_PATH,
+                 cache=None):
+        self.store = JobStore(store_path)
+        # Optional ArtifactCache: finished previews are filed under the upload's hash
+        self.cache = cache
+        self.max_workers = max_workers
+        # "spawn" keeps the workers clean of Streamlit's threads and sockets
+        self._pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._pending = queue.Queue(maxsize=max_queued)
+        self._slots = threading.Semaphore(max_workers)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="transcode-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, uploaded_file, digest=None, options=None, profile=False):
+        # Returns a job id right away; raises QueueFull under load.
+        # digest is the upload's SHA-256 (see artifact_cache.py), if known.
+        # options are extra process_video() arguments, e.g. {"hls_profile": "fast"}.
+        # profile=True runs this job under cProfile (see tracing.profile).
+        if self._pending.full():
+            raise QueueFull(f"{self._pending.maxsize} videos are already waiting, please try again shortly.")
+
+        job_id = uuid.uuid4().hex
+        # Copied in chunks, so memory stays flat whatever the file size
+        spooled = spool_to_disk(uploaded_file)
+
+        self.store.create(job_id, uploaded_file.name)
+        try:
+            self._pending.put_nowait((job_id, spooled.path, uploaded_file.name, spooled.size, digest, options,
+                                      profile))
+        except queue.Full:
+            spooled.remove()
+            self.store.update(job_id, status=FAILED, error="Queue full", finished_at=time.time())
+            raise QueueFull("Too many videos are waiting, please try again shortly.")
+        return job_id
+
+    def status(self, job_id):
+        return self.store.get(job_id)
+
+    def queued_count(self):
+        return self._pending.qsize()
+
+    def _dispatch(self):
+        # Hands jobs to the pool only when a worker is free, so the pool never
+        # holds more than max_workers jobs and the rest stay "queued".
+        while True:
+            job = self._pending.get()
+            if job is None:
+                return
+            self._slots.acquire()
+            cache_config = (self.cache.root, self.cache.max_bytes) if self.cache else None
+            try:
+                future = self._pool.submit(_run_job, job[0], self.store.path, *job[1:], cache_config=cache_config,
+                                           trace=tracing.enabled(), concurrent_jobs=self.max_workers)
+            except Exception as e:
+                self._slots.release()
+                self.store.update(job[0], status=FAILED, error=str(e), finished_at=time.time())
+                continue
+            future.add_done_callback(lambda f, job_id=job[0]: self._finished(job_id, f))
+
+    def _finished(self, job_id, future):
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            # The worker died or raised outside process_video's own error handling
+            self.store.update(job_id, status=FAILED, error=str(error), finished_at=time.time())
+        else:
+            tracing.merge(future.result())
+
+    def shutdown(self, wait=True):
+        self._pending.put(None)
+        self._pool.shutdown(wait=wait)
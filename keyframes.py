@@ -0,0 +1,145 @@
+# keyframes.py
+# Finds the "representative" frames of a video: the moments where the scene
+# changes. Thumbnails, AI tagging and previews can all use them.
+#
+# How it works:
+#   1. moviepy decodes the video at a tiny size (ffmpeg scales while decoding,
+#      default 90 px high) and we look at a few frames per second
+#   2. frames are collected into batches (NumPy arrays) and scored in one go:
+#        - pixel difference with the previous frame (grayscale)
+#        - colour histogram difference with the previous frame
+#   3. the highest scores, at least min_gap seconds apart, are the keyframes
+#      (the first frame has nothing to differ from: it scores 0, so a black
+#      or title frame at t=0 isn't picked just for being first)
+# Only one batch of small frames is in memory at a time, and a time budget
+# stops the scan early on very long videos (best keyframes found so far).
+import time
+
+import numpy as np
+
+ANALYSIS_HEIGHT = 90
+SAMPLE_FPS = 5
+TIME_BUDGET = 5.0  # seconds of scanning for representative_times()
+BATCH_SIZE = 64
+HIST_BINS = 4  # per channel -> 4 x 4 x 4 = 64 colour bins
+GRAY = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def iter_frame_batches(path, height=ANALYSIS_HEIGHT, sample_fps=SAMPLE_FPS, batch_size=BATCH_SIZE):
+    # Yields (times, frames): times is (N,), frames is (N, H, W, 3) uint8.
+    # The frames array is reused for the next batch, so copy what you keep.
+    from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(path, target_resolution=(height, None), audio=False)
+    try:
+        fps = min(sample_fps, clip.fps) if sample_fps else clip.fps
+        width, height = clip.size
+        frames = np.empty((batch_size, height, width, 3), dtype=np.uint8)
+        times = np.empty(batch_size, dtype=np.float64)
+        n = 0
+        for i, frame in enumerate(clip.iter_frames(fps=fps, dtype="uint8")):
+            frames[n] = frame
+            times[n] = i / fps
+            n += 1
+            if n == batch_size:
+                yield times, frames
+                n = 0
+        if n:
+            yield times[:n], frames[:n]
+    finally:
+        clip.close()
+
+
+def color_histograms(frames):
+    # (N, H, W, 3) -> (N, 64) normalised colour histograms, all frames at once
+    n = len(frames)
+    shift = 8 - int(np.log2(HIST_BINS))
+    q = (frames >> shift).astype(np.int32)
+    index = (q[..., 0] * HIST_BINS + q[..., 1]) * HIST_BINS + q[..., 2]
+    bins = HIST_BINS ** 3
+    index += (np.arange(n, dtype=np.int32) * bins)[:, None, None]
+    counts = np.bincount(index.ravel(), minlength=n * bins).reshape(n, bins)
+    return counts / float(frames.shape[1] * frames.shape[2])
+
+
+def score_batch(frames, previous=None):
+    # Scene-change score in [0, 1] for every frame in the batch, against the
+    # frame before it. previous = (gray, histogram) of the last frame of the
+    # previous batch. Returns (scores, new previous).
+    gray = frames.astype(np.float32) @ GRAY
+    hist = color_histograms(frames)
+    if previous is not None:
+        gray = np.concatenate([previous[0][None], gray])
+        hist = np.concatenate([previous[1][None], hist])
+    pixel = np.abs(np.diff(gray, axis=0)).mean(axis=(1, 2)) / 255.0
+    colour = 0.5 * np.abs(np.diff(hist, axis=0)).sum(axis=1)
+    scores = 0.5 * pixel + 0.5 * colour
+    if previous is None:
+        scores = np.concatenate([[0.0], scores])  # No frame before the first one
+    return scores, (gray[-1], hist[-1])
+
+
+def iter_scene_scores(path, height=ANALYSIS_HEIGHT, sample_fps=SAMPLE_FPS, batch_size=BATCH_SIZE):
+    # Streaming API: yields (t, score) for every sampled frame, batch by batch
+    previous = None
+    for times, frames in iter_frame_batches(path, height, sample_fps, batch_size):
+        scores, previous = score_batch(frames, previous)
+        yield from zip(times.tolist(), scores.tolist())
+
+
+def pick_peaks(times, scores, k, min_gap):
+    # The k best scores, at least min_gap seconds apart, returned in time order
+    # (frames that changed nothing are not keyframes)
+    picked = []
+    for i in np.argsort(scores)[::-1]:
+        if scores[i] <= 0:
+            break
+        if all(abs(times[i] - times[j]) >= min_gap for j in picked):
+            picked.append(i)
+            if len(picked) == k:
+                break
+    return sorted(picked, key=lambda i: times[i])
+
+
+def detect_keyframes(path, k=8, time_budget=None, min_gap=1.0, height=ANALYSIS_HEIGHT,
+                     sample_fps=SAMPLE_FPS, batch_size=BATCH_SIZE):
+    # Returns {"times", "scores", "frames_scanned", "seconds", "complete"}.
+    # time_budget (seconds): stop scanning when it runs out; "complete" says
+    # whether the whole video was seen.
+    start = time.perf_counter()
+    all_times, all_scores = [], []
+    complete = True
+    previous = None
+    for times, frames in iter_frame_batches(path, height, sample_fps, batch_size):
+        scores, previous = score_batch(frames, previous)
+        all_times.append(times.copy())
+        all_scores.append(scores)
+        if time_budget is not None and time.perf_counter() - start > time_budget:
+            complete = False
+            break
+
+    times = np.concatenate(all_times) if all_times else np.empty(0)
+    scores = np.concatenate(all_scores) if all_scores else np.empty(0)
+    picked = pick_peaks(times, scores, k, min_gap)
+    return {"times": [round(float(times[i]), 3) for i in picked],
+            "scores": [round(float(scores[i]), 4) for i in picked],
+            "frames_scanned": len(times), "seconds": round(time.perf_counter() - start, 3),
+            "complete": complete}
+
+
+def representative_times(path, n_frames, duration, time_budget=TIME_BUDGET):
+    # n times worth looking at: scene changes first, then evenly spaced
+    # times fill the gaps (also the fallback if the scan fails)
+    from video_processor import sample_times
+
+    min_gap = max(0.5, duration / (4 * n_frames))
+    try:
+        times = detect_keyframes(path, k=n_frames, time_budget=time_budget, min_gap=min_gap)["times"]
+    except Exception:
+        times = []
+    for t in sample_times(duration, n_frames):
+        if len(times) >= n_frames:
+            break
+        if all(abs(t - other) >= min_gap for other in times):
+            times.append(t)
+    return sorted(times)
@@ -0,0 +1,39 @@
+-- migrations/001_videos_inventory_columns.sql
+-- Columns the app writes to videos_inventory on top of the original
+-- (id, created_at, file_name, title, category, price, owner_id).
+-- Run it once in the Supabase SQL editor (or psql); it is safe to re-run.
+--
+--   description          the AI uploader's description / analysis
+--   poster_file ...      bucket names of the poster + sprite sheet (video_processor.thumbnail_names)
+--   duration_s ...       header metadata from video_probe.probe()
+--   updated_at           lets inventory.py fetch only the rows that changed
+--                        (without it, edits show up on the next full reload)
+
+alter table videos_inventory
+    add column if not exists description text,
+    add column if not exists poster_file text,
+    add column if not exists sprite_file text,
+    add column if not exists sprite_index_file text,
+    add column if not exists duration_s double precision,
+    add column if not exists width integer,
+    add column if not exists height integer,
+    add column if not exists fps double precision,
+    add column if not exists bitrate bigint,
+    add column if not exists codec text,
+    add column if not exists has_audio boolean,
+    add column if not exists size_bytes bigint,
+    add column if not exists updated_at timestamptz not null default now();
+
+create or replace function videos_inventory_touch() returns trigger as $$
+begin
+    new.updated_at = now();
+    return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists videos_inventory_touch on videos_inventory;
+create trigger videos_inventory_touch before update on videos_inventory
+    for each row execute function videos_inventory_touch();
+
+-- The (updated_at, id) cursor of inventory.InventoryRepository
+create index if not exists videos_inventory_updated_at_id on videos_inventory (updated_at, id);
@@ -0,0 +1,152 @@
+# parallel_transcode.py
+# Segment-parallel preview encoding for long videos.
+#
+# write_videofile() encodes the whole preview in one ffmpeg process, so a
+# two-hour upload takes time proportional to its length however many cores
+# the box has. Here:
+#   1. the source VIDEO is cut into pieces at keyframes ("-c copy": no decoding)
+#   2. each piece is scaled to 480p, watermarked and encoded by its own ffmpeg
+#      process, several at once
+#   3. the encoded pieces are glued back together without re-encoding (concat)
+#      and the AUDIO is encoded once, from the source, in the same step
+# check_parity() compares duration and frame count against the serial encode
+# of the same file (workers=1), so a bad cut can't slip through silently.
+#
+# Every job can start this many ffmpeg processes, and job_queue.py runs
+# several jobs at once. segment_workers() shares the cores out between the
+# jobs (TROVEO_SEGMENT_WORKERS can lower it further): with 4 jobs on 8 cores,
+# each job gets 2 encoders, not 8.
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from moviepy.config import get_setting
+
+from hls_packager import watermark_png
+from scratch_space import get_scratch
+from video_probe import probe
+from watermark import PREVIEW_HEIGHT
+
+SEGMENT_WORKERS = int(os.environ.get("TROVEO_SEGMENT_WORKERS", 0))  # 0 = the job's share of the cores
+# Below this length splitting costs more than it saves
+MIN_PARALLEL_SECONDS = float(os.environ.get("TROVEO_PARALLEL_MIN_SECONDS", 60))
+
+
+class TranscodeError(Exception):
+    pass
+
+
+def segment_workers(concurrent_jobs=1):
+    # Encoders for one job when `concurrent_jobs` jobs can run at the same time
+    share = max(1, (os.cpu_count() or 1) // max(1, concurrent_jobs))
+    return min(SEGMENT_WORKERS, share) if SEGMENT_WORKERS > 0 else share
+
+
+DEFAULT_WORKERS = segment_workers()
+
+
+def _ffmpeg(args):
+    out = subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-hide_banner", *args],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if out.returncode != 0:
+        raise TranscodeError(out.stderr.decode(errors="replace").strip()[-2000:])
+    return out.stderr.decode(errors="replace")
+
+
+def count_frames(path):
+    # Counts the video packets without decoding them: framecrc prints one
+    # line per packet of the (stream-copied) video track
+    out = subprocess.run([get_setting("FFMPEG_BINARY"), "-hide_banner", "-i", path, "-map", "0:v:0",
+                          "-c", "copy", "-f", "framecrc", "-"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if out.returncode != 0:
+        raise TranscodeError(out.stderr.decode(errors="replace").strip()[-2000:])
+    return sum(1 for line in out.stdout.splitlines() if line and not line.startswith(b"#"))
+
+
+def split_at_keyframes(path, out_dir, segment_seconds):
+    # The segment muxer only cuts on a keyframe at or after each boundary, so
+    # every piece starts with a keyframe and decodes on its own
+    pattern = os.path.join(out_dir, "part_%05d.mp4")
+    _ffmpeg(["-i", path, "-map", "0:v:0", "-an", "-c", "copy", "-f", "segment",
+             "-segment_time", str(segment_seconds), "-reset_timestamps", "1", pattern])
+    return sorted(os.path.join(out_dir, name) for name in os.listdir(out_dir) if name.startswith("part_"))
+
+
+def encode_segment(source, destination, height=PREVIEW_HEIGHT, watermark_path=None, threads=0, audio_from=None):
+    # Scale -> watermark -> libx264. Frames are passed through 1:1 (no frame
+    # rate conversion), so the frame count of the piece is kept exactly.
+    args = ["-i", source]
+    if watermark_path:
+        args += ["-i", watermark_path, "-filter_complex",
+                 f"[0:v]scale=-2:{height}[v];[v][1:v]overlay=(W-w)/2:(H-h)/2[out]", "-map", "[out]"]
+    else:
+        args += ["-vf", f"scale=-2:{height}", "-map", "0:v:0"]
+    if audio_from == "self":
+        args += ["-map", "0:a?", "-c:a", "aac"]
+    args += ["-c:v", "libx264", "-preset", "medium", "-pix_fmt", "yuv420p", "-fps_mode", "passthrough",
+             "-threads", str(threads), destination]
+    _ffmpeg(args)
+    return destination
+
+
+def concat_segments(parts, audio_source, destination, work_dir):
+    # Lossless join of the encoded pieces + the source audio encoded once
+    list_path = os.path.join(work_dir, "parts.txt")
+    with open(list_path, "w") as f:
+        for part in parts:
+            f.write(f"file '{part}'\n")
+    _ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-i", audio_source,
+             "-map", "0:v:0", "-map", "1:a:0?", "-c:v", "copy", "-c:a", "aac",
+             "-movflags", "+faststart", destination])
+    return destination
+
+
+def transcode(path, out_path, workers=DEFAULT_WORKERS, segment_seconds=None, height=PREVIEW_HEIGHT,
+              watermark=True, progress=None):
+    # Makes the 480p watermarked preview. workers=1 is the plain serial encode
+    # (one ffmpeg over the whole file). progress(fraction) after each piece.
+    start = time.perf_counter()
+    info = probe(path)
+    work_dir = get_scratch().job("segments").path
+    try:
+        watermark_path = None
+        if watermark:
+            watermark_path = watermark_png((info["width"], info["height"]), height,
+                                           os.path.join(work_dir, "watermark.png"))
+
+        if workers <= 1:
+            encode_segment(path, out_path, height, watermark_path, audio_from="self")
+            parts = [out_path]
+        else:
+            # About 4 pieces per worker keeps everyone busy to the end
+            segment_seconds = segment_seconds or max(2.0, info["duration_s"] / (workers * 4))
+            pieces = split_at_keyframes(path, work_dir, segment_seconds)
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            # Each piece is its own ffmpeg process; the threads only wait on them
+            with ThreadPoolExecutor(workers) as pool:
+                futures = [pool.submit(encode_segment, piece, piece.replace("part_", "enc_"), height,
+                                       watermark_path, threads) for piece in pieces]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    future.result()
+                    if progress:
+                        progress(done / len(futures))
+            parts = [piece.replace("part_", "enc_") for piece in pieces]
+            concat_segments(parts, path, out_path, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if progress:
+        progress(1.0)
+    return {"workers": workers, "segments": len(parts), "seconds": round(time.perf_counter() - start, 2)}
+
+
+def check_parity(serial_path, output_path, duration_tolerance=0.1):
+    # Same number of frames and (almost) the same duration as serial_path,
+    # the serial encode of the same source (transcode(..., workers=1))
+    serial, output = probe(serial_path), probe(output_path)
+    result = {"serial_frames": count_frames(serial_path), "output_frames": count_frames(output_path),
+              "serial_duration": round(serial["duration_s"], 3), "output_duration": round(output["duration_s"], 3)}
+    result["ok"] = (result["serial_frames"] == result["output_frames"]
+                    and abs(result["serial_duration"] - result["output_duration"]) <= duration_tolerance)
+    return result
@@ -0,0 +1,278 @@
+# phash_index.py
+# Near-duplicate detection for uploads.
+#
+# A re-encoded, resized or trimmed copy of a clip has different bytes, so the
+# SHA-256 in artifact_cache.py can't catch it. Here every upload gets a
+# perceptual fingerprint: a 64-bit hash per sampled frame (pHash or dHash)
+# that barely changes when the video is re-compressed or scaled. Two frames
+# "look the same" when their hashes differ in only a few bits (Hamming distance).
+#
+# The index is a few flat NumPy arrays, searched with multi-index hashing:
+#   - every 64-bit hash is cut into 4 chunks of 16 bits
+#   - if two hashes are within 8 bits, at least one chunk is within 2 bits
+#     (pigeonhole), so we only look in the buckets of the query's chunks and
+#     their close neighbours instead of scanning every signature
+#   - per chunk, signatures are sorted by chunk value with a bucket offset
+#     table (like a CSR matrix), so a bucket is one slice
+# It is saved with np.save and opened with memory mapping, so loading a
+# million signatures is instant. New signatures go to a small "delta" part
+# that is merged into the main arrays once it grows.
+# Deleted videos: remove(video_id) drops them from the delta at once and
+# hides them in the main arrays until the next save() rewrites those. The
+# index listens to the inventory (see inventory.add_listener): a full
+# reload that no longer has a video removes it.
+import os
+import threading
+from itertools import combinations
+
+import numpy as np
+from PIL import Image
+
+from artifact_cache import DEFAULT_ROOT
+
+DEFAULT_PATH = os.path.join(DEFAULT_ROOT, "phash_index")
+N_FRAMES = 16
+MAX_DISTANCE = 8        # bits out of 64 for two frames to count as the same
+MIN_MATCH_RATIO = 0.3   # share of the upload's frames that must match a video
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+COMPACT_AT = 50_000     # delta signatures before they are merged into the main arrays
+
+# DCT-II matrix for the 32x32 pHash
+_N = 32
+_DCT = np.sqrt(2.0 / _N) * np.cos(np.pi * (2 * np.arange(_N)[None, :] + 1) * np.arange(_N)[:, None] / (2 * _N))
+_DCT[0] /= np.sqrt(2.0)
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(64, dtype=np.uint64))[::-1]
+
+
+def _pack_bits(bits):
+    # 64 booleans -> one uint64
+    return np.uint64(np.bitwise_or.reduce(np.where(bits.ravel(), _BIT_WEIGHTS, np.uint64(0))))
+
+
+def _gray(frame, size):
+    return np.asarray(Image.fromarray(frame).convert("L").resize(size, Image.BILINEAR), dtype=np.float64)
+
+
+def dhash(frame):
+    # Difference hash: is each pixel brighter than its right neighbour (9x8 thumbnail)
+    pixels = _gray(frame, (9, 8))
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(frame):
+    # Perceptual hash: low frequencies of a 32x32 DCT, above/below their median
+    pixels = _gray(frame, (_N, _N))
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8]
+    return _pack_bits(low > np.median(low.ravel()[1:]))
+
+
+def popcount(values):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    as_bytes = values.view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1)
+
+
+def fingerprint_video(path, n_frames=N_FRAMES, method="phash", duration=None):
+    # One 64-bit hash per representative frame. Scene changes are picked
+    # first, so a trimmed copy still shares most of its sampled moments.
+    from keyframes import representative_times
+    from video_probe import probe
+    from video_processor import extract_frame
+
+    duration = duration if duration is not None else probe(path)["duration_s"]
+    hash_frame = phash if method == "phash" else dhash
+    times = representative_times(path, n_frames, duration)
+    return np.array([hash_frame(extract_frame(path, t, 128)) for t in times], dtype=np.uint64)
+
+
+def _chunk(hashes, c):
+    shift = np.uint64(64 - CHUNK_BITS * (c + 1))
+    return ((hashes >> shift) & np.uint64((1 << CHUNK_BITS) - 1)).astype(np.int64)
+
+
+def _neighbour_masks(radius):
+    # XOR masks of every 16-bit pattern with at most `radius` bits set
+    masks = [0]
+    for r in range(1, radius + 1):
+        masks += [sum(1 << bit for bit in bits) for bits in combinations(range(CHUNK_BITS), r)]
+    return np.array(masks, dtype=np.int64)
+
+
+class PHashIndex:
+
+    def __init__(self, path=DEFAULT_PATH, max_distance=MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._masks = _neighbour_masks(max_distance // CHUNKS)
+        self._lock = threading.Lock()
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.video_ids = np.empty(0, dtype=np.int64)
+        self.order = [np.empty(0, dtype=np.int64)] * CHUNKS
+        self.offsets = [np.zeros((1 << CHUNK_BITS) + 1, dtype=np.int64)] * CHUNKS
+        self.delta_hashes = np.empty(0, dtype=np.uint64)
+        self.delta_ids = np.empty(0, dtype=np.int64)
+        self.removed = np.empty(0, dtype=np.int64)  # ids still in the main arrays, skipped
+        self._live_ids = None   # ids of the last full inventory reload, not applied yet
+        if path and os.path.exists(os.path.join(path, "hashes.npy")):
+            self.load()
+
+    def __len__(self):
+        return len(self.hashes) + len(self.delta_hashes)
+
+    # --- Building, saving, loading ---
+
+    @classmethod
+    def build(cls, hashes, video_ids, path=DEFAULT_PATH, max_distance=MAX_DISTANCE):
+        index = cls(path=None, max_distance=max_distance)
+        index.path = path
+        index._set_main(np.asarray(hashes, dtype=np.uint64), np.asarray(video_ids, dtype=np.int64))
+        return index
+
+    def _set_main(self, hashes, video_ids):
+        self.hashes, self.video_ids = hashes, video_ids
+        self.order, self.offsets = [], []
+        for c in range(CHUNKS):
+            values = _chunk(hashes, c)
+            self.order.append(np.argsort(values, kind="stable"))
+            counts = np.bincount(values, minlength=1 << CHUNK_BITS)
+            self.offsets.append(np.concatenate([[0], np.cumsum(counts)]))
+
+    def save(self, compact=False):
+        # Writes the small delta every time; rewrites the main arrays only
+        # when the delta is big enough (or compact=True)
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            if (compact or len(self.removed) or len(self.delta_hashes) >= COMPACT_AT
+                    or not os.path.exists(self._file("hashes"))):
+                hashes = np.concatenate([self.hashes, self.delta_hashes])
+                video_ids = np.concatenate([self.video_ids, self.delta_ids])
+                kept = ~np.isin(video_ids, self.removed)
+                self._set_main(hashes[kept], video_ids[kept])
+                self.removed = np.empty(0, dtype=np.int64)
+                self.delta_hashes = np.empty(0, dtype=np.uint64)
+                self.delta_ids = np.empty(0, dtype=np.int64)
+                self._write("hashes", self.hashes)
+                self._write("video_ids", self.video_ids)
+                for c in range(CHUNKS):
+                    self._write(f"order_{c}", self.order[c])
+                    self._write(f"offsets_{c}", self.offsets[c])
+            self._write("delta_hashes", self.delta_hashes)
+            self._write("delta_ids", self.delta_ids)
+
+    def load(self):
+        # Memory-mapped: pages are read from disk only when a lookup touches them
+        with self._lock:
+            self.hashes = np.load(self._file("hashes"), mmap_mode="r")
+            self.video_ids = np.load(self._file("video_ids"), mmap_mode="r")
+            self.order = [np.load(self._file(f"order_{c}"), mmap_mode="r") for c in range(CHUNKS)]
+            self.offsets = [np.load(self._file(f"offsets_{c}"), mmap_mode="r") for c in range(CHUNKS)]
+            if os.path.exists(self._file("delta_hashes")):
+                self.delta_hashes = np.load(self._file("delta_hashes"))
+                self.delta_ids = np.load(self._file("delta_ids"))
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.npy")
+
+    def _write(self, name, array):
+        # Write next to the old file, then swap, so a crash never leaves half a file
+        tmp = os.path.join(self.path, f"{name}.tmp.npy")
+        np.save(tmp, np.ascontiguousarray(array))
+        os.replace(tmp, self._file(name))
+
+    # --- Adding and searching ---
+
+    def add(self, video_id, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        with self._lock:
+            self.delta_hashes = np.concatenate([self.delta_hashes, hashes])
+            self.delta_ids = np.concatenate([self.delta_ids, np.full(len(hashes), video_id, dtype=np.int64)])
+
+    def remove(self, video_id):
+        # Drops a deleted video (or an array of them) from the index; save()
+        # makes it permanent
+        video_ids = np.atleast_1d(np.asarray(video_id, dtype=np.int64))
+        with self._lock:
+            kept = ~np.isin(self.delta_ids, video_ids)
+            self.delta_hashes, self.delta_ids = self.delta_hashes[kept], self.delta_ids[kept]
+            stored = video_ids[np.isin(video_ids, self.video_ids)]
+            self.removed = np.union1d(self.removed, stored)
+
+    def on_inventory_change(self, rows, full):
+        # Listener for InventoryRepository.add_listener: only a full reload
+        # can tell us a video is gone, so only that is kept (for the next search)
+        if full and rows:
+            ids = np.fromiter((row["id"] for row in rows), dtype=np.int64, count=len(rows))
+            with self._lock:
+                self._live_ids = ids
+
+    def _apply_deletions(self):
+        with self._lock:
+            live, self._live_ids = self._live_ids, None
+            if live is None:
+                return
+            known = np.union1d(self.video_ids, self.delta_ids)
+            # Ids above the reload's newest were added after it was read, not deleted
+            gone = known[~np.isin(known, live) & (known <= live.max())]
+            gone = np.setdiff1d(gone, self.removed)
+        if len(gone):
+            self.remove(gone)
+            if self.path:
+                self.save()
+
+    def candidates(self, query):
+        # Positions in the main arrays that share a near chunk with the query hash
+        # (a position can appear once per chunk; search_hash() drops the repeats)
+        found = []
+        for c in range(CHUNKS):
+            probes = _chunk(np.array([query], dtype=np.uint64), c)[0] ^ self._masks
+            starts, ends = self.offsets[c][probes], self.offsets[c][probes + 1]
+            lengths = ends - starts
+            total = int(lengths.sum())
+            if total:
+                # All bucket slices at once: start of each slice, repeated, plus a running offset
+                steps = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                found.append(self.order[c][np.repeat(starts, lengths) + steps])
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def search_hash(self, query, max_distance=None):
+        # (video_ids, distances) of every stored frame within max_distance bits
+        max_distance = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            positions = self.candidates(query)
+            distances = popcount(np.asarray(self.hashes)[positions] ^ np.uint64(query))
+            positions, first = np.unique(positions[distances <= max_distance], return_index=True)
+            ids, dists = np.asarray(self.video_ids)[positions], distances[distances <= max_distance][first]
+            if len(self.removed):
+                kept = ~np.isin(ids, self.removed)
+                ids, dists = ids[kept], dists[kept]
+            if len(self.delta_hashes):
+                # The delta is small: just scan it
+                delta = popcount(self.delta_hashes ^ np.uint64(query))
+                near = delta <= max_distance
+                ids = np.concatenate([ids, self.delta_ids[near]])
+                dists = np.concatenate([dists, delta[near]])
+        return ids, dists
+
+    def find_duplicates(self, hashes, min_ratio=MIN_MATCH_RATIO, exclude=None):
+        # Videos that share at least min_ratio of the upload's frames, best first:
+        # [{"video_id", "matched_frames", "ratio", "mean_distance"}]
+        self._apply_deletions()
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        matched, distance = {}, {}
+        for query in hashes:
+            ids, dists = self.search_hash(query)
+            best = {}
+            for video_id, d in zip(ids.tolist(), dists.tolist()):
+                best[video_id] = min(d, best.get(video_id, 64))
+            for video_id, d in best.items():
+                matched[video_id] = matched.get(video_id, 0) + 1
+                distance[video_id] = distance.get(video_id, 0) + d
+        results = []
+        for video_id, count in matched.items():
+            ratio = count / len(hashes)
+            if video_id != exclude and ratio >= min_ratio and count >= min(2, len(hashes)):
+                results.append({"video_id": video_id, "matched_frames": count, "ratio": round(ratio, 3),
+                                "mean_distance": round(distance[video_id] / count, 2)})
+        return sorted(results, key=lambda r: (-r["ratio"], r["mean_distance"]))
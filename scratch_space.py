@@ -0,0 +1,384 @@
+# scratch_space.py
+# One place for temporary files, with a disk budget.
+#
+# process_video() left its spooled original and its preview behind
+# (NamedTemporaryFile(delete=False)), thumbnails went to mkdtemp() folders
+# nobody removed, and a failed YouTube import left yt_down_* files in the
+# working directory. Under load the disk filled up. Now every temp file lives
+# under one root (TROVEO_SCRATCH_DIR):
+#   tmp/         loose temp files (e.g. spooled uploads)
+#   jobs/        one folder per running job, removed when the job ends
+#   artifacts/   finished outputs (preview, thumbnails, HLS) kept for display
+#   cache/       the stores that outlive a job: the ArtifactCache previews and
+#                index, the AI analysis cache and the phash index (they
+#                default to this folder, see artifact_cache.py)
+#   job_queue.db the job queue's status table (see job_queue.py)
+# Names under tmp/, jobs/ and artifacts/ carry the id of the process that made
+# them (its pid and start time, so a restarted container whose process gets
+# the same pid again isn't mistaken for the old one); at startup the leftovers
+# of a crashed process are found and deleted.
+# Everything under the root counts against one byte budget: when it is over,
+# the least recently used artifacts are deleted, except the ones somebody
+# holds a handle on (reference counts per process, in a small SQLite file).
+# The cache/ stores evict their own entries (the ArtifactCache keeps its
+# previews under a share of this budget); only a store moved out of the root
+# with its own variable (TROVEO_CACHE_DIR, TROVEO_JOB_DB) is not counted.
+# If the root is on tmpfs (RAM), the default budget is a quarter of its size.
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DEFAULT_ROOT = os.environ.get("TROVEO_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "troveo_scratch"))
+DEFAULT_MAX_BYTES = int(os.environ.get("TROVEO_SCRATCH_MAX_BYTES", 20 * 1024 ** 3))
+TMPFS_SHARE = 0.25
+
+
+def mount_type(path):
+    # Filesystem type of the mount holding path ("tmpfs", "ext4"...), None if unknown
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount = fields[1].replace("\\040", " ")
+                if (path == mount or path.startswith(mount.rstrip("/") + "/")) and len(mount) > len(best):
+                    best, fstype = mount, fields[2]
+    except OSError:
+        return None
+    return fstype
+
+
+def tree_bytes(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for folder, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(folder, name))
+            except OSError:
+                pass  # Deleted while we walked
+    return total
+
+
+def _start_time(pid):
+    # When the process started, in clock ticks since boot; None where /proc can't tell
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _process_id():
+    # "<pid>.<start time>" for this process (just "<pid>" without /proc)
+    pid = os.getpid()
+    started = _start_time(pid)
+    return str(pid) if started is None else f"{pid}.{started}"
+
+
+def _owner(name):
+    # "<prefix>-<pid>[.<start>]-<random>[.ext]" -> (pid, start or None),
+    # None if the name isn't one of ours
+    parts = name.rsplit("-", 2)
+    if len(parts) != 3:
+        return None
+    pid, _, started = parts[1].partition(".")
+    try:
+        return int(pid), int(started) if started else None
+    except ValueError:
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Someone else's process, but alive
+    return True
+
+
+def _alive(pid, started=None):
+    # Is the process that made something still running? Same pid is not
+    # enough: after a container restart pid 1 is back, but a new process.
+    if not _pid_alive(pid):
+        return False
+    return started is None or _start_time(pid) in (None, started)
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class ScratchJob:
+    # A folder for one job. `with space.job("process") as job:` removes it at
+    # the end; job.finish() keeps its files as an artifact instead.
+
+    def __init__(self, space, path):
+        self.space = space
+        self.path = path
+        self.id = os.path.basename(path)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def folder(self, name):
+        path = self.file(name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def finish(self, remove=()):
+        # Keeps what is left (minus `remove`) as an artifact; returns its id
+        for path in remove:
+            _remove(path)
+        return self.space._adopt(self)
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArtifactHandle:
+    # While a handle is open, its artifact is never evicted
+
+    def __init__(self, space, artifact_id):
+        self.space = space
+        self.id = artifact_id
+        self.path = space.artifact_dir(artifact_id)
+        self._released = False
+
+    def file(self, *parts):
+        return os.path.join(self.path, *parts)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.space._release(self.id)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class ScratchSpace:
+
+    def __init__(self, root=DEFAULT_ROOT, max_bytes=None):
+        self.root = root
+        self.dirs = {name: os.path.join(root, name) for name in ("tmp", "jobs", "artifacts")}
+        self.db_path = os.path.join(root, "scratch.db")
+        for path in self.dirs.values():
+            os.makedirs(path, exist_ok=True)
+        self.tmpfs = mount_type(root) == "tmpfs"
+        if max_bytes is None:
+            max_bytes = DEFAULT_MAX_BYTES
+            if self.tmpfs:
+                # RAM-backed: never let scratch files take more than a share of it
+                max_bytes = min(max_bytes, int(shutil.disk_usage(root).total * TMPFS_SHARE))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS artifacts (id TEXT PRIMARY KEY, bytes INTEGER, "
+                       "created_at REAL, last_used REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS refs (id TEXT, pid INTEGER, started INTEGER, count INTEGER, "
+                       "PRIMARY KEY (id, pid))")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+        self.recover()
+
+    @contextmanager
+    def _connect(self):
+        # A transaction that is committed (or rolled back) and then closed
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _name(self, prefix, suffix=""):
+        return f"{prefix}-{_process_id()}-{uuid.uuid4().hex[:12]}{suffix}"
+
+    def _other_bytes(self):
+        # Everything under the root except the artifacts (counted from their rows)
+        return sum(tree_bytes(os.path.join(self.root, name)) for name in os.listdir(self.root)
+                   if name != "artifacts")
+
+    def _count(self, db, name, amount):
+        db.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    # --- Temp files and job folders ---
+
+    def temp_path(self, suffix="", prefix="tmp"):
+        # A fresh path under tmp/ (the file is not created); delete it when done
+        return os.path.join(self.dirs["tmp"], self._name(prefix, suffix))
+
+    def job(self, prefix="job"):
+        path = os.path.join(self.dirs["jobs"], self._name(prefix))
+        os.makedirs(path)
+        return ScratchJob(self, path)
+
+    # --- Artifacts ---
+
+    def artifact_dir(self, artifact_id):
+        return os.path.join(self.dirs["artifacts"], artifact_id)
+
+    def _adopt(self, job):
+        # The row goes in before the folder moves: recover() (in any process
+        # that starts meanwhile) deletes artifact folders that have no row
+        path = self.artifact_dir(job.id)
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO artifacts (id, bytes, created_at, last_used) VALUES (?, ?, ?, ?)",
+                       (job.id, tree_bytes(job.path), now, now))
+        try:
+            os.rename(job.path, path)  # Same filesystem: atomic
+        except OSError:
+            with self._connect() as db:
+                db.execute("DELETE FROM artifacts WHERE id = ?", (job.id,))
+            raise
+        # Never the artifact that just finished: its caller is about to use it
+        self.evict(keep=job.id)
+        return job.id
+
+    def open_artifact(self, artifact_id):
+        # A handle on a finished artifact (and a fresh "last used"), or None if it is gone
+        path = self.artifact_dir(artifact_id)
+        with self._connect() as db:
+            row = db.execute("SELECT id FROM artifacts WHERE id = ?", (artifact_id,)).fetchone()
+            if row is None or not os.path.isdir(path):
+                return None
+            db.execute("INSERT INTO refs (id, pid, started, count) VALUES (?, ?, ?, 1) "
+                       "ON CONFLICT(id, pid) DO UPDATE SET count = count + 1",
+                       (artifact_id, os.getpid(), _start_time(os.getpid())))
+            db.execute("UPDATE artifacts SET last_used = ? WHERE id = ?", (time.time(), artifact_id))
+        return ArtifactHandle(self, artifact_id)
+
+    def _release(self, artifact_id):
+        with self._connect() as db:
+            db.execute("UPDATE refs SET count = count - 1 WHERE id = ? AND pid = ?", (artifact_id, os.getpid()))
+            db.execute("DELETE FROM refs WHERE count <= 0")
+
+    def refresh(self, artifact_id):
+        # Call after moving files out of an artifact (e.g. into the ArtifactCache)
+        path = self.artifact_dir(artifact_id)
+        with self._connect() as db:
+            db.execute("UPDATE artifacts SET bytes = ? WHERE id = ?", (tree_bytes(path), artifact_id))
+
+    def discard(self, artifact_id):
+        # Deletes an artifact now instead of waiting for eviction (not while a handle holds it)
+        with self._lock, self._connect() as db:
+            if db.execute("SELECT 1 FROM refs WHERE id = ?", (artifact_id,)).fetchone():
+                return False
+            db.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+        shutil.rmtree(self.artifact_dir(artifact_id), ignore_errors=True)
+        return True
+
+    def evict(self, keep=None):
+        # Deletes least recently used, unreferenced artifacts until the whole
+        # root (running jobs, temp files and the cache/ stores included) is under
+        # budget. `keep` (an artifact id) is treated as in use.
+        with self._lock, self._connect() as db:
+            total = self._other_bytes()
+            rows = db.execute("SELECT a.id, a.bytes, COALESCE(SUM(r.count), 0) FROM artifacts a "
+                              "LEFT JOIN refs r ON r.id = a.id GROUP BY a.id ORDER BY a.last_used DESC").fetchall()
+            rows = [(artifact_id, size, refs or artifact_id == keep) for artifact_id, size, refs in rows]
+            # Artifacts in use stay whatever they cost; the rest are kept newest first
+            total += sum(size or 0 for _, size, refs in rows if refs)
+            evicted, evicted_bytes = 0, 0
+            for artifact_id, size, refs in rows:
+                if refs:
+                    continue
+                if total + (size or 0) <= self.max_bytes:
+                    total += size or 0
+                    continue
+                shutil.rmtree(self.artifact_dir(artifact_id), ignore_errors=True)
+                db.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+                evicted, evicted_bytes = evicted + 1, evicted_bytes + (size or 0)
+            if evicted:
+                self._count(db, "evictions", evicted)
+                self._count(db, "evicted_bytes", evicted_bytes)
+        return evicted
+
+    # --- Startup cleanup ---
+
+    def recover(self):
+        # Deletes what crashed processes left behind: their temp files, job
+        # folders and artifact references, and half-registered artifacts.
+        # Anything whose process is still running is left alone - it may be
+        # an artifact being registered right now (see _adopt()).
+        removed = 0
+        for kind in ("tmp", "jobs"):
+            for name in os.listdir(self.dirs[kind]):
+                owner = _owner(name)
+                if owner is None or not _alive(*owner):
+                    _remove(os.path.join(self.dirs[kind], name))
+                    removed += 1
+        with self._connect() as db:
+            known = {row[0] for row in db.execute("SELECT id FROM artifacts")}
+            for name in os.listdir(self.dirs["artifacts"]):
+                owner = _owner(name)
+                if name not in known and (owner is None or not _alive(*owner)):
+                    _remove(self.artifact_dir(name))
+                    removed += 1
+            for artifact_id in known:
+                owner = _owner(artifact_id)
+                if not os.path.isdir(self.artifact_dir(artifact_id)) and (owner is None or not _alive(*owner)):
+                    db.execute("DELETE FROM artifacts WHERE id = ?", (artifact_id,))
+            for pid, started in db.execute("SELECT DISTINCT pid, started FROM refs").fetchall():
+                if not _alive(pid, started):
+                    db.execute("DELETE FROM refs WHERE pid = ?", (pid,))
+            if removed:
+                self._count(db, "recovered", removed)
+        self.evict()
+        return removed
+
+    # --- Metrics ---
+
+    def stats(self):
+        tmp, jobs = tree_bytes(self.dirs["tmp"]), tree_bytes(self.dirs["jobs"])
+        other = self._other_bytes() - tmp - jobs  # cache/ stores and the SQLite files
+        with self._connect() as db:
+            artifacts, artifact_bytes = db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM artifacts").fetchone()
+            pinned = db.execute("SELECT COUNT(DISTINCT id) FROM refs").fetchone()[0]
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        return {"root": self.root, "tmpfs": self.tmpfs, "max_bytes": self.max_bytes,
+                "used_bytes": tmp + jobs + other + artifact_bytes, "tmp_bytes": tmp, "job_bytes": jobs,
+                "cache_bytes": other, "artifact_bytes": artifact_bytes, "artifacts": artifacts, "pinned": pinned,
+                "active_jobs": len(os.listdir(self.dirs["jobs"])),
+                "disk_free_bytes": shutil.disk_usage(self.root).free,
+                "evictions": counters.get("evictions", 0), "evicted_bytes": counters.get("evicted_bytes", 0),
+                "recovered": counters.get("recovered", 0)}
+
+
+_spaces = {}
+_spaces_lock = threading.Lock()
+
+
+def get_scratch(root=DEFAULT_ROOT):
+    # One ScratchSpace per root and process; the first call cleans up after crashes
+    with _spaces_lock:
+        space = _spaces.get(root)
+        if space is None:
+            space = _spaces[root] = ScratchSpace(root)
+        return space
@@ -0,0 +1,271 @@
+# search_index.py
+# Inverted index behind the Marketplace search bar.
+#
+# The old filter was a substring scan over every title on every rerun, and it
+# ignored the category even though the placeholder promised it. Here:
+#   - title, category and description are split into normalized tokens
+#     (lower case, accents removed), each field with its own weight
+#   - every token points to the videos that contain it (postings)
+#   - a partial word matches every token starting with it ("sun" -> "sunset")
+#   - results are ranked with BM25, best match first
+# A query only touches the postings of its own words: they are scored as
+# NumPy arrays and added up in per-slot buffers that are allocated once (and
+# zeroed again only where the query wrote), so its cost follows the size of
+# those postings, not how many listings there are.
+# The index follows the inventory (see inventory.add_listener): only the rows
+# that changed are re-indexed. A removed or changed row leaves its old slot
+# empty; once empty slots are more than COMPACT_FRACTION of all of them, the
+# index is rebuilt from the live rows.
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "description": 1.0}
+MAX_PREFIX_EXPANSIONS = 64
+K1, B = 1.2, 0.75
+COMPACT_FRACTION = 0.25
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text):
+    # "Café Sunset!" -> "cafe sunset!"
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text)) if text else []
+
+
+class SearchIndex:
+
+    def __init__(self, field_weights=FIELD_WEIGHTS):
+        self.field_weights = field_weights
+        self._lock = threading.RLock()
+        self._pending = []          # changed inventory rows not indexed yet
+        self._full_pending = False
+        self._last_rows = None
+        self._reset()
+
+    def _reset(self):
+        # Every video gets a slot number; postings store slots, not ids
+        self._slot_of = {}                  # doc key -> slot
+        self._rows = []                     # slot -> row (None once removed)
+        self._doc_terms = []                # slot -> {token: weighted tf}, used for removal
+        self._fingerprints = []             # slot -> indexed text, to skip unchanged rows
+        # Per-slot arrays, grown by doubling: weighted length (0 once removed),
+        # and the scratch buffers search() adds scores up in (all zeros between queries)
+        self._lengths = np.zeros(64, dtype=np.float32)
+        self._scores = np.zeros(64, dtype=np.float32)   # query score so far
+        self._best = np.zeros(64, dtype=np.float32)     # best score for the current word
+        self._counts = np.zeros(64, dtype=np.int16)     # words matched so far
+        self._stamp = np.zeros(64, dtype=np.int64)      # to find each slot once
+        self._total_len = 0.0
+        self._removed = 0                   # empty slots
+        self._postings = defaultdict(dict)  # token -> {slot: weighted term frequency}
+        self._arrays = {}                   # token -> (slots, tfs) as NumPy arrays, built on demand
+        self._vocab = []                    # sorted tokens, for prefix lookups
+        self._vocab_dirty = False
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    # --- Building ---
+
+    def _fingerprint(self, row):
+        return tuple(row.get(field) for field in self.field_weights)
+
+    def add(self, row):
+        # Adds a video, or re-indexes it if its text changed
+        key = row.get("id", id(row))
+        fingerprint = self._fingerprint(row)
+        slot = self._slot_of.get(key)
+        if slot is not None and self._fingerprints[slot] == fingerprint:
+            self._rows[slot] = row
+            return
+        if slot is not None:
+            self.remove(key)
+        self._insert(key, row, fingerprint)
+
+    def _insert(self, key, row, fingerprint):
+        terms = defaultdict(float)
+        for field, weight in self.field_weights.items():
+            for token in tokenize(row.get(field)):
+                terms[token] += weight
+
+        slot = len(self._rows)
+        for token, tf in terms.items():
+            if token not in self._postings:
+                self._vocab_dirty = True
+            self._postings[token][slot] = tf
+            self._arrays.pop(token, None)
+        length = sum(terms.values())
+        if slot == len(self._lengths):
+            self._grow()
+        self._lengths[slot] = length
+        self._slot_of[key] = slot
+        self._rows.append(row)
+        self._doc_terms.append(dict(terms))
+        self._fingerprints.append(fingerprint)
+        self._total_len += length
+
+    def _grow(self):
+        size = 2 * len(self._lengths)
+        for name in ("_lengths", "_scores", "_best", "_counts", "_stamp"):
+            old = getattr(self, name)
+            grown = np.zeros(size, dtype=old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def remove(self, key):
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return
+        for token in self._doc_terms[slot]:
+            postings = self._postings[token]
+            postings.pop(slot, None)
+            self._arrays.pop(token, None)
+            if not postings:
+                del self._postings[token]
+                self._vocab_dirty = True
+        self._total_len -= float(self._lengths[slot])
+        self._rows[slot] = None
+        self._doc_terms[slot] = {}
+        self._fingerprints[slot] = None
+        self._lengths[slot] = 0.0
+        self._removed += 1
+        if self._removed > COMPACT_FRACTION * len(self._rows):
+            self._compact()
+
+    def _compact(self):
+        # Rebuilds the index from the live rows, in slot order (so ties still
+        # rank the same), without the empty slots
+        live = sorted(self._slot_of.items(), key=lambda item: item[1])
+        fingerprints = self._fingerprints
+        rows = self._rows
+        self._reset()
+        for key, slot in live:
+            self._insert(key, rows[slot], fingerprints[slot])
+
+    # --- Following the inventory ---
+
+    def on_inventory_change(self, rows, full):
+        # Listener for InventoryRepository.add_listener: cheap, just queues the
+        # rows; the next search indexes them
+        with self._lock:
+            if full:
+                self._pending, self._full_pending = list(rows), True
+            else:
+                self._pending.extend(rows)
+
+    def _apply_pending(self):
+        if not self._pending and not self._full_pending:
+            return
+        self._apply(self._pending, self._full_pending)
+        self._pending, self._full_pending = [], False
+
+    def _apply(self, rows, full):
+        seen = set()
+        for row in rows:
+            self.add(row)
+            seen.add(row.get("id", id(row)))
+        if full:
+            # Gone from the table
+            for key in [key for key in self._slot_of if key not in seen]:
+                self.remove(key)
+
+    def sync(self, rows):
+        # Brings the index up to date with a whole snapshot (e.g. without an
+        # InventoryRepository). A snapshot list the index has seen already is
+        # recognised in O(1).
+        with self._lock:
+            if rows is self._last_rows:
+                return
+            self._apply(rows, full=True)
+            self._last_rows = rows
+
+    # --- Searching ---
+
+    def _expand(self, token):
+        # The token itself plus every indexed token it is a prefix of
+        if self._vocab_dirty:
+            self._vocab = sorted(self._postings)
+            self._vocab_dirty = False
+        start = bisect.bisect_left(self._vocab, token)
+        end = bisect.bisect_left(self._vocab, token + "\uffff")
+        matches = self._vocab[start:end]
+        if len(matches) > MAX_PREFIX_EXPANSIONS:
+            # Very short prefixes: keep the exact word and the most common completions
+            matches = heapq.nlargest(MAX_PREFIX_EXPANSIONS, matches, key=lambda t: len(self._postings[t]))
+            if token in self._postings and token not in matches:
+                matches.append(token)
+        return matches
+
+    def _term_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                      np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, query, limit=None):
+        # Returns matching rows, best first. Every word of the query must match
+        # (as a whole word or as the start of one).
+        with self._lock:
+            self._apply_pending()
+            if not self._slot_of:
+                return []
+            expansions = [self._expand(token) for token in dict.fromkeys(tokenize(query))]
+            if not expansions or not all(expansions):
+                return []
+            n_docs = len(self._slot_of)
+            avg_len = self._total_len / n_docs
+
+            touched = []  # per word: the slots it matched (each once)
+            try:
+                for token, terms in zip(dict.fromkeys(tokenize(query)), expansions):
+                    word_slots = []
+                    for term in terms:
+                        slots, tfs = self._term_arrays(term)
+                        idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                        # Partial matches count a bit less than the whole word
+                        boost = 1.0 if term == token else 0.8
+                        norm = K1 * (1 - B + B * self._lengths[slots] / avg_len)
+                        # A video matching several completions of the word counts its best one
+                        np.maximum.at(self._best, slots, (boost * idf * (K1 + 1)) * tfs / (tfs + norm))
+                        word_slots.append(slots)
+                    slots = word_slots[0]
+                    if len(word_slots) > 1:
+                        slots = np.concatenate(word_slots)
+                        positions = np.arange(len(slots))
+                        self._stamp[slots] = positions
+                        slots = slots[self._stamp[slots] == positions]
+                    self._scores[slots] += self._best[slots]
+                    self._counts[slots] += 1
+                    self._best[slots] = 0
+                    touched.append(slots)
+
+                # AND: a video must match every word
+                fewest = min(touched, key=len)
+                matches = fewest[self._counts[fewest] == len(touched)]
+                scores = self._scores[matches]
+            finally:
+                for slots in touched:
+                    self._scores[slots] = 0
+                    self._counts[slots] = 0
+
+            if limit and len(matches) > limit:
+                best = np.argpartition(scores, -limit)[-limit:]
+                matches, scores = matches[best], scores[best]
+            # Best first; equal scores in the order the videos were indexed
+            order = np.lexsort((matches, -scores))
+            return [self._rows[slot] for slot in matches[order]]
@@ -0,0 +1,94 @@
+# storage_urls.py
+# URLs for files in a Supabase storage bucket, without asking twice.
+#
+# Every card on every rerun called bucket.get_public_url(file_name) again.
+# A public URL never changes for a given file, so it is built once and kept.
+# Signed URLs (for licensed downloads) expire, so they are:
+#   - created in batches: one request signs every file on the page
+#   - cached until shortly before they expire (REFRESH_MARGIN), then
+#     signed again on the next request for them
+# Both caches are bounded (least recently used entries go first).
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SIGNED_TTL = int(os.environ.get("TROVEO_SIGNED_URL_TTL", 3600))  # seconds a signed URL is valid
+REFRESH_MARGIN = 0.1   # re-sign when less than 10% of the lifetime is left
+MAX_ENTRIES = 100_000
+SIGN_BATCH = 500       # paths per create_signed_urls request
+
+
+class UrlService:
+
+    def __init__(self, client, bucket="videos", signed_ttl=SIGNED_TTL, max_entries=MAX_ENTRIES):
+        self.client = client
+        self.bucket = bucket
+        self.signed_ttl = signed_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._public = OrderedDict()   # file name -> URL
+        self._signed = OrderedDict()   # file name -> (expires_at, URL)
+        self.requests = 0              # calls that went to the storage API
+
+    def _storage(self):
+        return self.client.storage.from_(self.bucket)
+
+    def _remember(self, cache, name, value):
+        cache[name] = value
+        cache.move_to_end(name)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    # --- Public URLs ---
+
+    def public_url(self, name):
+        with self._lock:
+            url = self._public.get(name)
+            if url is not None:
+                self._public.move_to_end(name)
+                return url
+        url = self._storage().get_public_url(name)
+        with self._lock:
+            self.requests += 1
+            self._remember(self._public, name, url)
+        return url
+
+    def public_urls(self, names):
+        return {name: self.public_url(name) for name in names}
+
+    # --- Signed URLs ---
+
+    def signed_urls(self, names):
+        # {file name: signed URL}; files the API refused are left out
+        now = time.time()
+        found, missing = {}, []
+        with self._lock:
+            for name in dict.fromkeys(names):
+                entry = self._signed.get(name)
+                if entry is not None and entry[0] - now > self.signed_ttl * REFRESH_MARGIN:
+                    self._signed.move_to_end(name)
+                    found[name] = entry[1]
+                else:
+                    missing.append(name)
+
+        for start in range(0, len(missing), SIGN_BATCH):
+            batch = missing[start:start + SIGN_BATCH]
+            expires_at = time.time() + self.signed_ttl
+            response = self._storage().create_signed_urls(batch, self.signed_ttl)
+            with self._lock:
+                self.requests += 1
+                for item in response:
+                    url = item.get("signedURL") or item.get("signedUrl")
+                    if item.get("error") or not url:
+                        continue
+                    self._remember(self._signed, item["path"], (expires_at, url))
+                    found[item["path"]] = url
+        return found
+
+    def signed_url(self, name):
+        return self.signed_urls([name]).get(name)
+
+    def stats(self):
+        with self._lock:
+            return {"public": len(self._public), "signed": len(self._signed), "requests": self.requests}
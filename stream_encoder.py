@@ -0,0 +1,158 @@
+# stream_encoder.py
+# The 480p watermarked preview, encoded by streaming raw frames between two
+# ffmpeg processes instead of through moviepy's clip chain.
+#
+# write_videofile() pulls every frame through get_frame() on the clip chain:
+# a new array per decoded frame, a copy for the watermark, more inside
+# moviepy, all at interpreter speed, and the audio is decoded into Python and
+# written to a temp file before ffmpeg sees it. Here:
+#   decoder  ffmpeg: source -> scale to preview size -> raw RGB on stdout
+#   Python   readinto() a batch of frames into a preallocated (N, H, W, 3)
+#            buffer, blend the watermark into the whole batch in place
+#            (WatermarkEngine.blend_inplace), hand the buffer to the writer
+#   encoder  ffmpeg: raw RGB on stdin -> libx264; the audio is mapped straight
+#            from the source file into the same process, without passing
+#            through Python: copied as it is when it is already AAC, encoded
+#            to AAC otherwise
+# Two buffers take turns (one being filled while the writer thread sends the
+# other), and they are reused for the whole video, so memory stays flat
+# however long it is and nothing is allocated per frame.
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import numpy as np
+from moviepy.config import get_setting
+
+from video_probe import audio_codec, probe
+from watermark import WatermarkEngine, preview_size, PREVIEW_HEIGHT
+
+BATCH_FRAMES = int(os.environ.get("TROVEO_STREAM_BATCH_FRAMES", 8))  # ~10 MB per buffer at 480p
+BUFFERS = 2
+PRESET = "medium"  # same as write_videofile()
+
+
+class EncodeError(Exception):
+    pass
+
+
+def _even(n):
+    return max(2, n - n % 2)  # libx264 with yuv420p wants even dimensions
+
+
+def _read_full(stream, view):
+    # Reads until view is full or the stream ends; returns the bytes read
+    got = 0
+    while got < len(view):
+        n = stream.readinto(view[got:])
+        if not n:
+            break
+        got += n
+    return got
+
+
+def _write_full(stream, view):
+    while len(view):
+        view = view[stream.write(view):]
+
+
+def frame_size(info, height=PREVIEW_HEIGHT):
+    # Preview frame size for a probed source (see video_probe.py)
+    if not info["width"] or not info["height"] or not info["fps"]:
+        raise EncodeError("No frame size or rate in the file's headers")
+    width, height = preview_size((info["width"], info["height"]), height)
+    return _even(width), _even(height)
+
+
+def decoder_command(path, size, fps):
+    return [get_setting("FFMPEG_BINARY"), "-loglevel", "error", "-i", path, "-map", "0:v:0",
+            "-vf", f"scale={size[0]}:{size[1]}", "-r", str(fps), "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+
+
+def encoder_command(path, out_path, size, fps, audio="aac", preset=PRESET):
+    # audio: "copy" (the source track as it is), "aac" (re-encoded) or None
+    cmd = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+           "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-"]
+    if audio:
+        cmd += ["-i", path, "-map", "0:v:0", "-map", "1:a:0?", "-c:a", audio]
+    return cmd + ["-c:v", "libx264", "-preset", preset, "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+                  out_path]
+
+
+def encode_preview(path, out_path, watermark=None, info=None, batch_frames=BATCH_FRAMES, height=PREVIEW_HEIGHT,
+                   progress=None):
+    # Writes the preview of `path` to out_path. watermark: a callable that
+    # blends into a batch of frames in place (default: the preview watermark
+    # for this source). progress(fraction) after every batch.
+    # Returns {"frames", "size", "fps", "audio", "seconds"}; raises EncodeError.
+    start = time.perf_counter()
+    info = info or probe(path)
+    size, fps = frame_size(info, height), info["fps"]
+    if watermark is None:
+        watermark = WatermarkEngine.for_preview((info["width"], info["height"]), size).blend_inplace
+    expected = max(1, round(info["duration_s"] * fps))
+    audio = None
+    if info.get("has_audio", True):
+        audio = "copy" if audio_codec(path) == "aac" else "aac"
+
+    buffers = [np.empty((batch_frames, size[1], size[0], 3), dtype=np.uint8) for _ in range(BUFFERS)]
+    views = [memoryview(buffer.reshape(-1)) for buffer in buffers]
+    frame_bytes = size[0] * size[1] * 3
+
+    decoder = subprocess.Popen(decoder_command(path, size, fps), stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, bufsize=0)
+    encoder = subprocess.Popen(encoder_command(path, out_path, size, fps, audio=audio),
+                               stdin=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+    free, filled, failed = queue.Queue(), queue.Queue(), []
+    for i in range(BUFFERS):
+        free.put(i)
+
+    def write_batches():
+        # Sends filled buffers to the encoder; after an error it only hands them back
+        while True:
+            item = filled.get()
+            if item is None:
+                return
+            i, nbytes = item
+            if not failed:
+                try:
+                    _write_full(encoder.stdin, views[i][:nbytes])
+                except OSError as e:
+                    failed.append(e)
+            free.put(i)
+
+    writer = threading.Thread(target=write_batches, name="stream-encoder", daemon=True)
+    writer.start()
+    frames = 0
+    try:
+        while not failed:
+            i = free.get()
+            got = _read_full(decoder.stdout, views[i])
+            n = got // frame_bytes
+            if n:
+                watermark(buffers[i][:n])
+                filled.put((i, n * frame_bytes))
+                frames += n
+                if progress:
+                    progress(min(1.0, frames / expected))
+            if got < len(views[i]):
+                break  # End of the video
+    finally:
+        filled.put(None)
+        writer.join()
+        encoder.stdin.close()   # The encoder finishes the file
+        decoder.stdout.close()  # An early stop ends the decoder too
+        decoder_err = decoder.stderr.read().decode(errors="replace")
+        encoder_err = encoder.stderr.read().decode(errors="replace")
+        decoder.wait()
+        encoder.wait()
+
+    if decoder.returncode or encoder.returncode or failed or not frames:
+        raise EncodeError((encoder_err or decoder_err or str(failed[0] if failed else "no frames decoded"))
+                          .strip()[-2000:])
+    if progress:
+        progress(1.0)
+    return {"frames": frames, "size": size, "fps": fps, "audio": audio,
+            "seconds": round(time.perf_counter() - start, 2)}
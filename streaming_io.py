@@ -0,0 +1,150 @@
+# streaming_io.py
+# Moving big video files around without holding them in memory.
+#
+# Several upload paths used to read the whole video into RAM (getvalue(),
+# read(), getbuffer()), so a multi-GB source could OOM the container. Here
+# everything goes in fixed-size chunks:
+#   - spool_to_disk(): copies an upload to a local file chunk by chunk and
+#     hashes it (SHA-256) on the way, so we never read it twice
+#   - ResumableUploader: pushes a local file to Supabase Storage with the TUS
+#     resumable-upload protocol, one chunk per request. A failed chunk is
+#     retried from the offset the server actually has.
+# Peak memory is about one chunk, whatever the file size.
+import base64
+import hashlib
+import os
+import tempfile
+import time
+
+import httpx
+
+import tracing
+from scratch_space import get_scratch
+
+CHUNK_SIZE = int(os.environ.get("TROVEO_CHUNK_BYTES", 6 * 1024 * 1024))  # Supabase TUS wants 6 MB chunks
+MAX_RETRIES = 5
+
+
+class UploadError(Exception):
+    pass
+
+
+class SpooledFile:
+    # A local copy of an upload: .path, .name, .size, .sha256
+    def __init__(self, path, name, size, sha256):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.sha256 = sha256
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def spool_to_disk(file_obj, dest_dir=None, suffix=".mp4", chunk_size=CHUNK_SIZE, path=None):
+    # Copies file_obj (Streamlit UploadedFile, open file...) to disk in chunks,
+    # hashing as it goes. Pass path= to choose the destination file; by
+    # default it goes to the scratch space (see scratch_space.py).
+    digest = hashlib.sha256()
+    size = 0
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    if path is None and dest_dir is not None:
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=dest_dir)
+        out = os.fdopen(fd, "wb")
+    else:
+        path = path or get_scratch().temp_path(suffix, prefix="spool")
+        out = open(path, "wb")
+    with out:
+        for chunk in iter(lambda: file_obj.read(chunk_size), b""):
+            out.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    if hasattr(file_obj, "seek"):
+        file_obj.seek(0)
+    return SpooledFile(path, getattr(file_obj, "name", os.path.basename(path)), size, digest.hexdigest())
+
+
+def _b64(value):
+    return base64.b64encode(value.encode()).decode()
+
+
+class ResumableUploader:
+    # TUS client for Supabase Storage (<project url>/storage/v1/upload/resumable)
+
+    def __init__(self, supabase_url, api_key, bucket="videos", chunk_size=CHUNK_SIZE,
+                 max_retries=MAX_RETRIES, http=None):
+        self.endpoint = f"{supabase_url.rstrip('/')}/storage/v1/upload/resumable"
+        self.api_key = api_key
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.http = http or httpx.Client(timeout=120)
+
+    def _headers(self, access_token=None, **extra):
+        headers = {"authorization": f"Bearer {access_token or self.api_key}", "apikey": self.api_key,
+                   "tus-resumable": "1.0.0"}
+        headers.update(extra)
+        return headers
+
+    def upload(self, path, object_name, content_type="video/mp4", upsert=True, access_token=None, progress=None):
+        # progress(bytes_sent, total_bytes) is called after every chunk
+        size = os.path.getsize(path)
+        with tracing.span("storage.upload", nbytes=size):
+            location = self._create(object_name, content_type, size, upsert, access_token)
+            self._send(path, size, location, object_name, access_token, progress)
+        return object_name
+
+    def _send(self, path, size, location, object_name, access_token, progress):
+        offset, retries = 0, 0
+        with open(path, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+                try:
+                    response = self.http.patch(location, content=chunk, headers=self._headers(
+                        access_token, **{"upload-offset": str(offset),
+                                         "content-type": "application/offset+octet-stream"}))
+                    if response.status_code == 409:
+                        # The server has a different offset than we thought
+                        raise httpx.HTTPStatusError("Offset mismatch", request=response.request, response=response)
+                    response.raise_for_status()
+                    offset = int(response.headers.get("upload-offset", offset + len(chunk)))
+                    retries = 0
+                    if progress:
+                        progress(offset, size)
+                except httpx.HTTPError as e:
+                    status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                    if status and 400 <= status < 500 and status not in (409, 423, 429):
+                        raise UploadError(f"Upload of {object_name} was refused ({status}): {e}")
+                    retries += 1
+                    tracing.count("storage.upload_retries")
+                    if retries > self.max_retries:
+                        raise UploadError(f"Upload of {object_name} failed at byte {offset}: {e}")
+                    time.sleep(min(0.5 * 2 ** retries, 10))
+                    offset = self._server_offset(location, access_token, offset)
+
+    def _create(self, object_name, content_type, size, upsert, access_token):
+        metadata = ",".join([f"bucketName {_b64(self.bucket)}", f"objectName {_b64(object_name)}",
+                             f"contentType {_b64(content_type)}", f"cacheControl {_b64('3600')}"])
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.http.post(self.endpoint, headers=self._headers(
+                    access_token, **{"upload-length": str(size), "upload-metadata": metadata,
+                                     "x-upsert": "true" if upsert else "false"}))
+                response.raise_for_status()
+                return response.headers["location"]
+            except httpx.HTTPError as e:
+                if attempt == self.max_retries:
+                    raise UploadError(f"Could not start upload of {object_name}: {e}")
+                time.sleep(min(0.5 * 2 ** (attempt + 1), 10))
+
+    def _server_offset(self, location, access_token, fallback):
+        # HEAD tells us how many bytes the server really has
+        try:
+            response = self.http.head(location, headers=self._headers(access_token))
+            response.raise_for_status()
+            return int(response.headers["upload-offset"])
+        except (httpx.HTTPError, KeyError, ValueError):
+            return fallback
@@ -0,0 +1,112 @@
+# supabase_provider.py
+# One Supabase client per server process, shared by every session.
+#
+# marketplace_app.py used to call create_client() at the top of the script
+# (twice), so every rerun of every session built a new client with its own
+# HTTP connections. Here:
+#   - get_client(url, key) hands out the same client for the same project,
+#     so the HTTP connections (keep-alive) are reused across reruns/sessions
+#   - the client is a small wrapper: callers keep it (e.g. in cached
+#     resources) while the real client behind it can be replaced
+#   - a cheap health check (one "select id limit 1") runs at most every
+#     HEALTH_EVERY seconds, in a background thread (no request waits on it,
+#     and only one runs at a time); after it fails the real client is rebuilt
+#   - fresh_client() is NOT shared: use it for auth (sign in / sign up), which
+#     stores the user's session on the client it is called on
+import os
+import threading
+import time
+
+from supabase import create_client
+
+import tracing
+
+HEALTH_EVERY = float(os.environ.get("TROVEO_SUPABASE_HEALTH_EVERY", 60))
+HEALTH_TABLE = os.environ.get("TROVEO_SUPABASE_HEALTH_TABLE", "videos_inventory")
+
+
+class SharedClient:
+    # Looks like a supabase Client; every attribute comes from the current one
+
+    def __init__(self, provider):
+        self._provider = provider
+
+    def __getattr__(self, name):
+        return getattr(self._provider.current(), name)
+
+
+class ClientProvider:
+
+    def __init__(self, url, key, health_every=HEALTH_EVERY, health_table=HEALTH_TABLE):
+        self.url = url
+        self.key = key
+        self.health_every = health_every
+        self.health_table = health_table
+        self._lock = threading.Lock()
+        self._client = None
+        self._checked_at = time.time()
+        self._checking = False
+        self.client = SharedClient(self)
+        self.created = 0
+        self.health = {"healthy": None, "latency_ms": None, "error": None, "checked_at": None}
+
+    def current(self):
+        with self._lock:
+            if self._client is None:
+                self._client = create_client(self.url, self.key)
+                self.created += 1
+            client = self._client
+            due = not self._checking and time.time() - self._checked_at > self.health_every
+            if due:
+                self._checking, self._checked_at = True, time.time()
+        if due:
+            threading.Thread(target=self._background_check, name="supabase-health", daemon=True).start()
+        return client
+
+    def _background_check(self):
+        try:
+            self.check()
+        finally:
+            with self._lock:
+                self._checking = False
+
+    def fresh_client(self):
+        return create_client(self.url, self.key)
+
+    def check(self):
+        # Returns True if the project answered; otherwise the client is rebuilt on next use
+        with self._lock:
+            self._checked_at = time.time()
+            client = self._client
+        if client is None:
+            return True
+        start = time.perf_counter()
+        try:
+            client.table(self.health_table).select("id").limit(1).execute()
+            healthy, error = True, None
+        except Exception as e:
+            healthy, error = False, str(e)
+            tracing.error("supabase.health", e)
+            with self._lock:
+                if self._client is client:
+                    self._client = None
+        self.health = {"healthy": healthy, "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                       "error": error, "checked_at": time.time()}
+        return healthy
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(url, key):
+    with _providers_lock:
+        provider = _providers.get((url, key))
+        if provider is None:
+            provider = _providers[(url, key)] = ClientProvider(url, key)
+        return provider
+
+
+def get_client(url, key):
+    # The process-wide client for this project
+    return get_provider(url, key).client
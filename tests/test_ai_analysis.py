@@ -0,0 +1,115 @@
+# tests/test_ai_analysis.py
+# AnalysisService against a local fake model client: no Gemini, no network,
+# and no video either (build_parts() is swapped for fixed parts).
+import time
+
+import pytest
+
+import ai_analysis
+from ai_analysis import AnalysisCache, AnalysisService, DONE, FAILED, PENDING
+
+PARTS = [{"mime_type": "image/jpeg", "data": b"frame"}, ai_analysis.PROMPT]
+
+
+class FakeClient:
+    # generate(parts) like GeminiClient: raises the first `failures` times, then answers
+
+    def __init__(self, failures=0, text='{"Title": "Sunset"}'):
+        self.failures = failures
+        self.text = text
+        self.calls = []
+
+    def generate(self, parts):
+        self.calls.append(parts)
+        if len(self.calls) <= self.failures:
+            raise RuntimeError("429 Resource has been exhausted")
+        return self.text
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    # The backoff sleeps, recorded instead of waited for
+    slept = []
+    real_sleep = ai_analysis.asyncio.sleep
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        await real_sleep(0)
+
+    monkeypatch.setattr(ai_analysis.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(ai_analysis, "build_parts", lambda path, n_frames, include_audio: PARTS)
+    return slept
+
+
+def make_service(tmp_path, client, **kwargs):
+    return AnalysisService(client=client, cache=AnalysisCache(str(tmp_path / "analysis.db")), **kwargs)
+
+
+def wait_for(service, digest, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = service.status(digest)
+        if job is None or job["status"] != PENDING:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"{digest} still pending after {timeout}s")
+
+
+def test_analysis_is_cached_by_digest(tmp_path, delays):
+    client = FakeClient()
+    service = make_service(tmp_path, client)
+
+    service.submit("clip.mp4", "abc")
+    job = wait_for(service, "abc")
+    assert job["status"] == DONE and not job["cached"]
+    assert job["raw_analysis"] == client.text
+    assert client.calls == [PARTS]
+
+    # Same content again: answered from the cache, the model is not called
+    service.submit("copy_of_clip.mp4", "abc")
+    job = service.status("abc")
+    assert job["status"] == DONE and job["cached"]
+    assert job["raw_analysis"] == client.text
+    assert len(client.calls) == 1
+    assert service.cache.stats()["hits"] >= 1
+
+
+def test_retries_back_off_then_succeed(tmp_path, delays):
+    client = FakeClient(failures=3)
+    service = make_service(tmp_path, client, max_attempts=5, retry_delay=1.0)
+
+    service.submit("clip.mp4", "abc")
+    job = wait_for(service, "abc")
+    assert job["status"] == DONE
+    assert len(client.calls) == 4
+    assert delays == [1.0, 2.0, 4.0]
+
+
+def test_gives_up_after_max_attempts(tmp_path, delays):
+    client = FakeClient(failures=10)
+    service = make_service(tmp_path, client, max_attempts=3, retry_delay=0.5)
+
+    service.submit("clip.mp4", "abc")
+    job = wait_for(service, "abc")
+    assert job["status"] == FAILED
+    assert "429" in job["error"]
+    assert len(client.calls) == 3
+    assert delays == [0.5, 1.0]
+    # Nothing was cached for a failure, so the next submit tries again
+    assert service.cache.get("abc") is None
+
+
+def test_finished_jobs_are_dropped_once_read(tmp_path, delays):
+    service = make_service(tmp_path, FakeClient())
+
+    service.submit("clip.mp4", "abc")
+    assert wait_for(service, "abc")["status"] == DONE
+    assert "abc" not in service._jobs
+    # A second reader still gets the result, from the cache
+    assert service.status("abc")["raw_analysis"] == FakeClient().text
+
+    # A result nobody came back for is dropped on a later submit()
+    service._jobs["failed"] = {"status": FAILED, "raw_analysis": None, "error": "boom", "cached": False,
+                               "seconds": 1.0, "finished_at": time.time() - ai_analysis.FINISHED_TTL - 1}
+    service.submit("clip.mp4", "abc")
+    assert "failed" not in service._jobs
@@ -0,0 +1,375 @@
+# tracing.py
+# Where does the time go? Per-stage timings, bytes and call counts.
+#
+#   with span("storage.upload", nbytes=size): ...
+#   @traced("gemini.generate")
+#   count("storage.upload_retries")
+#   error("analytics.purchases_sync", e)   a failure the app carries on after
+# Every finished span goes into an in-process histogram per name: how many,
+# total/max seconds, bytes, errors, and a count per duration bucket. Read
+# them as:
+#   - Prometheus text: prometheus_text(), or GET /metrics on the local
+#     endpoint from serve_metrics() (TROVEO_METRICS_PORT); /metrics.json too
+#   - JSON lines: with TROVEO_TRACE_FILE set, one line per finished span
+# The endpoint also reports the process's resident memory (resident_bytes()).
+# Worker processes (job_queue.py) capture() their spans and send them back,
+# and the parent merge()s them, so its endpoint sees the whole picture.
+# profile(name) records one job with cProfile (this thread only).
+#
+# Off unless TROVEO_TRACING=1 (or a trace file / metrics port is set, or
+# enable() is called): span() then hands back one shared do-nothing object,
+# so an instrumented call costs a flag check. error() always logs (to the
+# "troveo" logger, i.e. the server's stderr unless configured otherwise).
+import bisect
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TRACE_FILE = os.environ.get("TROVEO_TRACE_FILE")
+METRICS_PORT = int(os.environ.get("TROVEO_METRICS_PORT", 0))  # 0 = no endpoint
+PROFILE_DIR = os.environ.get("TROVEO_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "troveo_profiles"))
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf"))
+
+_enabled = os.environ.get("TROVEO_TRACING", "") not in ("", "0", "false") or bool(TRACE_FILE or METRICS_PORT)
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}   # span name -> Histogram
+_counters = {}     # name -> count
+_trace_out = None  # open TRACE_FILE
+_server = None
+log = logging.getLogger("troveo")
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+class Histogram:
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.errors = 0
+        self.buckets = [0] * len(BUCKETS)  # per bucket, not cumulative
+
+    def observe(self, seconds, nbytes=0, error=None):
+        self.count += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += nbytes
+        self.errors += bool(error)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+def _record(name, seconds, nbytes=0, error=None):
+    global _trace_out
+    captures = getattr(_local, "captures", None)
+    entry = None
+    if TRACE_FILE or captures:
+        entry = {"ts": round(time.time(), 3), "span": name, "seconds": round(seconds, 6), "bytes": nbytes,
+                 "error": error, "pid": os.getpid()}
+    with _lock:
+        _histograms.setdefault(name, Histogram()).observe(seconds, nbytes, error)
+        if TRACE_FILE:
+            if _trace_out is None:
+                _trace_out = open(TRACE_FILE, "a", buffering=1)  # line-buffered: one write per span
+            _trace_out.write(json.dumps(entry) + "\n")
+    for spans in captures or ():
+        spans.append(entry)
+
+
+# --- Recording ---
+
+class Span:
+    __slots__ = ("name", "nbytes", "start")
+
+    def __init__(self, name, nbytes=0):
+        self.name = name
+        self.nbytes = nbytes
+
+    def add_bytes(self, n):
+        self.nbytes += n
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _record(self.name, time.perf_counter() - self.start, self.nbytes, exc_type.__name__ if exc_type else None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def add_bytes(self, n):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name, nbytes=0):
+    if not _enabled:
+        return _NOOP
+    return Span(name, nbytes)
+
+
+def traced(name=None):
+    # Decorator: every call is a span (default name: module.function)
+    def wrap(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def record(name, seconds, nbytes=0):
+    # A span timed by the caller (e.g. from a start time taken earlier)
+    if _enabled:
+        _record(name, seconds, nbytes)
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def error(name, exc):
+    # A failure that is handled (the page or job carries on without it):
+    # logged with its traceback, and counted as "<name>.errors"
+    log.warning("%s failed: %s", name, exc, exc_info=exc)
+    count(f"{name}.errors")
+
+
+class StageTimer:
+    # Times a job that already reports progress(stage, fraction): a new stage
+    # name ends the previous one, so each stage becomes a "<prefix>.<stage>"
+    # span without wrapping the code in with-blocks. Passes calls through to
+    # `progress`. Call close() at the end (or on error).
+
+    def __init__(self, prefix, progress=None):
+        self.prefix = prefix
+        self.progress = progress
+        self.stage = None
+        self.started = 0.0
+        self.nbytes = 0
+        self._extra = {}  # stage -> seconds, from accumulate()
+
+    def __call__(self, stage, fraction):
+        if _enabled and stage != self.stage:
+            self._end()
+            if stage != "done":
+                self.stage, self.started = stage, time.perf_counter()
+        if self.progress:
+            self.progress(stage, fraction)
+
+    def add_bytes(self, n):
+        self.nbytes += n
+
+    def accumulate(self, stage, fn):
+        # fn, but its total time over all calls becomes its own span on close()
+        # (e.g. a per-frame function that runs inside another stage)
+        if not _enabled:
+            return fn
+
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._extra[stage] = self._extra.get(stage, 0.0) + time.perf_counter() - start
+        return inner
+
+    def _end(self, error=None):
+        if self.stage is not None:
+            _record(f"{self.prefix}.{self.stage}", time.perf_counter() - self.started, self.nbytes, error)
+            self.stage, self.nbytes = None, 0
+
+    def close(self, error=None):
+        if _enabled:
+            self._end(error)
+            for stage, seconds in self._extra.items():
+                _record(f"{self.prefix}.{stage}", seconds)
+        self._extra = {}
+
+
+# --- Across processes ---
+
+class capture:
+    # `with capture() as spans:` collects the spans finished in this thread,
+    # e.g. one job in a worker process, to send back to the parent
+
+    def __enter__(self):
+        self.spans = []
+        if not hasattr(_local, "captures"):
+            _local.captures = []
+        _local.captures.append(self.spans)
+        return self.spans
+
+    def __exit__(self, *exc):
+        _local.captures.pop()
+        return False
+
+
+def merge(spans):
+    # Adds spans recorded elsewhere to this process's histograms (not to the trace file)
+    with _lock:
+        for entry in spans or ():
+            _histograms.setdefault(entry["span"], Histogram()).observe(entry["seconds"], entry["bytes"],
+                                                                        entry["error"])
+
+
+# --- Profiling ---
+
+class profile:
+    # `with profile("job_1234") as result:` runs cProfile over the block and
+    # writes <name>.prof (pstats / snakeviz) and <name>.txt (top functions by
+    # cumulative time); result["path"] is the .prof file afterwards
+
+    def __init__(self, name, out_dir=PROFILE_DIR):
+        self.name = name
+        self.out_dir = out_dir
+        self.result = {"path": None}
+
+    def __enter__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self.result
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.name}_{int(time.time())}")
+        self.profiler.dump_stats(base + ".prof")
+        with open(base + ".txt", "w") as f:
+            pstats.Stats(self.profiler, stream=f).sort_stats("cumulative").print_stats(40)
+        self.result["path"] = base + ".prof"
+        return False
+
+
+# --- Export ---
+
+def resident_bytes():
+    # This process's resident memory now (Linux), or its peak so far elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def snapshot():
+    resident = resident_bytes()
+    with _lock:
+        spans = {name: {"count": h.count, "seconds": round(h.seconds, 6),
+                        "mean_s": round(h.seconds / h.count, 6) if h.count else 0.0,
+                        "max_s": round(h.max_seconds, 6), "bytes": h.bytes,
+                        "mb_per_s": round(h.bytes / 1e6 / h.seconds, 2) if h.seconds and h.bytes else 0.0,
+                        "errors": h.errors}
+                 for name, h in sorted(_histograms.items())}
+        return {"spans": spans, "counters": dict(sorted(_counters.items())), "resident_bytes": resident,
+                "pid": os.getpid()}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    with _lock:
+        histograms = sorted((name, h.count, h.seconds, h.bytes, h.errors, list(h.buckets))
+                            for name, h in _histograms.items())
+        counters = sorted(_counters.items())
+    lines = ["# HELP troveo_span_seconds Time spent per stage or call.", "# TYPE troveo_span_seconds histogram"]
+    for name, n, seconds, _, _, buckets in histograms:
+        cumulative = 0
+        for le, hits in zip(BUCKETS, buckets):
+            cumulative += hits
+            le = "+Inf" if le == float("inf") else le
+            lines.append(f'troveo_span_seconds_bucket{{span="{_label(name)}",le="{le}"}} {cumulative}')
+        lines.append(f'troveo_span_seconds_sum{{span="{_label(name)}"}} {seconds}')
+        lines.append(f'troveo_span_seconds_count{{span="{_label(name)}"}} {n}')
+    lines += ["# HELP troveo_span_bytes_total Bytes processed per stage or call.",
+              "# TYPE troveo_span_bytes_total counter"]
+    lines += [f'troveo_span_bytes_total{{span="{_label(h[0])}"}} {h[3]}' for h in histograms]
+    lines += ["# HELP troveo_span_errors_total Spans that ended with an exception.",
+              "# TYPE troveo_span_errors_total counter"]
+    lines += [f'troveo_span_errors_total{{span="{_label(h[0])}"}} {h[4]}' for h in histograms]
+    lines += ["# HELP troveo_calls_total Counted events.", "# TYPE troveo_calls_total counter"]
+    lines += [f'troveo_calls_total{{name="{_label(name)}"}} {value}' for name, value in counters]
+    lines += ["# HELP troveo_process_resident_bytes Resident memory of this process.",
+              "# TYPE troveo_process_resident_bytes gauge", f"troveo_process_resident_bytes {resident_bytes()}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, content_type = prometheus_text(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(snapshot()), "application/json"
+        else:
+            self.send_error(404)
+            return
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # No access log on stderr for every scrape
+
+
+def serve_metrics(port=None, host="127.0.0.1"):
+    # Starts the local endpoint once per process (daemon thread); returns the server
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port or METRICS_PORT), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-endpoint", daemon=True).start()
+        return _server
@@ -0,0 +1,94 @@
+# video_grid.py
+# Paginated card grid for the Marketplace and My Uploads pages.
+#
+# Before, every listing got its own st.video(), so a page with hundreds of
+# videos opened hundreds of players in the browser on every rerun. Now:
+#   - only one page of cards is rendered (page size + page number live in
+#     st.session_state, so they survive reruns)
+#   - each card shows a light poster image (or a placeholder)
+#   - a real player is mounted only for the card the user clicks "Play" on
+# So render time and payload depend on the page size, not the catalogue.
+#
+# The grid is a fragment: Play, Close, Prev/Next and the page size re-run only
+# the grid (buttons set their state in on_click callbacks, no st.rerun()), not
+# the sidebar, the search box or the rest of the page.
+import math
+
+import streamlit as st
+
+PAGE_SIZES = [12, 24, 48]
+
+PLACEHOLDER_HTML = """
+<div style="aspect-ratio:16/9;background:#1f2430;border-radius:8px;display:flex;
+            align-items:center;justify-content:center;color:#9aa3b5;font-size:2rem;">🎬</div>
+"""
+
+
+def paginate(items, page, page_size):
+    # Returns (items on this page, page actually shown, number of pages)
+    n_pages = max(1, math.ceil(len(items) / page_size))
+    page = min(max(1, page), n_pages)
+    start = (page - 1) * page_size
+    return items[start:start + page_size], page, n_pages
+
+
+def _set_state(name, value):
+    st.session_state[name] = value
+
+
+@st.fragment
+def render_video_grid(videos, key, url_for, render_details, poster_for=None, columns=2, reset_on=None):
+    # videos:          the full (filtered) list - only one page of it is drawn
+    # key:             prefix for the session_state entries of this grid
+    # url_for(video):  public URL of the video, only called for cards on screen
+    # render_details(video, public_url): draws title, price, buttons... inside the card
+    # poster_for(video): poster image URL or None
+    # reset_on:        anything (e.g. the search text) that sends us back to page 1 when it changes
+    # (render_details may itself be an @st.fragment, so a click in one card re-runs only that card)
+    page_key, size_key, playing_key, reset_key = (f"{key}_page", f"{key}_page_size",
+                                                  f"{key}_playing", f"{key}_reset_on")
+    st.session_state.setdefault(page_key, 1)
+    st.session_state.setdefault(size_key, PAGE_SIZES[0])
+    st.session_state.setdefault(playing_key, None)
+    if st.session_state.get(reset_key) != reset_on:
+        st.session_state[reset_key] = reset_on
+        st.session_state[page_key] = 1
+        st.session_state[playing_key] = None
+
+    page_items, page, n_pages = paginate(videos, st.session_state[page_key], st.session_state[size_key])
+    st.session_state[page_key] = page
+
+    cols = st.columns(columns)
+    start = (page - 1) * st.session_state[size_key]
+    for index, video in enumerate(page_items):
+        card_id = video.get('id', start + index)
+        public_url = url_for(video)
+        with cols[index % columns]:
+            with st.container(border=True):
+                if st.session_state[playing_key] == card_id:
+                    st.video(public_url, autoplay=True)
+                    st.button("✕ Close player", key=f"{key}_close_{card_id}",
+                              on_click=_set_state, args=(playing_key, None))
+                else:
+                    poster_url = poster_for(video) if poster_for else None
+                    if poster_url:
+                        st.image(poster_url)
+                    else:
+                        st.markdown(PLACEHOLDER_HTML, unsafe_allow_html=True)
+                    st.button("▶ Play preview", key=f"{key}_play_{card_id}",
+                              on_click=_set_state, args=(playing_key, card_id))
+                render_details(video, public_url)
+
+    # Page controls
+    st.divider()
+    c1, c2, c3, c4 = st.columns([1, 2, 1, 2])
+    with c1:
+        st.button("← Prev", key=f"{key}_prev", disabled=page <= 1,
+                  on_click=_set_state, args=(page_key, page - 1))
+    with c2:
+        st.caption(f"Page {page} of {n_pages} · {len(videos)} videos")
+    with c3:
+        st.button("Next →", key=f"{key}_next", disabled=page >= n_pages,
+                  on_click=_set_state, args=(page_key, page + 1))
+    with c4:
+        st.selectbox("Per page", PAGE_SIZES, key=size_key, label_visibility="collapsed")
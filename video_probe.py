@@ -0,0 +1,304 @@
+# video_probe.py
+# Fast, header-only video metadata.
+#
+# process_video() used to copy the whole upload to disk and open a full
+# VideoFileClip just to read duration, size and fps, and then returned them as
+# text ("12.34 seconds"). probe() reads only the container headers:
+#   - MP4/MOV: we walk the top-level boxes, jump over the media data ("mdat")
+#     and parse the small "moov" box (movie + track headers).
+#   - Anything else (mkv, avi, ...): one ffprobe call if it is installed,
+#     otherwise ffmpeg's own header dump (no decoding either way).
+# It works on a path or an open binary file (e.g. Streamlit's UploadedFile)
+# and returns real numbers you can store, filter and add up. The keys are
+# videos_inventory columns (migrations/001_videos_inventory_columns.sql).
+import json
+import os
+import shutil
+import struct
+import subprocess
+
+from scratch_space import get_scratch
+
+# Largest moov we are willing to read into memory (real ones are a few MB)
+MAX_MOOV_BYTES = 256 * 1024 * 1024
+# How much of a non-seekable/unnamed file we spool for the ffprobe fallback
+FALLBACK_SPOOL_BYTES = 64 * 1024 * 1024
+
+CODEC_NAMES = {
+    "avc1": "h264", "avc3": "h264", "hvc1": "hevc", "hev1": "hevc", "av01": "av1",
+    "vp08": "vp8", "vp09": "vp9", "mp4v": "mpeg4", "apch": "prores", "apcn": "prores",
+    "mp4a": "aac", "ac-3": "ac3", "ec-3": "eac3", "opus": "opus", "Opus": "opus", ".mp3": "mp3",
+}
+
+
+class ProbeError(Exception):
+    pass
+
+
+def empty_result(size_bytes=0):
+    return {"duration_s": 0.0, "width": 0, "height": 0, "fps": 0.0, "bitrate": 0,
+            "codec": None, "has_audio": False, "size_bytes": size_bytes}
+
+
+def probe(source):
+    # source: a file path, or an open binary file (position is restored)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return _probe_file(f, path=os.fspath(source))
+    position = source.tell()
+    try:
+        return _probe_file(source, path=None)
+    finally:
+        source.seek(position)
+
+
+def _probe_file(f, path):
+    f.seek(0, os.SEEK_END)
+    size_bytes = f.tell()
+    f.seek(0)
+
+    moov = _find_moov(f, size_bytes)
+    if moov is not None:
+        result = _parse_moov(moov, size_bytes)
+        if result["duration_s"] > 0 and result["width"] > 0:
+            return result
+    # Not an MP4/MOV, or a fragmented one without the numbers in moov
+    return _probe_with_ffmpeg(f, path, size_bytes)
+
+
+# --- MP4 / MOV ---
+
+def _box_header(f):
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    size, box_type = struct.unpack(">I4s", header)
+    header_len = 8
+    if size == 1:
+        size = struct.unpack(">Q", f.read(8))[0]
+        header_len = 16
+    return size, box_type, header_len
+
+
+def _find_moov(f, size_bytes):
+    # Walks the top-level boxes. mdat (the video itself) is skipped with a
+    # seek, so even with moov at the end of a multi-GB file we read ~nothing.
+    offset = 0
+    first = True
+    while offset + 8 <= size_bytes:
+        f.seek(offset)
+        header = _box_header(f)
+        if header is None:
+            return None
+        size, box_type, header_len = header
+        if first and box_type not in (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"):
+            return None  # Doesn't look like an ISO media file
+        first = False
+        if size == 0:
+            size = size_bytes - offset  # Box runs to the end of the file
+        if size < header_len:
+            return None
+        if box_type == b"moov":
+            if size > MAX_MOOV_BYTES:
+                return None
+            return f.read(size - header_len)
+        offset += size
+    return None
+
+
+def _iter_boxes(data):
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_len = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_len = 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header_len:
+            return
+        yield box_type, data[offset + header_len:offset + size]
+        offset += size
+
+
+def _children(data):
+    # {box type: [payloads]} for one level
+    boxes = {}
+    for box_type, payload in _iter_boxes(data):
+        boxes.setdefault(box_type, []).append(payload)
+    return boxes
+
+
+def _first(boxes, *path):
+    # _first(boxes, b"mdia", b"minf") -> payload of the first match, or None
+    for i, box_type in enumerate(path):
+        payloads = boxes.get(box_type)
+        if not payloads:
+            return None
+        if i == len(path) - 1:
+            return payloads[0]
+        boxes = _children(payloads[0])
+    return None
+
+
+def _timescale_duration(payload):
+    # mvhd and mdhd share this layout
+    version = payload[0]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", payload, 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", payload, 12)
+    return timescale, duration
+
+
+def _parse_track(trak):
+    boxes = _children(trak)
+    mdia = _first(boxes, b"mdia")
+    if mdia is None:
+        return None
+    mdia_boxes = _children(mdia)
+    hdlr = _first(mdia_boxes, b"hdlr")
+    mdhd = _first(mdia_boxes, b"mdhd")
+    stbl = _first(mdia_boxes, b"minf", b"stbl")
+    if hdlr is None or mdhd is None or stbl is None:
+        return None
+
+    track = {"handler": hdlr[8:12], "codec": None, "width": 0, "height": 0, "samples": 0}
+    track["timescale"], track["duration"] = _timescale_duration(mdhd)
+
+    stbl_boxes = _children(stbl)
+    stsd = _first(stbl_boxes, b"stsd")
+    if stsd is not None and len(stsd) >= 16:
+        fourcc = stsd[12:16].decode("latin-1")
+        track["codec"] = CODEC_NAMES.get(fourcc, fourcc.strip())
+        if track["handler"] == b"vide" and len(stsd) >= 8 + 8 + 28:
+            # Visual sample entry: width/height sit 24 bytes after its 8-byte header
+            track["width"], track["height"] = struct.unpack_from(">HH", stsd, 8 + 8 + 24)
+
+    stts = _first(stbl_boxes, b"stts")
+    if stts is not None and len(stts) >= 8:
+        (entries,) = struct.unpack_from(">I", stts, 4)
+        counts = struct.unpack_from(f">{2 * entries}I", stts, 8)[0::2] if entries else ()
+        track["samples"] = sum(counts)
+
+    # Display size and rotation come from the track header
+    tkhd = _first(boxes, b"tkhd")
+    if tkhd is not None:
+        matrix_at = 4 + (32 if tkhd[0] == 1 else 20) + 16
+        a, b = struct.unpack_from(">ii", tkhd, matrix_at)
+        width, height = struct.unpack_from(">II", tkhd, matrix_at + 36)
+        if width and height:
+            track["width"], track["height"] = width >> 16, height >> 16
+        if a == 0 and b != 0:  # rotated by 90 or 270 degrees
+            track["width"], track["height"] = track["height"], track["width"]
+    return track
+
+
+def _parse_moov(moov, size_bytes):
+    result = empty_result(size_bytes)
+    boxes = _children(moov)
+
+    mvhd = _first(boxes, b"mvhd")
+    if mvhd is not None:
+        timescale, duration = _timescale_duration(mvhd)
+        if timescale:
+            result["duration_s"] = duration / timescale
+
+    for trak in boxes.get(b"trak", []):
+        track = _parse_track(trak)
+        if track is None:
+            continue
+        if track["handler"] == b"vide" and not result["codec"]:
+            result["codec"] = track["codec"]
+            result["width"], result["height"] = track["width"], track["height"]
+            if track["duration"] and track["timescale"]:
+                result["fps"] = round(track["samples"] * track["timescale"] / track["duration"], 3)
+                if not result["duration_s"]:
+                    result["duration_s"] = track["duration"] / track["timescale"]
+        elif track["handler"] == b"soun":
+            result["has_audio"] = True
+
+    if result["duration_s"]:
+        result["bitrate"] = int(size_bytes * 8 / result["duration_s"])
+    return result
+
+
+# --- Everything else ---
+
+def _probe_with_ffmpeg(f, path, size_bytes):
+    spooled = None
+    if path is None:
+        # Containers like mkv keep their headers at the start: the first
+        # few MB are enough for ffprobe/ffmpeg to read them.
+        spooled = get_scratch().temp_path(".bin", prefix="probe")
+        f.seek(0)
+        with open(spooled, "wb") as out:
+            out.write(f.read(FALLBACK_SPOOL_BYTES))
+        path = spooled
+    try:
+        if shutil.which("ffprobe"):
+            result = _ffprobe(path, size_bytes)
+        else:
+            result = _ffmpeg_infos(path, size_bytes)
+    finally:
+        if spooled is not None:
+            os.remove(spooled)
+    if result["duration_s"]:
+        result["bitrate"] = result["bitrate"] or int(size_bytes * 8 / result["duration_s"])
+    return result
+
+
+def _ffprobe(path, size_bytes):
+    out = subprocess.run(["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if out.returncode != 0:
+        raise ProbeError(out.stderr.decode(errors="replace").strip() or "ffprobe failed")
+    info = json.loads(out.stdout)
+    result = empty_result(size_bytes)
+    result["duration_s"] = float(info.get("format", {}).get("duration") or 0)
+    result["bitrate"] = int(info.get("format", {}).get("bit_rate") or 0)
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video" and not result["codec"]:
+            result["codec"] = stream.get("codec_name")
+            result["width"], result["height"] = int(stream.get("width", 0)), int(stream.get("height", 0))
+            num, _, den = (stream.get("avg_frame_rate") or "0/1").partition("/")
+            result["fps"] = round(float(num) / float(den), 3) if float(den or 0) else 0.0
+        elif stream.get("codec_type") == "audio":
+            result["has_audio"] = True
+    return result
+
+
+def _ffmpeg_infos(path, size_bytes):
+    # moviepy's parser of "ffmpeg -i" (header dump only, nothing is decoded)
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    try:
+        infos = ffmpeg_parse_infos(path, check_duration=True)
+    except (IOError, OSError) as e:
+        raise ProbeError(str(e))
+    result = empty_result(size_bytes)
+    result["duration_s"] = float(infos.get("duration") or 0)
+    if infos.get("video_found"):
+        result["width"], result["height"] = infos["video_size"]
+        result["fps"] = round(float(infos.get("video_fps") or 0), 3)
+        result["codec"] = _codec_from_ffmpeg_dump(path)
+    result["has_audio"] = bool(infos.get("audio_found"))
+    return result
+
+
+def audio_codec(path):
+    # Codec of the first audio track ("aac", "mp3"...), None if there is none
+    return _codec_from_ffmpeg_dump(path, kind="Audio")
+
+
+def _codec_from_ffmpeg_dump(path, kind="Video"):
+    # moviepy doesn't keep the codec name, so read it from ffmpeg's stream line
+    from moviepy.config import get_setting
+
+    out = subprocess.run([get_setting("FFMPEG_BINARY"), "-hide_banner", "-i", path],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE).stderr.decode(errors="replace")
+    for line in out.splitlines():
+        if f"{kind}:" in line:
+            return line.split(f"{kind}:")[1].strip().split()[0].rstrip(",")
+    return None
@@ -1,55 +1,276 @@
 # video_processor.py
-import tempfile
 import os
-from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip
+import io
+import json
+import math
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from proglog import ProgressBarLogger
+from watermark import WatermarkEngine, PREVIEW_HEIGHT
+from video_probe import probe
+from streaming_io import spool_to_disk
+from scratch_space import get_scratch
+import tracing
+from hls_packager import package_hls
+from parallel_transcode import transcode, segment_workers, MIN_PARALLEL_SECONDS
+from stream_encoder import EncodeError, encode_preview, frame_size
+
+# "stream": raw frames piped between two ffmpeg processes (stream_encoder.py),
+# "moviepy": write_videofile(). The stream engine falls back to moviepy for
+# files it can't handle.
+DEFAULT_ENGINE = os.environ.get("TROVEO_PREVIEW_ENGINE", "stream")
+
+
+class EncodeProgress(ProgressBarLogger):
+    # Turns moviepy's frame counter ("t" bar) into progress(stage, fraction) calls
+    def __init__(self, progress):
+        super().__init__(logged_bars=None, min_time_interval=1.0)
+        self.progress = progress
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if bar == "t" and attr == "index" and self.bars[bar]["total"]:
+            self.progress("encode", min(1.0, value / self.bars[bar]["total"]))
+
+
+def stream_preview(source_path, preview_path, metadata, progress):
+    # The preview through stream_encoder.py. Returns None, or why this file
+    # has to go through moviepy instead (nothing to clean up but preview_path).
+    try:
+        size = frame_size(metadata)
+        progress("watermark", 0.0)
+        watermark = WatermarkEngine.for_preview((metadata["width"], metadata["height"]), size)
+        progress("encode", 0.0)
+        encode_preview(source_path, preview_path, progress.accumulate("composite", watermark.blend_inplace),
+                       info=metadata, progress=lambda fraction: progress("encode", fraction))
+        progress.add_bytes(metadata["size_bytes"])
+        return None
+    except EncodeError as e:
+        return str(e)
+
+
+@tracing.traced("process.total")
+def process_video(uploaded_file, progress=None, hls_profile=None, workers=None, engine=None):
+    # progress is optional: progress(stage, fraction) is called as we go,
+    # so a background job can show where it is (see job_queue.py)
+    # hls_profile is optional too: the name of an encoder profile ("fast",
+    # "balanced", "quality" - see hls_packager.py) to also build an HLS ladder
+    # workers: encoders for long videos (1 = serial; default all cores - a pool
+    # running several jobs passes its share, see parallel_transcode.segment_workers)
+    # engine: "stream", "moviepy" or "parallel" forces that encoder; None (or
+    # "auto") picks "parallel" for long videos, else TROVEO_PREVIEW_ENGINE
+    # With tracing on, each progress stage is also timed ("process.<stage>",
+    # see tracing.py); decode, resize, watermark and encode all happen inside
+    # "encode", with the watermark's share of it timed as "process.composite".
+    progress = tracing.StageTimer("process", progress)
 
-def process_video(uploaded_file):
     # 1. Save the uploaded file to a temporary file on disk
     # We do this because moviepy needs a real file path, not just memory.
-    tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-    tfile.write(uploaded_file.read())
-    original_path = tfile.name
+    # It is copied in fixed-size chunks, so a huge file never sits in memory.
+    # Everything this job writes goes into one scratch folder (see
+    # scratch_space.py), removed if anything fails.
+    progress("spool", 0.0)
+    job = get_scratch().job("process")
+    ext = os.path.splitext(getattr(uploaded_file, "name", "") or "")[1] or ".mp4"
+    spooled = spool_to_disk(uploaded_file, path=job.file("original" + ext))
+    original_path = spooled.path
+    progress.add_bytes(spooled.size)
     
     try:
-        # 2. Load the video
-        clip = VideoFileClip(original_path)
-        
-        # 3. Extract Metadata (The technical details)
-        metadata = {
-            "filename": uploaded_file.name,
-            "duration": f"{clip.duration:.2f} seconds",
-            "resolution": f"{clip.w}x{clip.h}",
-            "fps": f"{clip.fps:.2f}",
-            "filesize": f"{uploaded_file.size / (1024 * 1024):.2f} MB"
-        }
+        progress("open", 0.0)
+        # 2. Extract Metadata (The technical details)
+        # Read straight from the file headers: real numbers, no decoding
+        # (duration_s, width, height, fps, bitrate, codec, has_audio, size_bytes)
+        metadata = {"filename": uploaded_file.name, **probe(original_path)}
 
-        # 4. Create the Watermark
-        # We make a simple text watermark "TROVEO" in the center
-        # fontsize=50, white color, semi-transparent (opacity 0.5)
-        txt_clip = TextClip("TROVEO PREVIEW", fontsize=50, color='white')
-        txt_clip = txt_clip.set_position('center').set_duration(clip.duration).set_opacity(0.5)
-        
-        # Overlay the text on top of the original video
-        watermarked_clip = CompositeVideoClip([clip, txt_clip])
+        # Long video and several cores? Then the preview is cut at keyframes and
+        # the pieces are encoded side by side (see parallel_transcode.py).
+        workers = segment_workers() if workers is None else workers
+        preview_path = job.file("preview.mp4")
+        if engine in (None, "auto"):
+            long_video = workers > 1 and metadata["duration_s"] >= MIN_PARALLEL_SECONDS
+            engine = "parallel" if long_video else DEFAULT_ENGINE
+        stream_error = None
+        if engine == "stream":
+            # 3-6. ffmpeg decodes and shrinks, we blend batches of frames in
+            # place, ffmpeg encodes - no moviepy clip in between. A file it
+            # can't handle goes through moviepy below (stream_error says why).
+            stream_error = stream_preview(original_path, preview_path, metadata, progress)
+            if stream_error:
+                engine = "moviepy"
+
+        if engine == "parallel":
+            progress("encode", 0.0)
+            progress.add_bytes(metadata["size_bytes"])
+            transcode(original_path, preview_path, workers=workers,
+                      progress=lambda fraction: progress("encode", fraction))
+            duration = metadata["duration_s"]
+            source_w, source_h = metadata["width"], metadata["height"]
+        elif engine == "stream":
+            duration = metadata["duration_s"]
+            source_w, source_h = metadata["width"], metadata["height"]
+        else:
+            from moviepy.editor import VideoFileClip
+
+            # 3. Load the video
+            # We ask ffmpeg to shrink the frames while decoding (height 480),
+            # so Python never touches a full-resolution frame.
+            clip = VideoFileClip(original_path, target_resolution=(PREVIEW_HEIGHT, None))
+            source_w, source_h = clip.reader.infos['video_size']
+
+            # 4. Create the Watermark
+            # The "TROVEO PREVIEW" text is rendered once, already at preview size,
+            # white and semi-transparent (opacity 0.5), centered in the frame.
+            progress("watermark", 0.0)
+            watermark = WatermarkEngine.for_preview((source_w, source_h), clip.size)
         
-        # 5. Resize it for the preview (Make it smaller/faster)
-        # We shrink the height to 480 pixels
-        preview_clip = watermarked_clip.resize(height=480)
+            # 5. Blend it into the (already small) frames
+            # Only the pixels under the text are touched, in one NumPy operation.
+            preview_clip = clip.fl_image(progress.accumulate("composite", watermark.apply))
         
-        # 6. Save this new preview video to a temporary file
-        preview_tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        preview_clip.write_videofile(preview_tfile.name, codec='libx264', audio_codec='aac', logger=None)
+            # 6. Save this new preview video to a temporary file
+            # (moviepy's temporary audio track too, or it lands in the working directory)
+            progress("encode", 0.0)
+            progress.add_bytes(metadata["size_bytes"])
+            preview_clip.write_videofile(preview_path, codec='libx264', audio_codec='aac',
+                                         temp_audiofile=job.file("preview_audio.m4a"),
+                                         logger=EncodeProgress(progress))
         
-        # Close the clips to free up memory
-        clip.close()
-        watermarked_clip.close()
+            # Close the clips to free up memory
+            duration = clip.duration
+            clip.close()
+
+        # 7. Poster + hover-scrub sprite sheet (cheap images for the grids)
+        # Optional: the preview is already encoded, so a failure here only
+        # leaves the result without thumbnail paths
+        progress("thumbnails", 0.0)
+        try:
+            thumbnails = generate_thumbnails(original_path, job.folder("thumbs"),
+                                             duration=duration, source_size=(source_w, source_h))
+        except Exception as e:
+            tracing.error("process.thumbnails", e)
+            thumbnails = {}
+
+        # 8. Optional: adaptive-bitrate HLS ladder (240p/480p/720p + master playlist)
+        # Decoded once from the original; the report has time and size per rendition.
+        hls = None
+        if hls_profile:
+            progress("hls", 0.0)
+            hls = package_hls(original_path, job.folder("hls"), profile=hls_profile,
+                              progress=lambda fraction: progress("hls", fraction))
+        progress("done", 1.0)
+        progress.close()
+
+        # 9. Keep the outputs (not the original) as a scratch artifact: it is
+        # deleted, least recently used first, when scratch space runs short
+        artifact_id = job.finish(remove=[original_path])
+        artifact_dir = get_scratch().artifact_dir(artifact_id)
+        moved = lambda path: path.replace(job.path, artifact_dir, 1)
+        thumbnails = {key: moved(value) if key.endswith("_path") else value for key, value in thumbnails.items()}
+        if hls:
+            hls = {**hls, "master_path": moved(hls["master_path"]), "out_dir": moved(hls["out_dir"])}
 
         # Return the paths and data so the main app can use them
         return {
             "metadata": metadata,
-            "original_path": original_path, # Path to clean, high-res video
-            "preview_path": preview_tfile.name # Path to small, watermarked video
+            "artifact_id": artifact_id, # open with get_scratch().open_artifact() while showing it
+            "preview_path": moved(preview_path), # Path to small, watermarked video
+            "preview_engine": engine, # "stream", "moviepy" or "parallel"
+            "stream_error": stream_error, # Why the stream engine handed this file to moviepy, or None
+            **thumbnails, # poster_path, sprite_path, sprite_index_path, sprite_index
+            "hls": hls # None, or master_path, out_dir, encode_s and per-rendition sizes
         }
 
     except Exception as e:
-        return {"error": str(e)}
\ No newline at end of file
+        progress.close(error=type(e).__name__)
+        job.close()
+        return {"error": str(e)}
+
+
+# --- Poster frame & sprite sheet ---
+# Frames are grabbed with ffmpeg's fast seek (-ss before -i): it jumps to the
+# nearest keyframe and decodes just a few frames, instead of decoding the
+# whole video. A handful of these run side by side.
+
+POSTER_WIDTH = 640
+SPRITE_FRAMES = 16
+SPRITE_COLUMNS = 4
+SPRITE_TILE_WIDTH = 160
+
+
+def extract_frame(path, t, width):
+    # Returns the frame at time t (seconds), scaled to `width`, as an RGB array
+    cmd = [get_setting("FFMPEG_BINARY"), "-loglevel", "error", "-ss", f"{t:.3f}", "-i", path,
+           "-frames:v", "1", "-vf", f"scale={width}:-2", "-f", "image2pipe", "-c:v", "bmp", "-"]
+    out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+    if not out:
+        raise ValueError(f"No frame found at {t:.2f}s")
+    return np.asarray(Image.open(io.BytesIO(out)).convert("RGB"))
+
+
+def sample_times(duration, n_frames):
+    # Evenly spaced, avoiding the very first/last frame (often black)
+    return [duration * (i + 0.5) / n_frames for i in range(n_frames)]
+
+
+def generate_thumbnails(path, out_dir, duration, source_size=None, times=None, n_frames=SPRITE_FRAMES,
+                        columns=SPRITE_COLUMNS, tile_width=SPRITE_TILE_WIDTH, poster_width=POSTER_WIDTH,
+                        image_format="JPEG", watermark=True):
+    # Writes poster.<ext>, sprite.<ext> and sprite.json into out_dir.
+    # times: pick the sprite frames yourself (e.g. scene changes), else evenly spaced.
+    ext = "webp" if image_format.upper() == "WEBP" else "jpg"
+    times = list(times) if times else sample_times(duration, n_frames)
+    poster_t = min(duration * 0.1, max(duration - 0.1, 0))
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        poster_job = pool.submit(extract_frame, path, poster_t, poster_width)
+        tiles = list(pool.map(lambda t: extract_frame(path, t, tile_width), times))
+        poster = poster_job.result()
+
+    # Poster: one frame, watermarked like the preview
+    if watermark and source_size:
+        poster = WatermarkEngine.for_preview(source_size, (poster.shape[1], poster.shape[0])).apply(poster)
+    poster_path = os.path.join(out_dir, f"poster.{ext}")
+    Image.fromarray(poster).save(poster_path, image_format, quality=80)
+
+    # Sprite sheet: all frames tiled into one image, row by row
+    tile_h, tile_w = tiles[0].shape[:2]
+    rows = math.ceil(len(tiles) / columns)
+    sheet = np.zeros((rows * tile_h, columns * tile_w, 3), dtype=np.uint8)
+    frames = []
+    for i, (t, tile) in enumerate(zip(times, tiles)):
+        x, y = (i % columns) * tile_w, (i // columns) * tile_h
+        h, w = min(tile.shape[0], tile_h), min(tile.shape[1], tile_w)
+        sheet[y:y + h, x:x + w] = tile[:h, :w]
+        frames.append({"t": round(t, 3), "x": x, "y": y})
+    sprite_path = os.path.join(out_dir, f"sprite.{ext}")
+    Image.fromarray(sheet).save(sprite_path, image_format, quality=70)
+
+    # Small JSON index so a player knows which tile belongs to which time
+    sprite_index = {"tile_width": tile_w, "tile_height": tile_h, "columns": columns,
+                    "rows": rows, "frames": frames}
+    sprite_index_path = os.path.join(out_dir, "sprite.json")
+    with open(sprite_index_path, "w") as f:
+        json.dump(sprite_index, f)
+
+    return {"poster_path": poster_path, "sprite_path": sprite_path,
+            "sprite_index_path": sprite_index_path, "sprite_index": sprite_index}
+
+
+def thumbnails_for_file(path, out_dir):
+    # Same as generate_thumbnails(), for a video we have not opened yet:
+    # duration and size come from ffmpeg's header info, no decoding.
+    infos = ffmpeg_parse_infos(path)
+    return generate_thumbnails(path, out_dir, duration=infos["duration"], source_size=infos["video_size"])
+
+
+def thumbnail_names(file_name):
+    # Bucket names of the poster + sprite sheet, stored next to the video
+    # (these are also the videos_inventory columns that point at them)
+    stem = os.path.splitext(file_name)[0]
+    return {"poster_file": f"{stem}_poster.jpg", "sprite_file": f"{stem}_sprite.jpg",
+            "sprite_index_file": f"{stem}_sprite.json"}
@@ -0,0 +1,97 @@
+# watermark.py
+# The "TROVEO PREVIEW" overlay, rendered ONCE and blended with NumPy.
+#
+# The old pipeline built a TextClip + CompositeVideoClip, which makes moviepy
+# composite the whole full-resolution frame in Python for every frame, and only
+# then shrank it to 480p. Here we go the other way round:
+#   1. shrink the video first (the caller decodes straight to preview size)
+#   2. render the text once into a small RGBA array at preview size
+#   3. per frame, touch only the pixels under the text box (one vectorized op)
+import functools
+
+import numpy as np
+
+WATERMARK_TEXT = "TROVEO PREVIEW"
+WATERMARK_FONTSIZE = 50      # Font size at the ORIGINAL resolution (same as the old TextClip)
+WATERMARK_OPACITY = 0.5
+PREVIEW_HEIGHT = 480
+
+
+def preview_size(source_size, preview_height=PREVIEW_HEIGHT):
+    # Same maths moviepy uses for target_resolution=(height, None)
+    w, h = source_size
+    ratio = preview_height / h
+    return int(w * ratio), int(h * ratio)
+
+
+@functools.lru_cache(maxsize=16)
+def render_text_overlay(text=WATERMARK_TEXT, fontsize=WATERMARK_FONTSIZE, color='white'):
+    # Uses ImageMagick through TextClip, exactly like before - but only once
+    # per (text, size). The result is cached, so every job at the same preview
+    # size reuses the same array.
+    from moviepy.editor import TextClip
+
+    txt_clip = TextClip(text, fontsize=fontsize, color=color)
+    rgb = txt_clip.get_frame(0)
+    if txt_clip.mask is not None:
+        alpha = txt_clip.mask.get_frame(0) * 255
+    else:
+        alpha = np.full(rgb.shape[:2], 255.0)
+    txt_clip.close()
+
+    overlay = np.dstack([rgb, alpha]).round().astype(np.uint8)
+    overlay.setflags(write=False)  # Shared between jobs, so nobody may edit it
+    return overlay
+
+
+class WatermarkEngine:
+    # Blends a cached RGBA overlay into the center of frames of a fixed size.
+    # Works on a single frame (H, W, 3) or a batch of frames (N, H, W, 3).
+
+    def __init__(self, overlay_rgba, frame_size, opacity=WATERMARK_OPACITY):
+        frame_w, frame_h = frame_size
+        overlay_h, overlay_w = overlay_rgba.shape[:2]
+
+        # Centered, like set_position('center'). If the text is wider than
+        # the frame we keep only the middle part of it.
+        x0, y0 = (frame_w - overlay_w) // 2, (frame_h - overlay_h) // 2
+        crop_x, crop_y = max(0, -x0), max(0, -y0)
+        x0, y0 = max(0, x0), max(0, y0)
+        box_w = min(overlay_w - 2 * crop_x, frame_w)
+        box_h = min(overlay_h - 2 * crop_y, frame_h)
+        overlay = overlay_rgba[crop_y:crop_y + box_h, crop_x:crop_x + box_w]
+
+        # Pre-multiply once so the per-frame work is a single multiply-add:
+        #   out = frame * (1 - a) + rgb * a
+        alpha = overlay[..., 3:4].astype(np.float32) * (opacity / 255.0)
+        self._premultiplied = overlay[..., :3].astype(np.float32) * alpha
+        self._inverse_alpha = 1.0 - alpha
+
+        self.frame_size = (frame_w, frame_h)
+        self.box = (x0, y0, box_w, box_h)
+        # Ellipsis first so the same slice works for one frame or a batch
+        self._region = (Ellipsis, slice(y0, y0 + box_h), slice(x0, x0 + box_w), slice(None))
+
+    @classmethod
+    def for_preview(cls, source_size, frame_size=None, text=WATERMARK_TEXT,
+                    fontsize=WATERMARK_FONTSIZE, opacity=WATERMARK_OPACITY):
+        # Scale the font so the text covers the same share of the picture as
+        # the old full-resolution TextClip did after the resize.
+        frame_size = frame_size or preview_size(source_size)
+        scale = frame_size[1] / source_size[1]
+        overlay = render_text_overlay(text, max(8, round(fontsize * scale)))
+        return cls(overlay, frame_size, opacity=opacity)
+
+    def blend_inplace(self, frames):
+        # frames must be a writable uint8 array whose last three dims are
+        # (H, W, 3) with H, W == frame_size. Only the text box is touched.
+        region = frames[self._region]
+        region[...] = region * self._inverse_alpha + self._premultiplied + 0.5
+        return frames
+
+    def apply(self, frame):
+        # For moviepy's fl_image: decoded frames are read-only views of the
+        # ffmpeg pipe buffer, so we blend into a copy.
+        if not frame.flags.writeable:
+            frame = frame.copy()
+        return self.blend_inplace(frame)